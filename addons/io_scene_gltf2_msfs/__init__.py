@@ -47,6 +47,11 @@ class MSFS_ExporterProperties(bpy.types.PropertyGroup):
         description='Enable MSFS glTF export extensions',
         default=True
     )
+    compact_lights: bpy.props.BoolProperty(
+        name='Compact Lights',
+        description='Round the light parameters and leave out the KHR light nodes the sim does not use. Imports turn these lights back into Blender lights',
+        default=False
+    )
 
 class GLTF_PT_MSFSImporterExtensionPanel(bpy.types.Panel):
     bl_space_type = 'FILE_BROWSER'
@@ -99,6 +104,9 @@ class GLTF_PT_MSFSExporterExtensionPanel(bpy.types.Panel):
         layout.use_property_decorate = False  # No animation.
 
         layout.prop(props, 'enabled', text="Enabled")
+        row = layout.row()
+        row.prop(props, 'compact_lights')
+        row.enabled = props.enabled
 
 
 def recursive_module_search(path, root=""):
@@ -208,6 +216,14 @@ class glTF2ImportUserExtension(Import):
     def __init__(self):
         self.properties = bpy.context.scene.msfs_importer_properties
 
+from .blender.msfs_material_viewport_preview import MSFS_Viewport_Preview
+def glTF2_pre_export_callback(export_settings):
+    # The exporter reads the full MSFS node trees, swap the lite viewport trees out while it runs
+    MSFS_Viewport_Preview.suspend()
+
+def glTF2_post_export_callback(export_settings):
+    MSFS_Viewport_Preview.resume()
+
 from .io.msfs_export import Export
 class glTF2ExportUserExtension(Export):
     def __init__(self):
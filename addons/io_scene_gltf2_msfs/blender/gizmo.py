@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import time
+
 import bpy
 import bgl
 import gpu
@@ -22,16 +24,127 @@ import numpy as np
 from mathutils import Matrix
 from math import radians
 from gpu_extras.batch import batch_for_shader
+from bpy.app.handlers import persistent
+
+from .gizmo_geometry import (
+    edges_to_line_vertices,
+    get_gizmo_matrix,
+    get_segment_starts,
+    fit_aabbs,
+    fit_obbs,
+    fit_spheres,
+    fit_cylinders,
+    get_box_volumes,
+    get_sphere_volumes,
+    get_cylinder_volumes,
+    find_redundant_gizmos,
+)
+
+# Unit shape of each gizmo type as line vertices, along with its batch. Every gizmo of a type shares these,
+# so collision display costs the same no matter how many gizmos there are
+gizmo_shape_cache = {}
+gizmo_batch_cache = {}
+
+
+def get_gizmo_shape(gizmo_type):
+    shape = gizmo_shape_cache.get(gizmo_type)
+    if shape is None:
+        bm = bmesh.new()
+        if gizmo_type == "sphere":
+            bmesh.ops.create_circle(bm, segments=32, radius=1)
+            bmesh.ops.create_circle(bm, segments=32, radius=1, matrix=Matrix.Rotation(radians(90), 4, 'X'))
+            bmesh.ops.create_circle(bm, segments=32, radius=1, matrix=Matrix.Rotation(radians(90), 4, 'Y'))
+        elif gizmo_type == "box":
+            bmesh.ops.create_cube(bm, size=2)
+        elif gizmo_type == "cylinder":
+            bmesh.ops.create_cone(bm, cap_ends=True, segments=32, radius1=1, radius2=1, depth=2) # Create cone with both ends having the same diameter - this creates a cylinder
+
+        bm.verts.index_update()
+        coords = [vert.co[:] for vert in bm.verts]
+        edges = [(edge.verts[0].index, edge.verts[1].index) for edge in bm.edges]
+        bm.free()
+
+        shape = edges_to_line_vertices(coords, edges)
+        gizmo_shape_cache[gizmo_type] = shape
+    return shape
+
+
+def get_gizmo_batch(gizmo_type, shader):
+    batch = gizmo_batch_cache.get(gizmo_type)
+    if batch is None:
+        batch = batch_for_shader(shader, 'LINES', {"pos": get_gizmo_shape(gizmo_type)})
+        gizmo_batch_cache[gizmo_type] = batch
+    return batch
+
+
+class MSFSGizmoRegistry:
+    # Names of the empties that are collision gizmos, kept up to date from depsgraph updates and the gizmo type
+    # callback so the gizmo group doesn't have to go through every object in the scene on each redraw.
+    # The version is bumped on every change, the gizmo group only syncs its gizmos when it differs from the last one it saw
+    names = None
+    version = 0
+    object_count = 0
+
+    def __new__(cls, *args, **kwargs):
+        raise RuntimeError("%s should not be instantiated" % cls)
+
+    @staticmethod
+    def is_gizmo(object):
+        return object.type == 'EMPTY' and object.msfs_gizmo_type != "NONE"
+
+    @staticmethod
+    def get_names():
+        if MSFSGizmoRegistry.names is None:
+            MSFSGizmoRegistry.rebuild()
+        return MSFSGizmoRegistry.names
+
+    @staticmethod
+    def rebuild():
+        MSFSGizmoRegistry.names = {object.name for object in bpy.data.objects if MSFSGizmoRegistry.is_gizmo(object)}
+        MSFSGizmoRegistry.object_count = len(bpy.data.objects)
+        MSFSGizmoRegistry.version += 1
+
+    @staticmethod
+    def update_object(object):
+        names = MSFSGizmoRegistry.get_names()
+        if MSFSGizmoRegistry.is_gizmo(object):
+            if object.name not in names:
+                names.add(object.name)
+                MSFSGizmoRegistry.version += 1
+        elif object.name in names:
+            names.discard(object.name)
+            MSFSGizmoRegistry.version += 1
+
+
+@persistent
+def gizmo_registry_depsgraph_update(scene, depsgraph):
+    if MSFSGizmoRegistry.names is None:
+        return
+
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object):
+            MSFSGizmoRegistry.update_object(update.id.original)
+
+    # Removed objects don't show up in the updates, and collection changes can take gizmos out of the view layer
+    object_count = len(bpy.data.objects)
+    if object_count != MSFSGizmoRegistry.object_count or depsgraph.id_type_updated('COLLECTION'):
+        MSFSGizmoRegistry.object_count = object_count
+        MSFSGizmoRegistry.version += 1
+
+
+@persistent
+def gizmo_registry_rebuild(dummy):
+    MSFSGizmoRegistry.rebuild()
 
 
 class MSFSGizmoProperties():
     def msfs_gizmo_type_update(self, context):
-        empties = MSFSCollisionGizmoGroup.empties
-        object = context.object
-        if object in empties.keys():
-            if object.msfs_gizmo_type != empties[object].msfs_gizmo_type:
-                empties[object].msfs_gizmo_type = object.msfs_gizmo_type
-                empties[object].create_custom_shape()
+        MSFSGizmoRegistry.update_object(self)
+
+        gizmo = MSFSCollisionGizmoGroup.empties.get(self.name)
+        if gizmo is not None and self.msfs_gizmo_type != gizmo.msfs_gizmo_type and self.msfs_gizmo_type != "NONE":
+            gizmo.msfs_gizmo_type = self.msfs_gizmo_type
+            gizmo.create_custom_shape()
 
     bpy.types.Object.msfs_gizmo_type = bpy.props.EnumProperty(
         name = "Type",
@@ -77,6 +190,186 @@ class AddGizmo(bpy.types.Operator):
 
         return {"FINISHED"}
 
+class FitGizmos(bpy.types.Operator):
+    """Fit collision gizmos to the selected meshes"""
+
+    bl_idname = "msfs_collision_gizmo.fit_gizmos"
+    bl_label = "Fit MSFS Collision Gizmos"
+    bl_options = {"REGISTER", "UNDO"}
+
+    msfs_gizmo_type: bpy.props.EnumProperty(
+        name="Type",
+        description="Type of collision gizmo to fit",
+        items=(
+            ("AUTO", "Smallest", "Use whichever gizmo type has the smallest volume"),
+            ("sphere", "Sphere", ""),
+            ("box", "Box", ""),
+            ("cylinder", "Cylinder", ""),
+        ),
+        default="AUTO",
+    )
+    use_oriented_box: bpy.props.BoolProperty(
+        name="Oriented Box",
+        description="Rotate boxes along the principal axes of the mesh when that makes them smaller",
+        default=True,
+    )
+    road_collider: bpy.props.BoolProperty(
+        name="Road Collider",
+        description="Make the new gizmos road colliders",
+        default=False,
+    )
+    replace_existing: bpy.props.BoolProperty(
+        name="Replace Existing",
+        description="Remove the collision gizmos already parented to the meshes",
+        default=True,
+    )
+
+    @staticmethod
+    def get_vertices(meshes):
+        counts = np.array([len(mesh.vertices) for mesh in meshes], dtype=np.int64)
+        starts = get_segment_starts(counts)
+        points = np.empty((counts.sum(), 3), dtype=np.float32)
+        for mesh, start, count in zip(meshes, starts, counts):
+            mesh.vertices.foreach_get("co", points[start:start + count].reshape(-1))
+        return points.astype(np.float64), starts, counts
+
+    @staticmethod
+    def fit(points, starts, counts, gizmo_type, use_oriented_box):
+        # Returns the gizmo type, location, rotation matrix and empty scale of each mesh
+        centers, half_extents = fit_aabbs(points, starts)
+        rotations = np.broadcast_to(np.eye(3), (len(starts), 3, 3)).copy()
+
+        if use_oriented_box:
+            obb_centers, obb_half_extents, obb_axes = fit_obbs(points, starts, counts)
+            use_obb = get_box_volumes(obb_half_extents) < get_box_volumes(half_extents)
+            box_centers = np.where(use_obb[:, None], obb_centers, centers)
+            box_half_extents = np.where(use_obb[:, None], obb_half_extents, half_extents)
+            box_rotations = np.where(use_obb[:, None, None], obb_axes, rotations)
+        else:
+            box_centers, box_half_extents, box_rotations = centers, half_extents, rotations
+
+        radii = fit_spheres(points, starts, counts, centers)
+        cylinder_radii, cylinder_heights = fit_cylinders(points, starts, counts, centers, half_extents)
+
+        volumes = np.stack((
+            get_box_volumes(box_half_extents),
+            get_sphere_volumes(radii),
+            get_cylinder_volumes(cylinder_radii, cylinder_heights),
+        ))
+        types = np.array(["box", "sphere", "cylinder"])
+        if gizmo_type == "AUTO":
+            chosen = types[np.argmin(volumes, axis=0)]
+        else:
+            chosen = np.full(len(starts), gizmo_type)
+
+        # Empty scales follow the exporter: a sphere radius is the product of the scale, a cylinder radius the product
+        # of X and Y with the height on Z, and boxes use half extents
+        minimum = 1e-4
+        box_scales = np.maximum(box_half_extents, minimum)
+        sphere_scales = np.repeat(np.cbrt(np.maximum(radii, minimum))[:, None], 3, axis=1)
+        cylinder_radius_scale = np.sqrt(np.maximum(cylinder_radii, minimum))
+        cylinder_scales = np.stack((cylinder_radius_scale, cylinder_radius_scale, np.maximum(cylinder_heights, minimum)), axis=1)
+
+        is_box = (chosen == "box")
+        is_sphere = (chosen == "sphere")
+        locations = np.where(is_box[:, None], box_centers, centers)
+        matrices = np.where(is_box[:, None, None], box_rotations, rotations)
+        scales = np.where(is_box[:, None], box_scales, np.where(is_sphere[:, None], sphere_scales, cylinder_scales))
+        return chosen, locations, matrices, scales
+
+    def execute(self, context):
+        objects = [
+            object for object in context.selected_objects
+            if object.type == "MESH" and len(object.data.vertices) > 0
+        ]
+        if not objects:
+            self.report({"WARNING"}, "No meshes selected")
+            return {"CANCELLED"}
+
+        # Objects sharing a mesh share the fit
+        meshes = list({object.data.name: object.data for object in objects}.values())
+        mesh_indices = {mesh.name: i for i, mesh in enumerate(meshes)}
+
+        points, starts, counts = FitGizmos.get_vertices(meshes)
+        types, locations, matrices, scales = FitGizmos.fit(
+            points, starts, counts, self.msfs_gizmo_type, self.use_oriented_box
+        )
+
+        names = {"sphere": "Sphere Collision", "box": "Box Collision", "cylinder": "Cylinder Collision"}
+        for object in objects:
+            if self.replace_existing:
+                for child in list(object.children):
+                    if child.type == "EMPTY" and child.msfs_gizmo_type != "NONE":
+                        bpy.data.objects.remove(child)
+
+            i = mesh_indices[object.data.name]
+            gizmo = bpy.data.objects.new(names[types[i]], None)
+            for collection in object.users_collection:
+                collection.objects.link(gizmo)
+
+            gizmo.parent = object
+            gizmo.location = locations[i]
+            gizmo.rotation_euler = Matrix(matrices[i].tolist()).to_euler()
+            gizmo.scale = scales[i]
+            gizmo.msfs_gizmo_type = str(types[i])
+            gizmo.msfs_collision_is_road_collider = self.road_collider
+
+        self.report({"INFO"}, "Fitted %d collision gizmos" % len(objects))
+        return {"FINISHED"}
+
+class AnalyzeGizmos(bpy.types.Operator):
+    """Find collision gizmos that are duplicated or completely inside another gizmo"""
+
+    bl_idname = "msfs_collision_gizmo.analyze_gizmos"
+    bl_label = "Find Redundant MSFS Collision Gizmos"
+    bl_options = {"REGISTER", "UNDO"}
+
+    action: bpy.props.EnumProperty(
+        name="Action",
+        items=(
+            ("SELECT", "Select", "Select the redundant gizmos"),
+            ("DELETE", "Delete", "Delete the redundant gizmos"),
+        ),
+        default="SELECT",
+    )
+    same_parent_only: bpy.props.BoolProperty(
+        name="Same Parent Only",
+        description="Only compare gizmos that are parented to the same object, since they end up in the same gizmo list on export",
+        default=True,
+    )
+
+    def execute(self, context):
+        start_time = time.perf_counter()
+
+        gizmos = [object for object in context.scene.objects if MSFSGizmoRegistry.is_gizmo(object)]
+        if len(gizmos) < 2:
+            self.report({"INFO"}, "No redundant collision gizmos found")
+            return {"FINISHED"}
+
+        types = [object.msfs_gizmo_type for object in gizmos]
+        matrices = np.array([object.matrix_world for object in gizmos], dtype=np.float64)
+        groups = None
+        if self.same_parent_only:
+            parents = {}
+            groups = [parents.setdefault(object.parent.name if object.parent else "", len(parents)) for object in gizmos]
+
+        redundant = find_redundant_gizmos(types, matrices, groups)
+        redundant_gizmos = [gizmo for gizmo, is_redundant in zip(gizmos, redundant) if is_redundant]
+
+        if self.action == "DELETE":
+            bpy.data.batch_remove(redundant_gizmos)
+        else:
+            for object in context.selected_objects:
+                object.select_set(False)
+            for gizmo in redundant_gizmos:
+                gizmo.select_set(True)
+
+        self.report(
+            {"INFO"},
+            "Found %d redundant collision gizmos out of %d in %.2fs" % (len(redundant_gizmos), len(gizmos), time.perf_counter() - start_time),
+        )
+        return {"FINISHED"}
+
 class MSFSCollisionGizmo(bpy.types.Gizmo):
     bl_idname = "VIEW3D_GT_msfs_collision_gizmo"
     bl_label = "MSFS Collision Gizmo"
@@ -85,20 +378,22 @@ class MSFSCollisionGizmo(bpy.types.Gizmo):
     __slots__ = (
         "empty",
         "msfs_gizmo_type",
-        "custom_shape",
-        "custom_shape_edges",
+        "batch",
     )
 
     def _update_offset_matrix(self):
         pass
 
     def setup(self):
-        if not hasattr(self, "custom_shape"):
-            self.custom_shape = None
+        if not hasattr(self, "batch"):
+            self.batch = None
 
-    def draw_line_3d(self, color, width, region, pos):
-        shader = gpu.shader.from_builtin('3D_POLYLINE_UNIFORM_COLOR')
-        batch = batch_for_shader(shader, 'LINES', {"pos": pos})
+    @staticmethod
+    def get_shader():
+        return gpu.shader.from_builtin('3D_POLYLINE_UNIFORM_COLOR')
+
+    def draw_line_3d(self, color, width, region, batch):
+        shader = self.get_shader()
         shader.bind()
         shader.uniform_float("color", color)
         shader.uniform_float("lineWidth", width)
@@ -106,47 +401,18 @@ class MSFSCollisionGizmo(bpy.types.Gizmo):
         batch.draw(shader)
 
     def create_custom_shape(self):
-        mesh = bpy.data.meshes.new("Gizmo Mesh")
-        bm = bmesh.new()
-        if self.msfs_gizmo_type == "sphere":
-            bmesh.ops.create_circle(bm, segments=32, radius=1)
-            bm.to_mesh(mesh)
-            bmesh.ops.create_circle(bm, segments=32, radius=1, matrix=Matrix.Rotation(radians(90), 4, 'X'))
-            bm.to_mesh(mesh)
-            bmesh.ops.create_circle(bm, segments=32, radius=1, matrix=Matrix.Rotation(radians(90), 4, 'Y'))
-            bm.to_mesh(mesh)
-        elif self.msfs_gizmo_type == "box":
-            bmesh.ops.create_cube(bm, size=2)
-        elif self.msfs_gizmo_type == "cylinder":
-            bmesh.ops.create_cone(bm, cap_ends=True, segments=32, radius1=1, radius2=1, depth=2) # Create cone with both ends having the same diameter - this creates a cylinder
-
-        bm.to_mesh(mesh)
-        bm.free()
-
-        edges = []
-        for edge in mesh.edges:
-            edge_verts = []
-            for vert in edge.vertices:
-                edge_verts.append(mesh.vertices[vert])
-            edges.append(edge_verts)
-
-        self.custom_shape_edges = edges
+        # The batch holds the unit shape, the gizmo transform is applied by the shader when drawing
+        self.batch = get_gizmo_batch(self.msfs_gizmo_type, self.get_shader())
 
     def get_matrix(self):
         # Re-calculate matrix without rotation
-        if self.empty.msfs_gizmo_type == "sphere":
-            scale = self.empty.scale[0] * self.empty.scale[1] * self.empty.scale[2]
-            scale_matrix = Matrix.Scale(scale, 4, (1, 0, 0)) @ Matrix.Scale(scale, 4, (0, 1, 0)) @ Matrix.Scale(scale, 4, (0, 0, 1))
-        elif self.empty.msfs_gizmo_type == "cylinder":
-            scale_xy = self.empty.scale[0] * self.empty.scale[1]
-            scale_matrix = Matrix.Scale(scale_xy, 4, (1, 0, 0)) @ Matrix.Scale(scale_xy, 4, (0, 1, 0)) @ Matrix.Scale(self.empty.scale[2], 4, (0, 0, 1))
-        else:
-            scale_matrix = Matrix.Scale(self.empty.scale[0], 4, (1, 0, 0)) @ Matrix.Scale(self.empty.scale[1], 4, (0, 1, 0)) @ Matrix.Scale(self.empty.scale[2], 4, (0, 0, 1))
-        matrix = Matrix.Translation(self.empty.matrix_world.translation) @ scale_matrix
-        return matrix
+        matrix = get_gizmo_matrix(
+            self.empty.msfs_gizmo_type, self.empty.matrix_world.translation, self.empty.scale
+        )
+        return Matrix(matrix.tolist())
 
     def draw(self, context):
-        if self.custom_shape_edges and not self.empty.hide_get():
+        if self.batch is not None and not self.empty.hide_get():
             matrix = self.get_matrix()
 
             bgl.glEnable(bgl.GL_BLEND)
@@ -160,26 +426,15 @@ class MSFSCollisionGizmo(bpy.types.Gizmo):
 
             draw_color.append(1) # Add alpha (there isn't any functions in the Color class to add an alpha, so we have to convert to a list)
 
-            vertex_pos = []
-            for edge in self.custom_shape_edges:
-                line_start = self.apply_vert_transforms(edge[0], matrix=matrix)
-                line_end = self.apply_vert_transforms(edge[1], matrix=matrix)
-
-                vertex_pos.extend([line_start, line_end])
-
-            self.draw_line_3d(draw_color, 2, context.region, vertex_pos)
+            with gpu.matrix.push_pop():
+                gpu.matrix.multiply_matrix(matrix)
+                self.draw_line_3d(draw_color, 2, context.region, self.batch)
 
             # Restore OpenGL defaults
             bgl.glLineWidth(1)
             bgl.glDisable(bgl.GL_BLEND)
             bgl.glDisable(bgl.GL_LINE_SMOOTH)
 
-    def apply_vert_transforms(self, vert, matrix):
-        vert = list(vert.co)
-        vert.append(1)
-        multiplied_matrix = np.array(matrix).dot(np.array(vert))
-        return multiplied_matrix[:-1].tolist()
-
 class MSFSCollisionGizmoGroup(bpy.types.GizmoGroup):
     bl_idname = "VIEW3D_GT_msfs_collision_gizmo_group"
     bl_label = "MSFS Collision Gizmo Group"
@@ -187,44 +442,62 @@ class MSFSCollisionGizmoGroup(bpy.types.GizmoGroup):
     bl_region_type = "WINDOW"
     bl_options = {'3D', 'PERSISTENT', 'SHOW_MODAL_ALL', 'SELECT'}
 
+    # Gizmos by empty name, and the registry version they were last synced with
     empties = {}
+    registry_version = None
 
     @classmethod
     def poll(cls, context):
-        for object in context.view_layer.objects:
-            if object.type == 'EMPTY' and object.msfs_gizmo_type != "NONE":
-                return True
-        return False
+        return bool(MSFSGizmoRegistry.get_names())
 
     def setup(self, context):
-        for object in context.view_layer.objects:
-            if object.type == 'EMPTY' and object.msfs_gizmo_type != "NONE" and object not in self.__class__.empties.keys():
-                gz = self.gizmos.new(MSFSCollisionGizmo.bl_idname)
-
-                gz.msfs_gizmo_type = object.msfs_gizmo_type
-                gz.empty = object
-
-                gz.create_custom_shape()
-
-                self.__class__.empties[object] = gz
+        self.__class__.registry_version = None
+        self.sync(context)
 
     def refresh(self, context):
-        # We have to get a list of gizmo empties in the scene first in order to avoid a crash due to referencing a removed object
-        found_empties = []
-        for object in context.view_layer.objects:
-            if object.type == 'EMPTY' and object.msfs_gizmo_type != "NONE":
-                found_empties.append(object)
-
-        for _, (empty, gizmo) in enumerate(self.__class__.empties.copy().items()):
-            if empty not in found_empties:
+        self.sync(context)
+
+    def draw_prepare(self, context):
+        self.sync(context)
+
+    def sync(self, context):
+        cls = self.__class__
+        if cls.registry_version == MSFSGizmoRegistry.version:
+            return
+        cls.registry_version = MSFSGizmoRegistry.version
+
+        names = MSFSGizmoRegistry.get_names()
+        view_layer_objects = context.view_layer.objects
+        found_empties = {}
+        for name in list(names):
+            object = view_layer_objects.get(name)
+            if object is None:
+                if bpy.data.objects.get(name) is None:
+                    # Removed or renamed, the new name has already been added by the depsgraph handler
+                    names.discard(name)
+                continue
+            if MSFSGizmoRegistry.is_gizmo(object):
+                found_empties[name] = object
+
+        # Remove the gizmos of empties that are gone before touching anything else, their objects may not be valid anymore
+        for name, gizmo in list(cls.empties.items()):
+            if name not in found_empties:
                 self.gizmos.remove(gizmo)
-                del self.__class__.empties[empty]
+                del cls.empties[name]
+
+        for name, object in found_empties.items():
+            gizmo = cls.empties.get(name)
+            if gizmo is None:
+                gizmo = self.gizmos.new(MSFSCollisionGizmo.bl_idname)
+                gizmo.msfs_gizmo_type = object.msfs_gizmo_type
+                gizmo.create_custom_shape()
+                cls.empties[name] = gizmo
+            elif gizmo.msfs_gizmo_type != object.msfs_gizmo_type:
+                gizmo.msfs_gizmo_type = object.msfs_gizmo_type
+                gizmo.create_custom_shape()
 
-        # Check if there are any new gizmo empties, and if so create new gizmo. We can't do this in the above loop due to the crash mentioned above
-        for object in context.view_layer.objects:
-            if object.type == 'EMPTY' and object.msfs_gizmo_type != "NONE":
-                if object not in self.__class__.empties.keys():
-                    self.setup(context)
+            # Undo and file loads give us new objects, so always point the gizmo at the current one
+            gizmo.empty = object
 
 
 class MSFSCollisionAddMenu(bpy.types.Menu):
@@ -235,12 +508,24 @@ class MSFSCollisionAddMenu(bpy.types.Menu):
         self.layout.operator(AddGizmo.bl_idname, text="Sphere Collision", icon="MESH_UVSPHERE").msfs_gizmo_type = "sphere"
         self.layout.operator(AddGizmo.bl_idname, text="Box Collision", icon="MESH_CUBE").msfs_gizmo_type = "box"
         self.layout.operator(AddGizmo.bl_idname, text="Cylinder Collision", icon="MESH_CYLINDER").msfs_gizmo_type = "cylinder"
+        self.layout.separator()
+        self.layout.operator(FitGizmos.bl_idname, text="Fit to Selected Meshes", icon="SHADING_BBOX")
+        self.layout.operator(AnalyzeGizmos.bl_idname, text="Find Redundant Gizmos", icon="VIEWZOOM")
 
 def draw_menu(self, context):
     self.layout.menu(menu=MSFSCollisionAddMenu.bl_idname, icon="SHADING_BBOX")
 
 def register():
     bpy.types.VIEW3D_MT_add.append(draw_menu)
+    bpy.app.handlers.depsgraph_update_post.append(gizmo_registry_depsgraph_update)
+    bpy.app.handlers.load_post.append(gizmo_registry_rebuild)
+    bpy.app.handlers.undo_post.append(gizmo_registry_rebuild)
+    bpy.app.handlers.redo_post.append(gizmo_registry_rebuild)
 
 def unregister():
     bpy.types.VIEW3D_MT_add.remove(draw_menu)
+    bpy.app.handlers.depsgraph_update_post.remove(gizmo_registry_depsgraph_update)
+    bpy.app.handlers.load_post.remove(gizmo_registry_rebuild)
+    bpy.app.handlers.undo_post.remove(gizmo_registry_rebuild)
+    bpy.app.handlers.redo_post.remove(gizmo_registry_rebuild)
+    gizmo_batch_cache.clear()
@@ -0,0 +1,269 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Collision gizmo geometry helpers. These only depend on numpy so they can be used (and tested) outside of Blender
+
+import numpy as np
+
+
+def edges_to_line_vertices(coords, edges):
+    # Flatten an indexed edge list into the vertex pairs a LINES batch expects
+    coords = np.asarray(coords, dtype=np.float32).reshape(-1, 3)
+    edges = np.asarray(edges, dtype=np.int32).reshape(-1)
+    return np.ascontiguousarray(coords[edges])
+
+
+def get_gizmo_scale(gizmo_type, scale):
+    # Matches how the exporter reads the empty's scale for each gizmo type
+    sx, sy, sz = scale
+    if gizmo_type == "sphere":
+        s = sx * sy * sz
+        return (s, s, s)
+    elif gizmo_type == "cylinder":
+        s = sx * sy
+        return (s, s, sz)
+    return (sx, sy, sz)
+
+
+def get_gizmo_matrix(gizmo_type, translation, scale):
+    # Gizmos are drawn without rotation, only the world translation and the (type dependent) scale are used
+    matrix = np.diag(get_gizmo_scale(gizmo_type, scale) + (1.0,)).astype(np.float32)
+    matrix[:3, 3] = translation
+    return matrix
+
+
+
+# Fitting. The vertices of many meshes are concatenated into one (N, 3) array, each mesh being a segment of it
+# described by its start index and vertex count, so every fit runs over all meshes at once
+
+def get_segment_starts(counts):
+    counts = np.asarray(counts, dtype=np.int64)
+    return np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+
+
+def fit_aabbs(points, starts):
+    mins = np.minimum.reduceat(points, starts, axis=0)
+    maxs = np.maximum.reduceat(points, starts, axis=0)
+    return (mins + maxs) / 2, (maxs - mins) / 2
+
+
+def fit_obbs(points, starts, counts):
+    # Oriented boxes along the principal axes of each vertex cloud
+    counts = np.asarray(counts)
+    means = np.add.reduceat(points, starts, axis=0) / counts[:, None]
+    centered = points - np.repeat(means, counts, axis=0)
+    covariances = np.add.reduceat(centered[:, :, None] * centered[:, None, :], starts, axis=0) / counts[:, None, None]
+
+    _, axes = np.linalg.eigh(covariances)  # Batched, the columns are the axes
+    axes[np.linalg.det(axes) < 0, :, 2] *= -1  # Keep them right handed so they make a rotation matrix
+
+    local = np.einsum("nij,ni->nj", np.repeat(axes, counts, axis=0), centered)
+    mins = np.minimum.reduceat(local, starts, axis=0)
+    maxs = np.maximum.reduceat(local, starts, axis=0)
+    centers = means + np.einsum("nij,nj->ni", axes, (mins + maxs) / 2)
+    return centers, (maxs - mins) / 2, axes
+
+
+def fit_spheres(points, starts, counts, centers):
+    distances = np.linalg.norm(points - np.repeat(centers, counts, axis=0), axis=1)
+    return np.maximum.reduceat(distances, starts)
+
+
+def fit_cylinders(points, starts, counts, centers, half_extents):
+    # Cylinders stand on the local Z axis, like the gizmo shape
+    offsets = points[:, :2] - np.repeat(centers[:, :2], counts, axis=0)
+    radii = np.maximum.reduceat(np.linalg.norm(offsets, axis=1), starts)
+    return radii, half_extents[:, 2] * 2
+
+
+def get_box_volumes(half_extents):
+    return np.prod(half_extents * 2, axis=1)
+
+
+def get_sphere_volumes(radii):
+    return 4 / 3 * np.pi * radii ** 3
+
+
+def get_cylinder_volumes(radii, heights):
+    return np.pi * radii ** 2 * heights
+
+
+# Overlap analysis. Each gizmo is described by its world center, rotation (columns are the local axes) and extents:
+# half extents for boxes, the radius three times for spheres, and radius, radius, half height for cylinders
+
+GIZMO_TYPES = ("box", "sphere", "cylinder")
+
+
+def get_gizmo_volumes(types, matrices):
+    # The world matrix scale is read the same way the exporter reads the local one
+    matrices = np.asarray(matrices, dtype=np.float64).reshape(-1, 4, 4)
+    types = np.asarray(types)
+    centers = matrices[:, :3, 3].copy()
+    basis = matrices[:, :3, :3]
+    scales = np.maximum(np.linalg.norm(basis, axis=1), 1e-12)
+    rotations = basis / scales[:, None, :]
+
+    extents = scales.copy()
+    sphere = types == "sphere"
+    radii = np.prod(scales[sphere], axis=1)
+    extents[sphere] = radii[:, None]
+    cylinder = types == "cylinder"
+    cylinder_radii = scales[cylinder, 0] * scales[cylinder, 1]
+    extents[cylinder] = np.stack((cylinder_radii, cylinder_radii, scales[cylinder, 2] / 2), axis=1)
+    return centers, rotations, extents
+
+
+def get_support(types, centers, rotations, extents, directions):
+    # Furthest extent of each gizmo along a direction (one direction per gizmo)
+    local = np.einsum("nji,nj->ni", rotations, directions)  # Direction in the gizmo's local axes
+    support = np.einsum("ni,ni->n", centers, directions)
+
+    box = types == "box"
+    support[box] += np.sum(extents[box] * np.abs(local[box]), axis=1)
+    sphere = types == "sphere"
+    support[sphere] += extents[sphere, 0]
+    cylinder = types == "cylinder"
+    axial = local[cylinder, 2]
+    support[cylinder] += extents[cylinder, 2] * np.abs(axial) + extents[cylinder, 0] * np.sqrt(np.maximum(1 - axial ** 2, 0))
+    return support
+
+
+def get_bounds(types, centers, rotations, extents):
+    mins = np.empty_like(centers)
+    maxs = np.empty_like(centers)
+    for axis in range(3):
+        direction = np.zeros_like(centers)
+        direction[:, axis] = 1
+        maxs[:, axis] = get_support(types, centers, rotations, extents, direction)
+        mins[:, axis] = -get_support(types, centers, rotations, extents, -direction)
+    return mins, maxs
+
+
+def get_hull_points(types, centers, rotations, extents, rim_segments=32):
+    # Points whose hull is the gizmo: box corners (exact) or cylinder rims (sampled), padded to the same count.
+    # Spheres are handled analytically and just get their center
+    corners = np.array([[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+    angles = np.linspace(0, 2 * np.pi, rim_segments, endpoint=False)
+    ring = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+    rims = np.concatenate((
+        np.column_stack((ring, np.full(rim_segments, 1.0))),
+        np.column_stack((ring, np.full(rim_segments, -1.0))),
+    ))
+    count = len(rims)
+
+    unit = np.zeros((len(types), count, 3))
+    unit[types == "box"] = np.resize(corners, (count, 3))
+    unit[types == "cylinder"] = rims
+
+    local = unit * extents[:, None, :]
+    return centers[:, None, :] + np.einsum("nij,nkj->nki", rotations, local)
+
+
+def is_contained(types, centers, rotations, extents, inner, outer, tolerance=1e-4):
+    # Whether gizmo inner[i] lies completely inside gizmo outer[i]
+    inner_types = types[inner]
+    outer_types = types[outer]
+    result = np.ones(len(inner), dtype=bool)
+
+    def support(directions):
+        return get_support(inner_types, centers[inner], rotations[inner], extents[inner], directions)
+
+    tolerances = tolerance * np.max(extents[outer], axis=1)
+
+    # Slabs: box faces, and the caps of cylinders. Exact for every inner type through its support function
+    for axis in range(3):
+        slab = (outer_types == "box") | ((outer_types == "cylinder") & (axis == 2))
+        if not np.any(slab):
+            continue
+        direction = rotations[outer, :, axis]
+        offset = np.einsum("ni,ni->n", centers[outer], direction)
+        limit = extents[outer, axis] + tolerances
+        inside = (support(direction) - offset <= limit) & (support(-direction) + offset <= limit)
+        result &= ~slab | inside
+
+    # Distance to the center of spheres, and to the axis of cylinders
+    round_outer = (outer_types == "sphere") | (outer_types == "cylinder")
+    if np.any(round_outer):
+        pairs = np.nonzero(round_outer & result)[0]
+        points = get_hull_points(inner_types[pairs], centers[inner[pairs]], rotations[inner[pairs]], extents[inner[pairs]])
+        offsets = points - centers[outer[pairs], None, :]
+        axis = rotations[outer[pairs], :, 2]
+        radial = outer_types[pairs] == "cylinder"
+        offsets[radial] -= np.einsum("nk,ni->nki", np.einsum("nki,ni->nk", offsets[radial], axis[radial]), axis[radial])
+
+        # Hull points of a sphere are only its center, add the radius on top
+        inner_radii = np.where(inner_types[pairs] == "sphere", extents[inner[pairs], 0], 0.0)
+        distances = np.max(np.linalg.norm(offsets, axis=2), axis=1) + inner_radii
+        result[pairs] &= distances <= extents[outer[pairs], 0] + tolerances[pairs]
+
+    return result
+
+
+def find_overlapping_pairs(mins, maxs, max_pairs_per_chunk=1 << 22):
+    # Sweep and prune along the axis with the largest spread, then check the other two axes
+    count = len(mins)
+    if count < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    axis = int(np.argmax(np.ptp(mins, axis=0)))
+    order = np.argsort(mins[:, axis], kind="stable")
+    sorted_mins = mins[order, axis]
+    ends = np.searchsorted(sorted_mins, maxs[order, axis], side="right")
+    candidates = np.maximum(ends - np.arange(count) - 1, 0)
+
+    first_pairs = []
+    second_pairs = []
+    start = 0
+    cumulative = np.cumsum(candidates)
+    while start < count:
+        # Process as many sweep positions as fit in the pair budget (at least one)
+        done = cumulative[start - 1] if start > 0 else 0
+        end = max(int(np.searchsorted(cumulative, done + max_pairs_per_chunk, side="right")), start + 1)
+        chunk = candidates[start:end]
+        first = np.repeat(np.arange(start, end), chunk)
+        second = first + 1 + np.arange(chunk.sum()) - np.repeat(np.cumsum(chunk) - chunk, chunk)
+
+        a = order[first]
+        b = order[second]
+        overlap = np.all((mins[a] <= maxs[b]) & (mins[b] <= maxs[a]), axis=1)
+        first_pairs.append(a[overlap])
+        second_pairs.append(b[overlap])
+        start = end
+
+    return np.concatenate(first_pairs), np.concatenate(second_pairs)
+
+
+def find_redundant_gizmos(types, matrices, groups=None):
+    # A gizmo is redundant when it sits completely inside another one. Of identical gizmos, the first one is kept.
+    # If groups is given, only gizmos of the same group are compared
+    types = np.asarray(types)
+    centers, rotations, extents = get_gizmo_volumes(types, matrices)
+    mins, maxs = get_bounds(types, centers, rotations, extents)
+    a, b = find_overlapping_pairs(mins, maxs)
+    if groups is not None:
+        groups = np.asarray(groups)
+        same_group = groups[a] == groups[b]
+        a, b = a[same_group], b[same_group]
+
+    a_in_b = is_contained(types, centers, rotations, extents, a, b)
+    b_in_a = is_contained(types, centers, rotations, extents, b, a)
+
+    redundant = np.zeros(len(types), dtype=bool)
+    redundant[a[a_in_b & ~b_in_a]] = True
+    redundant[b[b_in_a & ~a_in_b]] = True
+    both = a_in_b & b_in_a
+    redundant[np.maximum(a[both], b[both])] = True
+    return redundant
@@ -0,0 +1,146 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bpy
+import numpy as np
+
+
+class MSFS_OT_BulkEditLights(bpy.types.Operator):
+    """Set, offset or sequence an MSFS light parameter on all selected lights"""
+
+    bl_idname = "msfs.bulk_edit_lights"
+    bl_label = "Edit Selected Lights"
+    bl_options = {"REGISTER", "UNDO"}
+
+    light_property: bpy.props.EnumProperty(
+        name="Parameter",
+        items=(
+            ("msfs_light_flash_frequency", "Flash Frequency", ""),
+            ("msfs_light_flash_duration", "Flash Duration", ""),
+            ("msfs_light_flash_phase", "Flash Phase", ""),
+            ("msfs_light_rotation_speed", "Rotation Speed", ""),
+            ("msfs_light_has_symmetry", "Has Symmetry", ""),
+            ("msfs_light_day_night_cycle", "Day/Night Cycle", ""),
+        ),
+        default="msfs_light_flash_phase",
+    )
+    mode: bpy.props.EnumProperty(
+        name="Mode",
+        items=(
+            ("SET", "Set", "Give every light the same value"),
+            ("OFFSET", "Offset", "Add a value to the current one of every light"),
+            ("SEQUENCE", "Sequence", "Increase the value light after light, e.g. a phase ramp for rabbit lights"),
+        ),
+        default="SET",
+    )
+    value: bpy.props.FloatProperty(name="Value", default=0.0)
+    bool_value: bpy.props.BoolProperty(name="Value", default=False)
+    step: bpy.props.FloatProperty(
+        name="Step",
+        description="Value added from one light to the next",
+        default=0.1,
+    )
+    wrap: bpy.props.FloatProperty(
+        name="Wrap",
+        description="Wrap the sequence around this value, 0 to disable",
+        min=0.0,
+        default=0.0,
+    )
+    order: bpy.props.EnumProperty(
+        name="Order",
+        description="Order of the lights in the sequence",
+        items=(
+            ("NAME", "Name", "Sort the lights by name"),
+            ("DISTANCE", "Distance", "Sort the lights by distance to the active light"),
+            ("AXIS", "Main Axis", "Sort the lights along the line they are laid out on, starting from the active light's end"),
+        ),
+        default="AXIS",
+    )
+
+    @staticmethod
+    def is_bool_property(property):
+        return bpy.types.Object.bl_rna.properties[property].type == "BOOLEAN"
+
+    @staticmethod
+    def get_order(lights, active, order):
+        if order == "NAME":
+            return sorted(range(len(lights)), key=lambda i: lights[i].name)
+
+        positions = np.array([light.matrix_world.translation for light in lights], dtype=np.float64)
+        origin = positions.mean(axis=0)
+        if active in lights:
+            origin = positions[lights.index(active)]
+
+        if order == "DISTANCE":
+            keys = np.linalg.norm(positions - origin, axis=1)
+        else:
+            # Project on the principal axis of the positions, pointing away from the active light
+            centered = positions - positions.mean(axis=0)
+            axis = np.linalg.svd(centered, full_matrices=False)[2][0]
+            keys = centered @ axis
+            if np.dot(origin - positions.mean(axis=0), axis) > 0:
+                keys = -keys
+        return np.argsort(keys, kind="stable").tolist()
+
+    def get_values(self, lights, context):
+        current = np.array([getattr(light, self.light_property) for light in lights], dtype=np.float64)
+        if self.mode == "SET":
+            values = np.full(len(lights), self.value)
+        elif self.mode == "OFFSET":
+            values = current + self.value
+        else:
+            ranks = np.empty(len(lights), dtype=np.float64)
+            ranks[self.get_order(lights, context.active_object, self.order)] = np.arange(len(lights))
+            values = self.value + ranks * self.step
+            if self.wrap > 0:
+                values = np.mod(values - self.value, self.wrap) + self.value
+
+        rna_property = bpy.types.Object.bl_rna.properties[self.light_property]
+        return np.clip(values, rna_property.hard_min, rna_property.hard_max)
+
+    def invoke(self, context, event):
+        wm = context.window_manager
+        return wm.invoke_props_dialog(self)
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(self, "light_property")
+        if self.is_bool_property(self.light_property):
+            layout.prop(self, "bool_value")
+            return
+
+        layout.prop(self, "mode")
+        layout.prop(self, "value", text="Start" if self.mode == "SEQUENCE" else "Value")
+        if self.mode == "SEQUENCE":
+            layout.prop(self, "step")
+            layout.prop(self, "wrap")
+            layout.prop(self, "order")
+
+    def execute(self, context):
+        lights = [obj for obj in context.selected_objects if obj.type == "LIGHT"]
+        if not lights:
+            self.report({"WARNING"}, "No lights selected")
+            return {"CANCELLED"}
+
+        if self.is_bool_property(self.light_property):
+            for light in lights:
+                setattr(light, self.light_property, self.bool_value)
+        else:
+            for light, value in zip(lights, self.get_values(lights, context).tolist()):
+                setattr(light, self.light_property, value)
+
+        self.report({"INFO"}, "Edited %d lights" % len(lights))
+        return {"FINISHED"}
@@ -0,0 +1,204 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bpy
+import time
+
+from .msfs_material_prop_update import MSFS_Material_Property_Update
+
+# Blender needs the strings returned by dynamic enum items to stay referenced
+material_type_items_cache = []
+
+
+def get_material_type_items(self, context):
+    if not material_type_items_cache:
+        for item in bpy.types.Material.bl_rna.properties["msfs_material_type"].enum_items:
+            if item.identifier != "NONE":
+                material_type_items_cache.append((item.identifier, item.name, item.description))
+    return material_type_items_cache
+
+
+class MSFS_OT_ConvertMaterials(bpy.types.Operator):
+    """Convert many materials to an MSFS material type at once, optionally taking the values and textures from their Principled BSDF"""
+
+    bl_idname = "msfs.convert_materials"
+    bl_label = "Convert to MSFS Materials"
+    bl_options = {"REGISTER", "UNDO"}
+
+    material_type: bpy.props.EnumProperty(
+        name="Type",
+        description="MSFS material type to convert to",
+        items=get_material_type_items,
+    )
+    scope: bpy.props.EnumProperty(
+        name="Materials",
+        items=(
+            ("SELECTED", "Selected Objects", "Convert the materials of the selected objects"),
+            ("ALL", "All Materials", "Convert every material in the file"),
+        ),
+        default="SELECTED",
+    )
+    map_factors: bpy.props.BoolProperty(
+        name="Map Principled Factors",
+        description="Copy the base color, alpha, metallic, roughness, normal strength and emission values of the Principled BSDF to the MSFS factors",
+        default=True,
+    )
+    map_textures: bpy.props.BoolProperty(
+        name="Map Principled Textures",
+        description="Assign the images plugged into the Principled BSDF to the matching MSFS texture slots",
+        default=True,
+    )
+
+    @staticmethod
+    def get_materials(context, scope):
+        if scope == "ALL":
+            return [mat for mat in bpy.data.materials if not mat.is_grease_pencil]
+
+        materials = []
+        found = set()
+        for obj in context.selected_objects:
+            for slot in obj.material_slots:
+                mat = slot.material
+                if mat is None or mat.is_grease_pencil or mat.name in found:
+                    continue
+                found.add(mat.name)
+                materials.append(mat)
+        return materials
+
+    @staticmethod
+    def get_linked_image(socket):
+        # Follow the link back through normal map and separate nodes until we find an image texture
+        while socket is not None and socket.is_linked:
+            node = socket.links[0].from_node
+            if node.type == "TEX_IMAGE":
+                return node.image
+            elif node.type == "NORMAL_MAP":
+                socket = node.inputs.get("Color")
+            elif node.type in ["SEPRGB", "SEPARATE_COLOR", "SEPXYZ"]:
+                socket = node.inputs[0]
+            else:
+                return None
+        return None
+
+    @staticmethod
+    def gather_principled_values(mat, map_factors, map_textures):
+        values = {}
+        if mat.node_tree is None:
+            return values
+
+        bsdf = None
+        for node in mat.node_tree.nodes:
+            if node.type == "BSDF_PRINCIPLED":
+                bsdf = node
+                break
+        if bsdf is None:
+            return values
+
+        inputs = bsdf.inputs
+        get_linked_image = MSFS_OT_ConvertMaterials.get_linked_image
+
+        if map_factors:
+            base_color = list(inputs["Base Color"].default_value)
+            base_color[3] = inputs["Alpha"].default_value
+            values["msfs_base_color_factor"] = base_color
+            values["msfs_metallic_factor"] = inputs["Metallic"].default_value
+            values["msfs_roughness_factor"] = inputs["Roughness"].default_value
+            values["msfs_emissive_factor"] = list(inputs["Emission"].default_value)[0:3]
+            if inputs.get("Emission Strength") is not None:
+                values["msfs_emissive_scale"] = min(inputs["Emission Strength"].default_value, 1.0)
+
+            normal_socket = inputs["Normal"]
+            if normal_socket.is_linked and normal_socket.links[0].from_node.type == "NORMAL_MAP":
+                values["msfs_normal_scale"] = min(normal_socket.links[0].from_node.inputs["Strength"].default_value, 1.0)
+
+        if map_textures:
+            base_color_texture = get_linked_image(inputs["Base Color"])
+            if base_color_texture is not None:
+                values["msfs_base_color_texture"] = base_color_texture
+                if map_factors:
+                    # The texture already holds the color, the factor only tints it
+                    values["msfs_base_color_factor"] = [1.0, 1.0, 1.0, inputs["Alpha"].default_value]
+
+            comp_texture = get_linked_image(inputs["Roughness"]) or get_linked_image(inputs["Metallic"])
+            if comp_texture is not None:
+                values["msfs_occlusion_metallic_roughness_texture"] = comp_texture
+                if map_factors:
+                    values["msfs_metallic_factor"] = 1.0
+                    values["msfs_roughness_factor"] = 1.0
+
+            normal_texture = get_linked_image(inputs["Normal"])
+            if normal_texture is not None:
+                values["msfs_normal_texture"] = normal_texture
+
+            emissive_texture = get_linked_image(inputs["Emission"])
+            if emissive_texture is not None:
+                values["msfs_emissive_texture"] = emissive_texture
+
+        return values
+
+    @staticmethod
+    def convert_material(mat, material_type, values, context):
+        if mat.node_tree is None:
+            mat.use_nodes = True
+
+        # Set everything without triggering the update callbacks, then build the node tree once
+        set_without_update = MSFS_Material_Property_Update.set_without_update
+        for prop, value in values.items():
+            set_without_update(mat, prop, value)
+        set_without_update(mat, "msfs_material_type", material_type)
+
+        MSFS_Material_Property_Update.update_msfs_material_type(mat, context)
+
+    def invoke(self, context, event):
+        wm = context.window_manager
+        return wm.invoke_props_dialog(self)
+
+    def execute(self, context):
+        materials = MSFS_OT_ConvertMaterials.get_materials(context, self.scope)
+        if not materials:
+            self.report({"WARNING"}, "No materials to convert")
+            return {"CANCELLED"}
+
+        start_time = time.perf_counter()
+
+        # Gather everything first, the new trees replace the Principled BSDF setups we read from
+        gathered = [
+            (mat, MSFS_OT_ConvertMaterials.gather_principled_values(mat, self.map_factors, self.map_textures))
+            for mat in materials
+        ]
+        for mat, values in gathered:
+            MSFS_OT_ConvertMaterials.convert_material(mat, self.material_type, values, context)
+
+        elapsed = time.perf_counter() - start_time
+        self.report(
+            {"INFO"},
+            "Converted %d materials in %.2fs (%.0f materials/s)" % (len(materials), elapsed, len(materials) / max(elapsed, 1e-6)),
+        )
+
+        return {"FINISHED"}
+
+
+def draw_menu(self, context):
+    self.layout.separator()
+    self.layout.operator(MSFS_OT_ConvertMaterials.bl_idname)
+
+
+def register():
+    bpy.types.MATERIAL_MT_context_menu.append(draw_menu)
+
+
+def unregister():
+    bpy.types.MATERIAL_MT_context_menu.remove(draw_menu)
@@ -124,9 +124,15 @@ class MSFS_Material:
         self.node_tree = self.material.node_tree
         self.nodes = self.material.node_tree.nodes
         self.links = material.node_tree.links
+        self.reconciling = False
         if buildTree:
-            self.__buildShaderTree()
-            self.force_update_properties()
+            from .msfs_material_viewport_preview import MSFS_Viewport_Preview, MSFS_Lite_Preview
+
+            if not isinstance(self, MSFS_Lite_Preview) and MSFS_Viewport_Preview.is_lite_material(material):
+                MSFS_Lite_Preview(material, buildTree=True)
+            else:
+                self.__buildShaderTree()
+                self.force_update_properties()
         self.principledBSDF = self.getNodesByClassName("ShaderNodeBsdfPrincipled")[0]
 
     def revertToPBRShaderTree(self):
@@ -134,8 +140,47 @@ class MSFS_Material:
         self.__createPBRTree()
 
     def __buildShaderTree(self):
-        self.cleanNodeTree()
-        self.createNodetree()
+        # Instead of wiping the tree, reconcile it with the one of the new material type. Nodes both types have in common
+        # are kept along with their images, and only the differences get added, removed or relinked
+        self.reconcileNodeTree(self.createNodetree)
+
+    def reconcileNodeTree(self, buildFunction):
+        self.reconciling = True
+        self.claimedNodes = set()
+        self.claimedLinks = set()
+        try:
+            buildFunction()
+        finally:
+            self.reconciling = False
+
+        links = self.node_tree.links
+        for link in list(links):
+            if link.as_pointer() not in self.claimedLinks:
+                links.remove(link)
+
+        nodes = self.node_tree.nodes
+        for node in list(nodes):
+            if node.as_pointer() not in self.claimedNodes:
+                nodes.remove(node)
+
+    def claimNode(self, nodetype, name):
+        if name is not None:
+            node = self.getNode(name)
+            if node is None:
+                return None
+            if node.bl_idname != nodetype or node.as_pointer() in self.claimedNodes:
+                # Free the name for the node that is about to be created
+                self.node_tree.nodes.remove(node)
+                return None
+            self.claimedNodes.add(node.as_pointer())
+            return node
+
+        # Unnamed nodes (output, BSDF) are matched on their type
+        for node in self.node_tree.nodes:
+            if node.bl_idname == nodetype and node.as_pointer() not in self.claimedNodes:
+                self.claimedNodes.add(node.as_pointer())
+                return node
+        return None
 
     def force_update_properties(self):
         from .msfs_material_prop_update import MSFS_Material_Property_Update
@@ -180,11 +225,7 @@ class MSFS_Material:
         self.material.msfs_base_color_factor = self.material.msfs_base_color_factor
 
     def cleanNodeTree(self):
-        nodes = self.material.node_tree.nodes
-
-        for idx, node in enumerate(nodes):
-            print("Deleting: %s | %s" % (node.name, node.type))
-            nodes.remove(node)
+        self.material.node_tree.nodes.clear()
 
     def __createPBRTree(self):
         self.nodeOutputMaterial = self.addNode(
@@ -575,7 +616,7 @@ class MSFS_Material:
 
     def setAnisotropicTex(self, tex):
         self.nodeAnisotropicTex = self.getNode(MSFS_AnisotropicNodes.anisotropicTex.value)
-        self.nodeAnisotropicTex.image = tex
+        self.nodeAnisotropicTex.image = self.getViewportImage(tex)
         if not self.nodeAnisotropicTex.image:
             self.principledBSDF = self.getNodesByClassName("ShaderNodeBsdfPrincipled")[0]
             self.unLinkNodeInput(self.principledBSDF, 10)
@@ -612,12 +653,12 @@ class MSFS_Material:
         self.nodeBaseColorTex = self.getNode(MSFS_ShaderNodes.baseColorTex.value)
         if not self.nodeBaseColorTex:
             return
-        self.nodeBaseColorTex.image = tex
+        self.nodeBaseColorTex.image = self.getViewportImage(tex)
         self.updateColorLinks()
 
     def setDetailColorTex(self, tex):
         self.nodeDetailColor = self.getNode(MSFS_ShaderNodes.detailColorTex.value)
-        self.nodeDetailColor.image = tex
+        self.nodeDetailColor.image = self.getViewportImage(tex)
         self.updateColorLinks()
 
     def updateColorLinks(self):
@@ -719,15 +760,15 @@ class MSFS_Material:
     def setCompTex(self, tex):
         self.nodeCompTex = self.getNode(MSFS_ShaderNodes.compTex.value)
         if tex is not None:
-            self.nodeCompTex.image = tex
-            self.nodeCompTex.image.colorspace_settings.name = "Non-Color"
+            tex.colorspace_settings.name = "Non-Color"
+            self.nodeCompTex.image = self.getViewportImage(tex)
             self.updateCompLinks()
 
     def setDetailCompTex(self, tex):
         self.nodeDetailCompTex = self.getNode(MSFS_ShaderNodes.detailCompTex.value)
         if tex is not None:
-            self.nodeDetailCompTex.image = tex
-            self.nodeDetailCompTex.image.colorspace_settings.name = "Non-Color"
+            tex.colorspace_settings.name = "Non-Color"
+            self.nodeDetailCompTex.image = self.getViewportImage(tex)
             self.updateCompLinks()
 
     def setRoughnessScale(self, scale):
@@ -747,8 +788,8 @@ class MSFS_Material:
     def setEmissiveTexture(self, tex):
         self.nodeEmissiveTex = self.getNode(MSFS_ShaderNodes.emissiveTex.value)
         if tex is not None:
-            self.nodeEmissiveTex.image = tex
-            self.nodeEmissiveTex.image.colorspace_settings.name = "Non-Color"
+            tex.colorspace_settings.name = "Non-Color"
+            self.nodeEmissiveTex.image = self.getViewportImage(tex)
             self.updateEmissiveLinks()
 
     def setEmissiveScale(self, scale):
@@ -781,15 +822,15 @@ class MSFS_Material:
     def setDetailNormalTex(self, tex):
         self.nodeDetailNormalTex = self.getNode(MSFS_ShaderNodes.detailNormalTex.value)
         if tex is not None:
-            self.nodeDetailNormalTex.image = tex
-            self.nodeDetailNormalTex.image.colorspace_settings.name = "Non-Color"
+            tex.colorspace_settings.name = "Non-Color"
+            self.nodeDetailNormalTex.image = self.getViewportImage(tex)
             self.updateNormalLinks()
 
     def setNormalTex(self, tex):
         self.nodeNormalTex = self.getNode(MSFS_ShaderNodes.normalTex.value)
         if tex is not None:
-            self.nodeNormalTex.image = tex
-            self.nodeNormalTex.image.colorspace_settings.name = "Non-Color"
+            tex.colorspace_settings.name = "Non-Color"
+            self.nodeNormalTex.image = self.getViewportImage(tex)
             self.updateNormalLinks()
 
     def updateNormalLinks(self):
@@ -1045,7 +1086,13 @@ class MSFS_Material:
         return socket
 
     def addNode(self, nodetype, attrs):
-        node = self.node_tree.nodes.new(nodetype)
+        node = None
+        if self.reconciling:
+            node = self.claimNode(nodetype, attrs.get("name"))
+        if node is None:
+            node = self.node_tree.nodes.new(nodetype)
+            if self.reconciling:
+                self.claimedNodes.add(node.as_pointer())
         # make sure label and name are the same
         if "name" in attrs and "label" not in attrs:
             attrs["label"] = attrs["name"]
@@ -1055,6 +1102,11 @@ class MSFS_Material:
             self.value_set(node, attr, attrs[attr])
         return node
 
+    def getViewportImage(self, tex):
+        from .msfs_material_viewport_preview import MSFS_Viewport_Preview
+
+        return MSFS_Viewport_Preview.get_viewport_image(tex)
+
     def getNode(self, nodename):
         if self.node_tree.nodes.find(nodename) > -1:
             return self.node_tree.nodes[nodename]
@@ -1070,7 +1122,9 @@ class MSFS_Material:
     def innerLink(self, socketin:string, socketout:string):
         SI = self.node_tree.path_resolve(socketin)
         SO = self.node_tree.path_resolve(socketout)
-        self.node_tree.links.new(SI, SO)
+        link = self.node_tree.links.new(SI, SO)
+        if self.reconciling:
+            self.claimedLinks.add(link.as_pointer())
 
     def unLinkNodeInput(self, node, inputIndex):
         for link in node.inputs[inputIndex].links:
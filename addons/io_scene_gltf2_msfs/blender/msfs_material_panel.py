@@ -16,6 +16,8 @@
 
 import bpy
 
+from bpy.app.handlers import persistent
+
 from .msfs_material_prop_update import MSFS_Material_Property_Update
 
 
@@ -61,6 +63,18 @@ class MSFS_OT_MigrateMaterialData(bpy.types.Operator): # TODO: Remove eventually
         "msfs_behind_glass_texture": "msfs_detail_color_texture",
     }
 
+    # Legacy properties that aren't a simple rename and get converted by hand in migrate_material
+    special_properties = [
+        "msfs_color_alpha_mix",
+        "msfs_color_albedo_mix",
+        "msfs_color_emissive_mix",
+        "msfs_blend_mode",
+        "msfs_material_mode",
+    ]
+
+    # Panel redraws happen constantly, so remember which materials we already scanned
+    needs_migration_cache = {}
+
     @staticmethod
     def old_properties_present(mat):
         if len(mat.keys()) > 0: # Don't unnecessarily loop if we have no properties on the material
@@ -69,13 +83,31 @@ class MSFS_OT_MigrateMaterialData(bpy.types.Operator): # TODO: Remove eventually
                     return True
         return False
 
-    def execute(self, context):
-        mat = context.active_object.active_material
+    @staticmethod
+    def needs_migration(mat):
+        key = mat.as_pointer()
+        needs_migration = MSFS_OT_MigrateMaterialData.needs_migration_cache.get(key)
+        if needs_migration is None:
+            needs_migration = MSFS_OT_MigrateMaterialData.old_properties_present(mat)
+            MSFS_OT_MigrateMaterialData.needs_migration_cache[key] = needs_migration
+        return needs_migration
+
+    @staticmethod
+    def get_legacy_properties(mat):
+        legacy_properties = set(MSFS_OT_MigrateMaterialData.old_property_to_new_mapping)
+        legacy_properties.update(MSFS_OT_MigrateMaterialData.special_properties)
+        return legacy_properties.intersection(mat.keys())
+
+    @staticmethod
+    def migrate_material(mat, legacy_properties):
+        # Node tree updates are skipped here, the caller is responsible for rebuilding the tree afterwards
+        set_without_update = MSFS_Material_Property_Update.set_without_update
+
         for (
             old_property,
             new_property,
         ) in MSFS_OT_MigrateMaterialData.old_property_to_new_mapping.items():
-            if mat.get(old_property) is not None:
+            if old_property in legacy_properties and mat.get(old_property) is not None:
                 # msfs_behind_glass_texture and msfs_detail_albedo_texture are special cases as they are they write to the same property
                 if mat.get("msfs_material_mode") == "msfs_windshield" and old_property == "msfs_behind_glass_texture":
                     continue
@@ -95,25 +127,31 @@ class MSFS_OT_MigrateMaterialData(bpy.types.Operator): # TODO: Remove eventually
             base_color = list(mat.get("msfs_color_albedo_mix"))
             if len(base_color) == 3:
                 base_color.append(alpha)
-        mat.msfs_base_color_factor = base_color
+        if "msfs_color_alpha_mix" in legacy_properties or "msfs_color_albedo_mix" in legacy_properties:
+            set_without_update(mat, "msfs_base_color_factor", base_color)
 
         # Emissive factor is also a special case - old material system had 4 floats, we only need 3
         if mat.get("msfs_color_emissive_mix"):
-            mat.msfs_emissive_factor = mat.get("msfs_color_emissive_mix")[0:3]
+            set_without_update(mat, "msfs_emissive_factor", mat.get("msfs_color_emissive_mix")[0:3])
+
+        # The mixes are converted now, leaving them would make the material count as legacy again
+        for old_property in ("msfs_color_alpha_mix", "msfs_color_albedo_mix", "msfs_color_emissive_mix"):
+            if old_property in mat:
+                del mat[old_property]
 
         # Do our enums manually as only their index of the value are stored - not the string
-        if mat.get("msfs_blend_mode"):
+        if mat.get("msfs_blend_mode") is not None:
             old_alpha_order = [
                 "OPAQUE",
                 "MASK",  # Changed from old version - matches new name
                 "BLEND",
                 "DITHER",
             ]
-            mat.msfs_alpha_mode = old_alpha_order[mat["msfs_blend_mode"]]
+            set_without_update(mat, "msfs_alpha_mode", old_alpha_order[mat["msfs_blend_mode"]])
 
             del mat["msfs_blend_mode"]
 
-        if mat.get("msfs_material_mode"):
+        if mat.get("msfs_material_mode") is not None:
             old_material_older = [  # Assuming the user uninstalled the old plugin, the index of the value will be stored instead of the name of the current material. Replicate the order here
                 "NONE",
                 "msfs_standard",
@@ -132,15 +170,52 @@ class MSFS_OT_MigrateMaterialData(bpy.types.Operator): # TODO: Remove eventually
                 "msfs_hair",
                 "msfs_invisible",
             ]
-            mat.msfs_material_type = old_material_older[mat["msfs_material_mode"]]
+            set_without_update(mat, "msfs_material_type", old_material_older[mat["msfs_material_mode"]])
 
             del mat["msfs_material_mode"]
 
+        MSFS_OT_MigrateMaterialData.needs_migration_cache.pop(mat.as_pointer(), None)
+
+    def execute(self, context):
+        mat = context.active_object.active_material
+        MSFS_OT_MigrateMaterialData.migrate_material(
+            mat, MSFS_OT_MigrateMaterialData.get_legacy_properties(mat)
+        )
+
         MSFS_Material_Property_Update.update_msfs_material_type(mat, context)
 
         return {"FINISHED"}
 
 
+class MSFS_OT_MigrateAllMaterialData(bpy.types.Operator): # TODO: Remove eventually
+    """Migrate the older properties of every material in the file.\nWARNING: This removes all the old properties from the materials"""
+
+    bl_idname = "msfs.migrate_all_material_data"
+    bl_label = "Migrate All Materials"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        # Scan every material once, indexing the legacy properties each one has
+        legacy_index = []
+        for mat in bpy.data.materials:
+            legacy_properties = MSFS_OT_MigrateMaterialData.get_legacy_properties(mat)
+            if legacy_properties:
+                legacy_index.append((mat, legacy_properties))
+
+        for mat, legacy_properties in legacy_index:
+            MSFS_OT_MigrateMaterialData.migrate_material(mat, legacy_properties)
+
+        # Node trees are only rebuilt once all the data is migrated
+        for mat, _ in legacy_index:
+            MSFS_Material_Property_Update.update_msfs_material_type(mat, context)
+
+        MSFS_OT_MigrateMaterialData.needs_migration_cache.clear()
+
+        self.report({"INFO"}, "Migrated %d materials" % len(legacy_index))
+
+        return {"FINISHED"}
+
+
 class MSFS_PT_Material(bpy.types.Panel):
     bl_label = "MSFS Material Params"
     bl_space_type = "PROPERTIES"
@@ -180,8 +255,9 @@ class MSFS_PT_Material(bpy.types.Panel):
         mat = context.active_object.active_material
 
         if mat:
-            if MSFS_OT_MigrateMaterialData.old_properties_present(mat):
+            if MSFS_OT_MigrateMaterialData.needs_migration(mat):
                 layout.operator(MSFS_OT_MigrateMaterialData.bl_idname)
+                layout.operator(MSFS_OT_MigrateAllMaterialData.bl_idname)
 
             self.draw_prop(layout, mat, "msfs_material_type")
 
@@ -567,3 +643,20 @@ class MSFS_PT_Material(bpy.types.Panel):
                         self.draw_texture_prop(
                             box, mat, "msfs_dirt_texture", text=dirt_texture_name
                         )
+
+
+@persistent
+def clear_migration_cache(dummy):
+    MSFS_OT_MigrateMaterialData.needs_migration_cache.clear()
+
+
+def register():
+    bpy.app.handlers.load_post.append(clear_migration_cache)
+    bpy.app.handlers.undo_post.append(clear_migration_cache)
+    bpy.app.handlers.redo_post.append(clear_migration_cache)
+
+
+def unregister():
+    bpy.app.handlers.load_post.remove(clear_migration_cache)
+    bpy.app.handlers.undo_post.remove(clear_migration_cache)
+    bpy.app.handlers.redo_post.remove(clear_migration_cache)
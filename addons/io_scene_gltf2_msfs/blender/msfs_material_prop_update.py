@@ -32,43 +32,62 @@ from .material.msfs_material_fake_terrain import MSFS_Fake_Terrain
 from .material.msfs_material_fresnel_fade import MSFS_Fresnel_Fade
 from .material.msfs_material_environment_occluder import MSFS_Environment_Occluder
 from .material.msfs_material_ghost import MSFS_Ghost
+from .msfs_material_viewport_preview import MSFS_Viewport_Preview, MSFS_Lite_Preview
 
 
 class MSFS_Material_Property_Update:
     @staticmethod
-    def getMaterial(mat):
+    def getMaterial(mat, buildTree=False):
+        if not buildTree and MSFS_Viewport_Preview.is_lite_material(mat):
+            return MSFS_Lite_Preview(mat)
+
         if mat.msfs_material_type == "msfs_standard":
-            return MSFS_Standard(mat)
+            return MSFS_Standard(mat, buildTree)
         elif mat.msfs_material_type == "msfs_geo_decal":
-            return MSFS_Geo_Decal(mat)
+            return MSFS_Geo_Decal(mat, buildTree)
         elif mat.msfs_material_type == "msfs_geo_decal_frosted":
-            return MSFS_Geo_Decal_Frosted(mat)
+            return MSFS_Geo_Decal_Frosted(mat, buildTree)
         elif mat.msfs_material_type == "msfs_windshield":
-            return MSFS_Windshield(mat)
+            return MSFS_Windshield(mat, buildTree)
         elif mat.msfs_material_type == "msfs_porthole":
-            return MSFS_Porthole(mat)
+            return MSFS_Porthole(mat, buildTree)
         elif mat.msfs_material_type == "msfs_glass":
-            return MSFS_Glass(mat)
+            return MSFS_Glass(mat, buildTree)
         elif mat.msfs_material_type == "msfs_clearcoat":
-            return MSFS_Clearcoat(mat)
+            return MSFS_Clearcoat(mat, buildTree)
         elif mat.msfs_material_type == "msfs_parallax":
-            return MSFS_Parallax(mat)
+            return MSFS_Parallax(mat, buildTree)
         elif mat.msfs_material_type == "msfs_anisotropic":
-            return MSFS_Anisotropic(mat)
+            return MSFS_Anisotropic(mat, buildTree)
         elif mat.msfs_material_type == "msfs_hair":
-            return MSFS_Hair(mat)
+            return MSFS_Hair(mat, buildTree)
         elif mat.msfs_material_type == "msfs_sss":
-            return MSFS_SSS(mat)
+            return MSFS_SSS(mat, buildTree)
         elif mat.msfs_material_type == "msfs_invisible":
-            return MSFS_Invisible(mat)
+            return MSFS_Invisible(mat, buildTree)
         elif mat.msfs_material_type == "msfs_fake_terrain":
-            return MSFS_Fake_Terrain(mat)
+            return MSFS_Fake_Terrain(mat, buildTree)
         elif mat.msfs_material_type == "msfs_fresnel_fade":
-            return MSFS_Fresnel_Fade(mat)
+            return MSFS_Fresnel_Fade(mat, buildTree)
         elif mat.msfs_material_type == "msfs_environment_occluder":
-            return MSFS_Environment_Occluder(mat)
+            return MSFS_Environment_Occluder(mat, buildTree)
         elif mat.msfs_material_type == "msfs_ghost":
-            return MSFS_Ghost(mat)
+            return MSFS_Ghost(mat, buildTree)
+
+    @staticmethod
+    def set_without_update(mat, prop, value):
+        # Writing the underlying ID property skips the update callback, which is what we want when
+        # setting a lot of properties at once and only building the node tree at the end
+        rna_prop = mat.bl_rna.properties[prop]
+        if value is None:
+            if mat.get(prop) is not None:
+                del mat[prop]
+            return
+        if rna_prop.type == "ENUM":
+            value = rna_prop.enum_items[value].value
+        elif rna_prop.type == "FLOAT" and rna_prop.is_array:
+            value = list(value)
+        mat[prop] = value
 
     @staticmethod
     def update_msfs_material_type(self, context):
@@ -178,7 +197,7 @@ class MSFS_Material_Property_Update:
             if behind_glass != None:
                 self.node_tree.nodes[
                     "behind_glass"
-                ].image = self.msfs_detail_color_texture
+                ].image = MSFS_Viewport_Preview.get_viewport_image(self.msfs_detail_color_texture)
                 if self.msfs_detail_color_texture.name != "":
                     # Create the link:
                     if behind_glass != None and albedo_detail_mix != None:
@@ -205,6 +224,8 @@ class MSFS_Material_Property_Update:
     @staticmethod
     def update_detail_normal_texture(self, context):
         msfs = MSFS_Material_Property_Update.getMaterial(self)
+        if msfs is None:
+            return
         if type(msfs) is MSFS_Invisible:
             return
         msfs.setDetailNormalTex(self.msfs_detail_normal_texture)
@@ -215,7 +236,7 @@ class MSFS_Material_Property_Update:
         blendTex = nodes.get(MSFS_ShaderNodes.blendMaskTex.value)
         if not blendTex:
             return
-        blendTex.image = self.msfs_blend_mask_texture
+        blendTex.image = MSFS_Viewport_Preview.get_viewport_image(self.msfs_blend_mask_texture)
         if self.msfs_material_type == "msfs_standard":
             msfs_mat = MSFS_Standard(self)
             msfs_mat = msfs_mat.toggleVertexBlendMapMask(
@@ -238,10 +259,10 @@ class MSFS_Material_Property_Update:
         bsdf_node = nodes.get("bsdf")
 
         if clearcoat != None:
-            self.node_tree.nodes["clearcoat"].image = self.msfs_dirt_texture
-            self.node_tree.nodes[
-                "clearcoat"
-            ].image.colorspace_settings.name = "Non-Color"
+            # Set on the texture itself, proxies copy its color space
+            if self.msfs_dirt_texture is not None:
+                self.msfs_dirt_texture.colorspace_settings.name = "Non-Color"
+            clearcoat.image = MSFS_Viewport_Preview.get_viewport_image(self.msfs_dirt_texture)
             if clearcoat_sep != None and bsdf_node != None:
                 if self.msfs_dirt_texture.name != "":
                     links.new(clearcoat_sep.outputs["R"], bsdf_node.inputs["Clearcoat"])
@@ -257,8 +278,7 @@ class MSFS_Material_Property_Update:
 
     @staticmethod
     def update_wiper_mask(self, context):
-        nodes = self.node_tree.nodes
-        links = self.node_tree.links
+        pass
 
     @staticmethod
     def update_alpha_mode(self, context):
@@ -0,0 +1,146 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import hashlib
+
+import bpy
+import numpy as np
+
+
+def downsample_pixels(pixels, width, height, factor):
+    # Box filter: average every factor x factor block. Edge rows and columns that don't fill a whole block are dropped,
+    # that's at most factor - 1 texels which doesn't matter for a viewport proxy
+    channels = pixels.size // (width * height)
+    new_width = max(width // factor, 1)
+    new_height = max(height // factor, 1)
+    factor_x = min(factor, width)
+    factor_y = min(factor, height)
+
+    pixels = pixels.reshape(height, width, channels)[: new_height * factor_y, : new_width * factor_x]
+    pixels = pixels.reshape(new_height, factor_y, new_width, factor_x, channels).mean(axis=(1, 3), dtype=np.float32)
+    return pixels.reshape(-1), new_width, new_height
+
+
+def get_downsample_factor(width, height, max_size):
+    factor = 1
+    while max(width, height) > max_size * factor:
+        factor *= 2
+    return factor
+
+
+class MSFS_Texture_Proxy:
+    # The proxy keeps a pointer back to the image it was made from
+    source_property = "msfs_proxy_source"
+
+    @staticmethod
+    def get_cache_directory():
+        return bpy.utils.user_resource("DATAFILES", path="msfs_texture_proxies", create=True)
+
+    @staticmethod
+    def get_source_path(image):
+        if image.source != "FILE" or image.packed_file is not None or image.library is not None:
+            return None
+        path = bpy.path.abspath(image.filepath)
+        if not os.path.isfile(path):
+            return None
+        return os.path.normpath(path)
+
+    @staticmethod
+    def get_cache_path(source_path, max_size):
+        # Key on the file and its modification time, so repainting the texture generates a new proxy
+        key = "%s|%f|%d" % (source_path, os.path.getmtime(source_path), max_size)
+        file_name = hashlib.sha1(key.encode("utf-8")).hexdigest() + ".png"
+        return os.path.join(MSFS_Texture_Proxy.get_cache_directory(), file_name)
+
+    @staticmethod
+    def get_source(image):
+        if image is None:
+            return None
+        return image.get(MSFS_Texture_Proxy.source_property, image)
+
+    @staticmethod
+    def write_proxy(image, cache_path, max_size):
+        width, height = image.size
+        pixels = np.empty(width * height * image.channels, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+
+        factor = get_downsample_factor(width, height, max_size)
+        pixels, new_width, new_height = downsample_pixels(pixels, width, height, factor)
+        if image.channels != 4:
+            pixels = pixels.reshape(-1, image.channels)
+            rgba = np.ones((pixels.shape[0], 4), dtype=np.float32)
+            rgba[:, : min(image.channels, 3)] = pixels[:, :3]
+            if image.channels == 1:
+                rgba[:, 1] = rgba[:, 2] = rgba[:, 0]
+            pixels = rgba.reshape(-1)
+
+        proxy = bpy.data.images.new("msfs_proxy_tmp", new_width, new_height, alpha=True)
+        proxy.pixels.foreach_set(pixels)
+        proxy.filepath_raw = cache_path
+        proxy.file_format = "PNG"
+        proxy.save()
+        bpy.data.images.remove(proxy)
+
+    @staticmethod
+    def get_proxy(image, max_size):
+        image = MSFS_Texture_Proxy.get_source(image)
+        if image is None or max(image.size) <= max_size:
+            return image
+
+        proxy_name = "%s.proxy%d" % (image.name, max_size)
+        proxy = bpy.data.images.get(proxy_name)
+        if proxy is not None and proxy.get(MSFS_Texture_Proxy.source_property) == image:
+            proxy.colorspace_settings.name = image.colorspace_settings.name
+            return proxy
+
+        source_path = MSFS_Texture_Proxy.get_source_path(image)
+        if source_path is None:
+            return image
+
+        cache_path = MSFS_Texture_Proxy.get_cache_path(source_path, max_size)
+        if not os.path.isfile(cache_path):
+            MSFS_Texture_Proxy.write_proxy(image, cache_path, max_size)
+
+        proxy = bpy.data.images.load(cache_path, check_existing=True)
+        proxy.name = proxy_name
+        proxy.colorspace_settings.name = image.colorspace_settings.name
+        proxy.alpha_mode = image.alpha_mode
+        proxy[MSFS_Texture_Proxy.source_property] = image
+        return proxy
+
+    @staticmethod
+    def apply_proxies(materials, max_size):
+        for mat in materials:
+            for node in mat.node_tree.nodes:
+                if node.type == "TEX_IMAGE" and node.image is not None:
+                    proxy = MSFS_Texture_Proxy.get_proxy(node.image, max_size)
+                    if node.image != proxy:
+                        node.image = proxy
+
+    @staticmethod
+    def restore_sources(materials):
+        for mat in materials:
+            for node in mat.node_tree.nodes:
+                if node.type == "TEX_IMAGE" and node.image is not None:
+                    source = MSFS_Texture_Proxy.get_source(node.image)
+                    if node.image != source:
+                        node.image = source
+
+        # Drop the proxies nothing uses anymore so they don't end up saved in the .blend
+        for image in [image for image in bpy.data.images if MSFS_Texture_Proxy.source_property in image]:
+            if image.users == 0:
+                bpy.data.images.remove(image)
@@ -0,0 +1,318 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bpy
+from bpy.app.handlers import persistent
+
+from .msfs_material_function import MSFS_Material, MSFS_ShaderNodes
+from .msfs_material_texture_proxy import MSFS_Texture_Proxy
+
+
+class MSFS_Lite_Preview(MSFS_Material):
+    # Viewport stand-in for every MSFS material type: only the base color texture and factor are wired to the BSDF.
+    # The node names match the full tree, so switching back and forth keeps the base color texture node and its image
+
+    def __init__(self, material, buildTree=False):
+        super().__init__(material, buildTree)
+
+    def createNodetree(self):
+        self.nodeOutputMaterial = self.addNode(
+            "ShaderNodeOutputMaterial", {"location": (1000.0, 0.0), "hide": False}
+        )
+        self.principledBSDF = self.addNode(
+            "ShaderNodeBsdfPrincipled", {"location": (500.0, 0.0), "hide": False}
+        )
+        self.innerLink(
+            'nodes["{0}"].outputs[0]'.format(self.principledBSDF.name),
+            'nodes["{0}"].inputs[0]'.format(self.nodeOutputMaterial.name)
+        )
+
+        self.nodeBaseColorTex = self.addNode(
+            "ShaderNodeTexImage",
+            {"name": MSFS_ShaderNodes.baseColorTex.value, "location": (-500, 100.0)},
+        )
+        self.nodeBaseColorRGB = self.addNode(
+            "ShaderNodeRGB",
+            {"name": MSFS_ShaderNodes.baseColorRGB.value, "location": (-500, 50.0)},
+        )
+        self.nodeBaseColorA = self.addNode(
+            "ShaderNodeValue",
+            {"name": MSFS_ShaderNodes.baseColorA.value, "location": (-500, -200.0)},
+        )
+        self.nodeBaseColorA.outputs[0].default_value = 1
+        self.mulBaseColorRGBNode = self.addNode(
+            "ShaderNodeMixRGB",
+            {
+                "name": MSFS_ShaderNodes.baseColorMulRGB.value,
+                "blend_type": "MULTIPLY",
+                "location": (0, 50.0),
+            },
+        )
+        self.mulBaseColorRGBNode.inputs[0].default_value = 1
+        self.mulBaseColorANode = self.addNode(
+            "ShaderNodeMath",
+            {
+                "name": MSFS_ShaderNodes.baseColorMulA.value,
+                "operation": "MULTIPLY",
+                "location": (0, -100.0),
+            },
+        )
+
+        self.updateColorLinks()
+
+    def updateColorLinks(self):
+        self.nodeBaseColorTex = self.getNode(MSFS_ShaderNodes.baseColorTex.value)
+
+        self.innerLink(
+            'nodes["{0}"].outputs[0]'.format(MSFS_ShaderNodes.baseColorRGB.value),
+            'nodes["{0}"].inputs[1]'.format(MSFS_ShaderNodes.baseColorMulRGB.value),
+        )
+        self.innerLink(
+            'nodes["{0}"].outputs[0]'.format(MSFS_ShaderNodes.baseColorTex.value),
+            'nodes["{0}"].inputs[2]'.format(MSFS_ShaderNodes.baseColorMulRGB.value),
+        )
+        self.innerLink(
+            'nodes["{0}"].outputs[1]'.format(MSFS_ShaderNodes.baseColorTex.value),
+            'nodes["{0}"].inputs[0]'.format(MSFS_ShaderNodes.baseColorMulA.value),
+        )
+        self.innerLink(
+            'nodes["{0}"].outputs[0]'.format(MSFS_ShaderNodes.baseColorA.value),
+            'nodes["{0}"].inputs[1]'.format(MSFS_ShaderNodes.baseColorMulA.value),
+        )
+
+        if self.nodeBaseColorTex.image:
+            self.innerLink(
+                'nodes["{0}"].outputs[0]'.format(MSFS_ShaderNodes.baseColorMulRGB.value),
+                'nodes["{0}"].inputs[0]'.format(self.principledBSDF.name),
+            )
+            self.innerLink(
+                'nodes["{0}"].outputs[0]'.format(MSFS_ShaderNodes.baseColorMulA.value),
+                'nodes["{0}"].inputs[21]'.format(self.principledBSDF.name),
+            )
+        else:
+            self.innerLink(
+                'nodes["{0}"].outputs[0]'.format(MSFS_ShaderNodes.baseColorRGB.value),
+                'nodes["{0}"].inputs[0]'.format(self.principledBSDF.name),
+            )
+            self.innerLink(
+                'nodes["{0}"].outputs[0]'.format(MSFS_ShaderNodes.baseColorA.value),
+                'nodes["{0}"].inputs[21]'.format(self.principledBSDF.name),
+            )
+
+    # Everything but the base color is left out of the lite tree, the values stay on the material properties
+    # and get applied when the full tree is rebuilt
+    def setDetailColorTex(self, tex):
+        pass
+
+    def setCompTex(self, tex):
+        pass
+
+    def setDetailCompTex(self, tex):
+        pass
+
+    def setNormalTex(self, tex):
+        pass
+
+    def setDetailNormalTex(self, tex):
+        pass
+
+    def setEmissiveTexture(self, tex):
+        pass
+
+    def setAnisotropicTex(self, tex):
+        pass
+
+    def updateCompLinks(self):
+        pass
+
+    def updateNormalLinks(self):
+        pass
+
+    def updateEmissiveLinks(self):
+        pass
+
+
+class MSFS_Viewport_Preview:
+    # Material types that build a node tree, and can therefore be swapped to the lite tree
+    lite_material_types = [
+        "msfs_standard",
+        "msfs_geo_decal",
+        "msfs_geo_decal_frosted",
+        "msfs_windshield",
+        "msfs_porthole",
+        "msfs_glass",
+        "msfs_clearcoat",
+        "msfs_parallax",
+        "msfs_anisotropic",
+        "msfs_hair",
+        "msfs_sss",
+        "msfs_fake_terrain",
+        "msfs_fresnel_fade",
+        "msfs_ghost",
+    ]
+
+    # Exports need the full trees, they suspend the preview while they run. This is a counter so nested exports
+    # (the multi exporter calling the glTF exporter) only restore the lite trees once the outermost one is done
+    suspended = 0
+
+    @staticmethod
+    def is_enabled():
+        scene = bpy.context.scene
+        return scene is not None and scene.msfs_material_lite_preview
+
+    @staticmethod
+    def is_active():
+        return MSFS_Viewport_Preview.suspended == 0 and MSFS_Viewport_Preview.is_enabled()
+
+    @staticmethod
+    def use_texture_proxies():
+        scene = bpy.context.scene
+        return MSFS_Viewport_Preview.suspended == 0 and scene is not None and scene.msfs_texture_proxies
+
+    @staticmethod
+    def get_viewport_image(tex):
+        if tex is None or not MSFS_Viewport_Preview.use_texture_proxies():
+            return tex
+        return MSFS_Texture_Proxy.get_proxy(tex, int(bpy.context.scene.msfs_texture_proxy_size))
+
+    @staticmethod
+    def is_lite_material(mat):
+        return mat.msfs_material_type in MSFS_Viewport_Preview.lite_material_types and MSFS_Viewport_Preview.is_active()
+
+    @staticmethod
+    def get_materials():
+        return [
+            mat
+            for mat in bpy.data.materials
+            if mat.node_tree is not None and mat.msfs_material_type in MSFS_Viewport_Preview.lite_material_types
+        ]
+
+    @staticmethod
+    def apply_lite_trees():
+        for mat in MSFS_Viewport_Preview.get_materials():
+            MSFS_Lite_Preview(mat, buildTree=True)
+
+    @staticmethod
+    def restore_full_trees():
+        from .msfs_material_prop_update import MSFS_Material_Property_Update
+
+        for mat in MSFS_Viewport_Preview.get_materials():
+            MSFS_Material_Property_Update.getMaterial(mat, buildTree=True)
+
+    @staticmethod
+    def apply_texture_proxies():
+        MSFS_Texture_Proxy.apply_proxies(
+            MSFS_Viewport_Preview.get_materials(), int(bpy.context.scene.msfs_texture_proxy_size)
+        )
+
+    @staticmethod
+    def restore_textures():
+        MSFS_Texture_Proxy.restore_sources(MSFS_Viewport_Preview.get_materials())
+
+    @staticmethod
+    def suspend():
+        MSFS_Viewport_Preview.suspended += 1
+        if MSFS_Viewport_Preview.suspended > 1:
+            return
+
+        scene = bpy.context.scene
+        if scene is None:
+            return
+        if scene.msfs_texture_proxies:
+            MSFS_Viewport_Preview.restore_textures()
+        if scene.msfs_material_lite_preview:
+            MSFS_Viewport_Preview.restore_full_trees()
+
+    @staticmethod
+    def resume():
+        if MSFS_Viewport_Preview.suspended == 0:
+            return
+        MSFS_Viewport_Preview.suspended -= 1
+        if MSFS_Viewport_Preview.is_active():
+            MSFS_Viewport_Preview.apply_lite_trees()
+        if MSFS_Viewport_Preview.use_texture_proxies():
+            MSFS_Viewport_Preview.apply_texture_proxies()
+
+    @staticmethod
+    def update_lite_preview(self, context):
+        if MSFS_Viewport_Preview.suspended > 0:
+            return
+        if self.msfs_material_lite_preview:
+            MSFS_Viewport_Preview.apply_lite_trees()
+        else:
+            MSFS_Viewport_Preview.restore_full_trees()
+
+    @staticmethod
+    def update_texture_proxies(self, context):
+        if MSFS_Viewport_Preview.suspended > 0:
+            return
+        # Always go back to the originals first, so changing the proxy size doesn't downsample a proxy
+        MSFS_Viewport_Preview.restore_textures()
+        if self.msfs_texture_proxies:
+            MSFS_Viewport_Preview.apply_texture_proxies()
+
+
+class MSFS_PT_MaterialViewportPreview(bpy.types.Panel):
+    bl_label = "MSFS Viewport Preview"
+    bl_space_type = "PROPERTIES"
+    bl_region_type = "WINDOW"
+    bl_context = "material"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    def draw(self, context):
+        layout = self.layout
+        layout.prop(context.scene, "msfs_material_lite_preview")
+        layout.prop(context.scene, "msfs_texture_proxies")
+        row = layout.row()
+        row.prop(context.scene, "msfs_texture_proxy_size")
+        row.enabled = context.scene.msfs_texture_proxies
+
+
+@persistent
+def reset_viewport_preview(dummy):
+    # An export that failed half way never gets to resume, don't carry that into the next file
+    MSFS_Viewport_Preview.suspended = 0
+
+
+def register():
+    bpy.types.Scene.msfs_material_lite_preview = bpy.props.BoolProperty(
+        name="Lite Material Preview",
+        description="Only show the base color of MSFS materials in the viewport. This keeps large scenes with many materials responsive, the full node trees are restored for export and when turning this off",
+        default=False,
+        update=MSFS_Viewport_Preview.update_lite_preview,
+    )
+    bpy.types.Scene.msfs_texture_proxies = bpy.props.BoolProperty(
+        name="Texture Proxies",
+        description="Show downsampled copies of large MSFS textures in the viewport to save GPU memory. The proxies are cached on disk, the material texture properties and exports keep using the original images",
+        default=False,
+        update=MSFS_Viewport_Preview.update_texture_proxies,
+    )
+    bpy.types.Scene.msfs_texture_proxy_size = bpy.props.EnumProperty(
+        name="Proxy Size",
+        description="Largest side of the proxy textures, smaller textures are left as they are",
+        items=(
+            ("512", "512", ""),
+            ("1024", "1024", ""),
+            ("2048", "2048", ""),
+        ),
+        default="1024",
+        update=MSFS_Viewport_Preview.update_texture_proxies,
+    )
+    bpy.app.handlers.load_post.append(reset_viewport_preview)
+
+
+def unregister():
+    bpy.app.handlers.load_post.remove(reset_viewport_preview)
@@ -76,6 +76,7 @@ class MSFS_PT_ObjectProperties(bpy.types.Panel):
             box.prop(active_object, 'msfs_light_flash_phase')
             box.prop(active_object, 'msfs_light_rotation_speed')
             box.prop(active_object, 'msfs_light_day_night_cycle')
+            box.operator('msfs.bulk_edit_lights', icon='LIGHT')
 
         elif active_object.type == 'EMPTY':
             box = layout.box()
@@ -18,6 +18,8 @@ import os
 import bpy
 import urllib
 
+from io_scene_gltf2.io.com.gltf2_io_debug import print_console
+
 from .. import get_version_string
 
 from .msfs_light import MSFSLight
@@ -43,6 +45,38 @@ class Export:
             for i, image in enumerate(gltf2_plan.images):
                 image.uri = os.path.basename(urllib.parse.unquote(image.uri))
 
+            if self.properties.compact_lights and getattr(self, "light_json_sizes", None) is not None:
+                before, after = self.light_json_sizes
+                print_console(
+                    "INFO",
+                    "Compact lights: light JSON reduced from %d to %d bytes (%d bytes saved)" % (before, after, before - after)
+                )
+
+    def get_light_extensions(self):
+        # Gathered for all lights the first time a light gets exported, a new exporter extension is created for every export
+        if getattr(self, "light_extensions", None) is None:
+            self.light_extensions = MSFSLight.gather_extensions(bpy.context.scene.objects)
+            if self.properties.compact_lights:
+                self.light_json_sizes = [0, 0]
+                self.compact_light_extensions = MSFSLight.compact_extensions(self.light_extensions)
+        return self.light_extensions
+
+    def export_light(self, gltf2_object, blender_object):
+        extension = self.get_light_extensions().get(blender_object.name_full)
+        if not self.properties.compact_lights or extension is None:
+            MSFSLight.export(gltf2_object, blender_object, extension)
+            return
+
+        compact_extension = self.compact_light_extensions[blender_object.name_full]
+        removed_children = MSFSLight.export(gltf2_object, blender_object, compact_extension, compact=True)
+
+        # Estimated from the compact JSON of the payload and of the dropped nodes, without their index in the node lists
+        removed_size = sum(
+            MSFSLight.get_json_size({"name": child.name, "rotation": child.rotation}) for child in removed_children
+        )
+        self.light_json_sizes[0] += MSFSLight.get_json_size(extension) + removed_size
+        self.light_json_sizes[1] += MSFSLight.get_json_size(compact_extension)
+
     def gather_node_hook(self, gltf2_object, blender_object, export_settings):
         if self.properties.enabled:
 
@@ -50,7 +84,7 @@ class Export:
                 gltf2_object.extensions = {}
 
             if blender_object.type == 'LIGHT':
-                MSFSLight.export(gltf2_object, blender_object)
+                self.export_light(gltf2_object, blender_object)
 
     def gather_scene_hook(self, gltf2_scene, blender_scene, export_settings):
         if self.properties.enabled:
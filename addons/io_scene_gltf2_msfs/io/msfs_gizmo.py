@@ -17,7 +17,6 @@
 import bpy
 import math
 
-from io_scene_gltf2.io.com.gltf2_io import Node
 from io_scene_gltf2.io.com.gltf2_io_extensions import Extension
 
 
@@ -32,96 +31,109 @@ class MSFSGizmo:
     @staticmethod
     def create(gltf_scene, blender_scene, import_settings):
         """
-        Create a "fake" node in the glTF scene to let the gizmo TRS get applied properly relative to the parent
+        Create the gizmo empties once the Khronos importer has built the scene, parented directly to the objects of their mesh nodes
         """
-        nodes = gltf_scene.nodes
-        for node_idx in nodes:
-            node = import_settings.data.nodes[node_idx]
+        names = {"sphere": "Sphere Collision", "box": "Box Collision", "cylinder": "Cylinder Collision"}
+
+        for node_idx, node in enumerate(import_settings.data.nodes):
             # Check extensions in mesh
             if node.mesh is None:
                 continue
             mesh = import_settings.data.meshes[node.mesh]
+            if mesh.extensions is None:
+                continue
             extension = mesh.extensions.get(MSFSGizmo.extension_name)
             if extension is None:
                 continue
 
+            vnode = import_settings.vnodes.get(node_idx)
+            parent = vnode.blender_object if vnode is not None else None
+            if parent is None:
+                continue
+
             for gizmo_object in extension.get("gizmo_objects"):
                 gizmo_type = gizmo_object.get("type")
                 params = gizmo_object.get("params", {})
 
+                # The exporter reads a sphere radius as the product of the scale and a cylinder radius as the product of X and Y
                 scale = [1.0, 1.0, 1.0]
                 if gizmo_type == "sphere":
-                    scale[0] = params.get("radius")
-                    scale[1] = params.get("radius")
-                    scale[2] = params.get("radius")
+                    radius = params.get("radius") ** (1 / 3)
+                    scale = [radius, radius, radius]
                 elif gizmo_type == "box":
                     scale[0] = params.get("length") / 2
                     scale[1] = params.get("width") / 2
                     scale[2] = params.get("height") / 2
                 elif gizmo_type == "cylinder":
-                    scale[0] = params.get("radius")
-                    scale[1] = params.get("radius")
-                    scale[2] = params.get("height")
+                    radius = math.sqrt(params.get("radius"))
+                    scale = [radius, radius, params.get("height")]
 
                 # Flip scale to convert from MSFS gizmo scale system
                 scale = [scale[1], scale[2], scale[0]]
 
-                placeholder_extension = {
-                    "gizmo_blender_data": {
-                        "road_collider": "Road"
-                        in gizmo_object.get("extensions", {})
-                        .get("ASOBO_tags", {})
-                        .get("tags", {}),
-                        "gizmo_type": gizmo_type,
-                    }
-                }
-
-                # Create new placeholder node
-                placeholder_node = Node(
-                    camera=None,
-                    children=None,
-                    extensions=placeholder_extension,
-                    extras=None,
-                    matrix=None,
-                    mesh=None,
-                    name="Gizmo",
-                    rotation=gizmo_object.get("rotation"),
-                    scale=scale,
-                    skin=None,
-                    translation=gizmo_object.get("translation"),
-                    weights=None,
-                )
-
-                import_settings.data.nodes.append(placeholder_node)
-                if node.children is None:
-                    node.children = []
-                node.children.append(len(import_settings.data.nodes) - 1)
+                blender_object = bpy.data.objects.new(names.get(gizmo_type, "Gizmo"), None)
+                for collection in parent.users_collection:
+                    collection.objects.link(blender_object)
+                blender_object.parent = parent
+
+                translation = gizmo_object.get("translation")
+                if translation is not None:
+                    blender_object.location = import_settings.loc_gltf_to_blender(translation)
+                rotation = gizmo_object.get("rotation")
+                if rotation is not None:
+                    blender_object.rotation_mode = "QUATERNION"
+                    blender_object.rotation_quaternion = import_settings.quaternion_gltf_to_blender(rotation)
+                blender_object.scale = import_settings.scale_gltf_to_blender(scale)
+
+                blender_object.msfs_gizmo_type = gizmo_type
+                blender_object.msfs_collision_is_road_collider = "Road" in gizmo_object.get(
+                    "extensions", {}
+                ).get("ASOBO_tags", {}).get("tags", [])
 
     @staticmethod
-    def set_blender_data(gltf2_node, blender_object, import_settings):
-        """
-        Set proper gizmo properties on the blender object
-        """
-        if gltf2_node.extensions is None:
-            return
-
-        extension = gltf2_node.extensions.get("gizmo_blender_data")
-        if extension is None:
-            return
-
-        blender_object.msfs_collision_is_road_collider = extension.get("road_collider")
-        blender_object.msfs_gizmo_type = extension.get("gizmo_type")
-
-        # Set name
+    def gather_gizmo(gltf2_node, blender_object, export_settings):
+        result = {}
+        result["type"] = blender_object.msfs_gizmo_type
+        result["translation"] = gltf2_node.translation
+        if gltf2_node.rotation:
+            result["rotation"] = gltf2_node.rotation
+
+        node_scale = gltf2_node.scale
+        if node_scale is None: # If the scale is default, it will be exported as None
+            node_scale = [1.0, 1.0, 1.0]
+
+        # Flip scale to match MSFS gizmo scale system
+        if export_settings["gltf_yup"]:
+            node_scale = [node_scale[2], node_scale[0], node_scale[1]]
+        else:
+            node_scale = [node_scale[1], node_scale[0], node_scale[2]]
+
+        # Calculate scale per gizmo type
+        scale = {}
         if blender_object.msfs_gizmo_type == "sphere":
-            blender_object.name = "Sphere Collision"
+            scale["radius"] = abs(node_scale[0] * node_scale[1] * node_scale[2])
         elif blender_object.msfs_gizmo_type == "box":
-            blender_object.name = "Box Collision"
+            scale["length"] = abs(node_scale[0]) * 2
+            scale["width"] = abs(node_scale[1]) * 2
+            scale["height"] = abs(node_scale[2]) * 2
         elif blender_object.msfs_gizmo_type == "cylinder":
-            blender_object.name = "Cylinder Collision"
+            scale["radius"] = abs(node_scale[0] * node_scale[1])
+            scale["height"] = abs(node_scale[2])
+
+        result["params"] = scale
+
+        # Collision type
+        tags = ["Collision"]
+        if blender_object.msfs_collision_is_road_collider:
+            tags.append("Road")
 
-        # The Khronos importer auto-calculates the empty display size, so we need to reset it to 1
-        blender_object.empty_display_size = 1.0
+        result["extensions"] = {
+            "ASOBO_tags": Extension(
+                name="ASOBO_tags", extension={"tags": tags}, required=False
+            )
+        }
+
+        return result
 
     @staticmethod
     def export(nodes, blender_scene, export_settings):
@@ -129,70 +141,42 @@ class MSFSGizmo:
         Let the Khronos exporter gather the gizmo to calculate the proper TRS with the parent to make sure everything is correct,
         then remove the gizmo from the collected nodes and set the proper mesh extensions
         """
-        for node in nodes:
-            collisions = []  # TODO: make sure node is mesh?
+        # The glTF exporter will ALWAYS set the node name as the blender name, so index the gizmos by name once.
+        # We only need the collision gizmos that are parented to a mesh
+        gizmo_objects = {
+            blender_object.name: blender_object
+            for blender_object in blender_scene.objects
+            if blender_object.msfs_gizmo_type != "NONE"
+            and blender_object.parent is not None
+            and blender_object.parent.type == "MESH"
+        }
+        if not gizmo_objects:
+            return
+
+        # Walk the node tree with a stack rather than recursion, deep hierarchies can hit the recursion limit
+        stack = list(nodes)
+        while stack:
+            node = stack.pop()
+            if not node.children:
+                continue
+
+            collisions = []
+            children = []
             for child in node.children:
-                blender_object = blender_scene.objects.get(
-                    child.name
-                )  # The glTF exporter will ALWAYS set the node name as the blender name
-
-                if blender_object is None: # However, there are cases where the exporter creates fake nodes that don't exist in the scene
-                    continue
-
-                if (
-                    blender_object.parent is None or blender_object.parent.type != "MESH"
-                ):  # We only need the collision gizmos that are parented to a mesh
-                    continue
-
-                if blender_object.msfs_gizmo_type != "NONE":
-                    result = {}
-                    result["type"] = blender_object.msfs_gizmo_type
-                    result["translation"] = child.translation
-                    if child.rotation:
-                        result["rotation"] = child.rotation
-
-                    if child.scale is None: # If the scale is default, it will be exported as None which will raise an error here
-                        child.scale = [1.0, 1.0, 1.0]
-
-                    # Flip scale to match MSFS gizmo scale system
-                    if export_settings["gltf_yup"]:
-                        child.scale = [child.scale[2], child.scale[0], child.scale[1]]
-                    else:
-                        child.scale = [child.scale[1], child.scale[0], child.scale[2]]
-
-                    # Calculate scale per gizmo type
-                    scale = {}
-                    if blender_object.msfs_gizmo_type == "sphere":
-                        scale["radius"] = abs(child.scale[0] * child.scale[1] * child.scale[2])
-                    elif blender_object.msfs_gizmo_type == "box":
-                        scale["length"] = abs(child.scale[0]) * 2
-                        scale["width"] = abs(child.scale[1]) * 2
-                        scale["height"] = abs(child.scale[2]) * 2
-                    elif blender_object.msfs_gizmo_type == "cylinder":
-                        scale["radius"] = abs(child.scale[0] * child.scale[1])
-                        scale["height"] = abs(child.scale[2])
-
-                    result["params"] = scale
-
-                    # Collision type
-                    tags = ["Collision"]
-                    if blender_object.msfs_collision_is_road_collider:
-                        tags.append("Road")
-
-                    result["extensions"] = {
-                        "ASOBO_tags": Extension(
-                            name="ASOBO_tags", extension={"tags": tags}, required=False
-                        )
-                    }
-
-                    collisions.append(result)
-                    node.children.remove(child)
-
-            if collisions:
+                blender_object = gizmo_objects.get(child.name)
+                if blender_object is None: # Not a gizmo, or a fake node the exporter created that doesn't exist in the scene
+                    children.append(child)
+                else:
+                    collisions.append(MSFSGizmo.gather_gizmo(child, blender_object, export_settings))
+
+            if collisions and node.mesh is not None:
+                node.children = children
+                if node.mesh.extensions is None:
+                    node.mesh.extensions = {}
                 node.mesh.extensions[MSFSGizmo.extension_name] = Extension(
                     name=MSFSGizmo.extension_name,
                     extension={"gizmo_objects": collisions},
                     required=False,
                 )
 
-            MSFSGizmo.export(node.children, blender_scene, export_settings)
+            stack.extend(node.children)
@@ -0,0 +1,445 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Access to the buffers of exported .gltf files for the post-export stages. The .bin files are memory mapped and
+# accessors are NumPy views over them, so nothing gets copied until a stage writes new data. This module doesn't
+# depend on Blender
+
+import gc
+import os
+import json
+import mmap
+import base64
+import urllib.parse
+
+import numpy as np
+
+COMPONENT_TYPES = {
+    5120: np.int8,
+    5121: np.uint8,
+    5122: np.int16,
+    5123: np.uint16,
+    5125: np.uint32,
+    5126: np.float32,
+}
+
+COMPONENT_COUNTS = {
+    "SCALAR": 1,
+    "VEC2": 2,
+    "VEC3": 3,
+    "VEC4": 4,
+    "MAT2": 4,
+    "MAT3": 9,
+    "MAT4": 16,
+}
+
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+
+# Buffer views are aligned to 4 bytes, which covers every component type
+BUFFER_VIEW_ALIGNMENT = 4
+
+# Extensions known not to hold accessor indices: the ones this add-on writes, and the material, texture and light
+# ones. Accessors can't be renumbered safely when any other extension is used
+ACCESSOR_FREE_EXTENSIONS = (
+    "ASOBO_",
+    "KHR_materials_",
+    "KHR_texture_",
+    "KHR_lights_punctual",
+    "KHR_mesh_quantization",
+    "MSFT_texture_dds",
+    "EXT_texture_webp",
+)
+
+
+def get_component_type(dtype):
+    dtype = np.dtype(dtype)
+    for component_type, component_dtype in COMPONENT_TYPES.items():
+        if np.dtype(component_dtype) == dtype:
+            return component_type
+    raise ValueError("%s can't be stored in a glTF accessor" % dtype)
+
+
+def get_accessor_type(component_count):
+    for accessor_type, count in COMPONENT_COUNTS.items():
+        if count == component_count and not accessor_type.startswith("MAT"):
+            return accessor_type
+    raise ValueError("No accessor type has %d components" % component_count)
+
+
+class GLTFBuffers:
+    """
+    An exported .gltf file with its buffers. Opened writable, edits made to the arrays returned by get_accessor
+    and get_buffer_view go straight to the .bin files. New data (set_accessor, add_accessor) is kept in memory
+    until save() compacts and rewrites the buffers
+    """
+
+    def __init__(self, path, writable=False):
+        self.path = path
+        self.directory = os.path.dirname(os.path.abspath(path))
+        self.writable = writable
+
+        with open(path, "r", encoding="utf-8") as f:
+            self.json = json.load(f)
+
+        self.files = []
+        self.buffers = []
+        self.pending_views = {}  # Buffer view index: array with the data of views that aren't written yet
+        self.open_buffers()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_buffer_path(self, buffer):
+        uri = buffer.get("uri")
+        if uri is None or uri.startswith("data:"):
+            return None
+        return os.path.join(self.directory, urllib.parse.unquote(uri))
+
+    def open_buffers(self):
+        for buffer in self.json.get("buffers", []):
+            uri = buffer.get("uri", "")
+            buffer_path = self.get_buffer_path(buffer)
+            if buffer_path is None:
+                # Embedded buffers are small, they are simply decoded
+                data = bytearray(base64.b64decode(uri.split(",", 1)[1])) if uri else bytearray()
+                self.files.append(None)
+                self.buffers.append(data)
+                continue
+
+            f = open(buffer_path, "r+b" if self.writable else "rb")
+            self.files.append(f)
+            if os.fstat(f.fileno()).st_size == 0:
+                self.buffers.append(bytearray())
+            else:
+                self.buffers.append(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ))
+
+    def close_buffers(self, strict=False):
+        """
+        Unmap the buffers. Arrays still viewing a map keep it open, which is fine when only closing, but a mapped file
+        can't be replaced on Windows: with strict, those raise a RuntimeError instead
+        """
+        in_use = []
+        for buffer in self.buffers:
+            if isinstance(buffer, mmap.mmap):
+                try:
+                    buffer.close()
+                except BufferError:
+                    in_use.append(buffer)
+        if in_use:
+            # Views kept alive by reference cycles (tracebacks, closures) go away with a collection
+            gc.collect()
+            for buffer in list(in_use):
+                try:
+                    buffer.close()
+                    in_use.remove(buffer)
+                except BufferError:
+                    pass
+        if in_use and strict:
+            raise RuntimeError("%s: buffer data is still referenced, its file can't be replaced" % self.path)
+
+        for f in self.files:
+            if f is not None:
+                f.close()
+        self.files = []
+        self.buffers = []
+
+    def close(self):
+        self.close_buffers()
+
+    def flush(self):
+        for buffer in self.buffers:
+            if isinstance(buffer, mmap.mmap):
+                buffer.flush()
+
+    # Reading
+
+    def get_buffer(self, buffer_index):
+        buffer = self.buffers[buffer_index]
+        if len(buffer) == 0:
+            return np.empty(0, dtype=np.uint8)
+        return np.frombuffer(buffer, dtype=np.uint8)
+
+    def get_buffer_view(self, view_index):
+        # The bytes of a buffer view, strides included
+        pending = self.pending_views.get(view_index)
+        if pending is not None:
+            return pending.reshape(-1).view(np.uint8)
+
+        view = self.json["bufferViews"][view_index]
+        offset = view.get("byteOffset", 0)
+        return self.get_buffer(view["buffer"])[offset:offset + view["byteLength"]]
+
+    def get_accessor(self, accessor_index):
+        """
+        The accessor as a (count,) array for scalars or a (count, components) array, viewing the buffer directly.
+        Normalized integers are returned as they are stored. Sparse accessors and accessors without a buffer view
+        have no data to view and are returned as copies
+        """
+        accessor = self.json["accessors"][accessor_index]
+        dtype = np.dtype(COMPONENT_TYPES[accessor["componentType"]])
+        components = COMPONENT_COUNTS[accessor["type"]]
+        count = accessor["count"]
+        shape = (count,) if components == 1 else (count, components)
+
+        view_index = accessor.get("bufferView")
+        if view_index is None:
+            array = np.zeros(shape, dtype=dtype)
+        else:
+            view = self.json["bufferViews"][view_index]
+            data = self.get_buffer_view(view_index)
+            stride = view.get("byteStride", dtype.itemsize * components)
+            offset = accessor.get("byteOffset", 0)
+            if count == 0:
+                array = np.empty(shape, dtype=dtype)
+            else:
+                strides = (stride,) if components == 1 else (stride, dtype.itemsize)
+                array = np.ndarray(shape, dtype=dtype, buffer=data, offset=offset, strides=strides)
+
+        sparse = accessor.get("sparse")
+        if sparse is not None:
+            array = np.array(array)
+            indices = sparse["indices"]
+            values = sparse["values"]
+            index_data = self.get_buffer_view(indices["bufferView"])[indices.get("byteOffset", 0):]
+            value_data = self.get_buffer_view(values["bufferView"])[values.get("byteOffset", 0):]
+            index_dtype = np.dtype(COMPONENT_TYPES[indices["componentType"]])
+            sparse_indices = np.frombuffer(index_data, dtype=index_dtype, count=sparse["count"])
+            array[sparse_indices] = np.frombuffer(value_data, dtype=dtype, count=sparse["count"] * components).reshape(
+                (-1,) + shape[1:]
+            )
+        return array
+
+    # Writing
+
+    def add_buffer_view(self, array, target=None):
+        array = np.ascontiguousarray(array)
+        if not self.json.get("buffers"):
+            self.json["buffers"] = [{"byteLength": 0}]
+            self.files.append(None)
+            self.buffers.append(bytearray())
+
+        view = {"buffer": 0}
+        element_size = array.nbytes // len(array) if len(array) else 0
+        if target == ARRAY_BUFFER and element_size % BUFFER_VIEW_ALIGNMENT:
+            # Vertex attribute elements have to start on 4 byte boundaries, pad them and stride over the padding
+            stride = element_size + (-element_size % BUFFER_VIEW_ALIGNMENT)
+            padded = np.zeros((len(array), stride), dtype=np.uint8)
+            padded[:, :element_size] = array.reshape(len(array), -1).view(np.uint8)
+            array = padded
+            view["byteStride"] = stride
+
+        view["byteLength"] = array.nbytes
+        if target is not None:
+            view["target"] = target
+        self.json.setdefault("bufferViews", []).append(view)
+        view_index = len(self.json["bufferViews"]) - 1
+        self.pending_views[view_index] = array
+        return view_index
+
+    def set_accessor(self, accessor_index, array, normalized=False, target=None):
+        """
+        Replace the data of an accessor, the type and count follow the array. The old data is dropped on save()
+        """
+        array = np.asarray(array)
+        accessor = self.json["accessors"][accessor_index]
+        if target is None and accessor.get("bufferView") is not None:
+            target = self.json["bufferViews"][accessor["bufferView"]].get("target")
+
+        accessor["bufferView"] = self.add_buffer_view(array, target)
+        accessor["componentType"] = get_component_type(array.dtype)
+        accessor["type"] = get_accessor_type(1 if array.ndim == 1 else array.shape[1])
+        accessor["count"] = len(array)
+        accessor.pop("byteOffset", None)
+        accessor.pop("sparse", None)
+        if normalized:
+            accessor["normalized"] = True
+        else:
+            accessor.pop("normalized", None)
+        if "min" in accessor or "max" in accessor:
+            self.set_bounds(accessor, array)
+
+    def add_accessor(self, array, normalized=False, target=None, bounds=False):
+        self.json.setdefault("accessors", []).append({})
+        accessor_index = len(self.json["accessors"]) - 1
+        self.set_accessor(accessor_index, array, normalized, target)
+        if bounds:
+            self.set_bounds(self.json["accessors"][accessor_index], np.asarray(array))
+        return accessor_index
+
+    @staticmethod
+    def set_bounds(accessor, array):
+        if len(array) == 0:
+            accessor.pop("min", None)
+            accessor.pop("max", None)
+            return
+        array = array.reshape(len(array), -1)
+        cast = float if array.dtype.kind == "f" else int
+        accessor["min"] = [cast(value) for value in array.min(axis=0)]
+        accessor["max"] = [cast(value) for value in array.max(axis=0)]
+
+    # Compaction
+
+    def get_accessor_references(self):
+        # (container, key) pairs of every core glTF property holding an accessor index
+        references = []
+        for mesh in self.json.get("meshes", []):
+            for primitive in mesh.get("primitives", []):
+                if "indices" in primitive:
+                    references.append((primitive, "indices"))
+                for attributes in [primitive.get("attributes", {})] + primitive.get("targets", []):
+                    references.extend((attributes, name) for name in attributes)
+        for animation in self.json.get("animations", []):
+            for sampler in animation.get("samplers", []):
+                references.extend((sampler, key) for key in ("input", "output") if key in sampler)
+        for skin in self.json.get("skins", []):
+            if "inverseBindMatrices" in skin:
+                references.append((skin, "inverseBindMatrices"))
+        for node in self.json.get("nodes", []):
+            instancing = node.get("extensions", {}).get("EXT_mesh_gpu_instancing", {})
+            attributes = instancing.get("attributes", {})
+            references.extend((attributes, name) for name in attributes)
+        return references
+
+    def get_unknown_extensions(self):
+        # Extensions used in the file that may hold accessor indices get_accessor_references doesn't follow
+        unknown = set()
+        stack = [self.json]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                for name in value.get("extensions", {}) if isinstance(value.get("extensions"), dict) else ():
+                    if name != "EXT_mesh_gpu_instancing" and not name.startswith(ACCESSOR_FREE_EXTENSIONS):
+                        unknown.add(name)
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+        return unknown
+
+    def get_buffer_view_references(self):
+        # Buffer views are referenced with a "bufferView" key, in the core properties as well as in extensions
+        references = []
+        stack = [value for key, value in self.json.items() if key != "bufferViews"]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    if key == "bufferView" and isinstance(item, int):
+                        references.append((value, key))
+                    else:
+                        stack.append(item)
+            elif isinstance(value, list):
+                stack.extend(value)
+        return references
+
+    def remove_unused_accessors(self):
+        if self.get_unknown_extensions():
+            # Their accessors may look unused, and renumbering the others would break their indices
+            return
+        references = self.get_accessor_references()
+        accessors = self.json.get("accessors", [])
+        used = sorted({container[key] for container, key in references})
+        if len(used) == len(accessors):
+            return
+        remap = {old: new for new, old in enumerate(used)}
+        self.json["accessors"] = [accessors[i] for i in used]
+        for container, key in references:
+            container[key] = remap[container[key]]
+
+    def remove_unused_buffer_views(self):
+        references = self.get_buffer_view_references()
+        views = self.json.get("bufferViews", [])
+        used = sorted({container[key] for container, key in references})
+        remap = {old: new for new, old in enumerate(used)}
+        self.json["bufferViews"] = [views[i] for i in used]
+        self.pending_views = {remap[i]: array for i, array in self.pending_views.items() if i in remap}
+        for container, key in references:
+            container[key] = remap[container[key]]
+        return used
+
+    def save(self, remove_unused_accessors=True):
+        """
+        Compact and rewrite the .gltf and its buffers: unused accessors (kept if an extension might reference them)
+        and buffer views are dropped, new data is written and every view gets its new offset. The buffers are
+        written to temporary files and streamed view by view, so the whole buffer is never held in memory. Arrays
+        returned by get_accessor and get_buffer_view must be released before, the files they view get replaced
+        """
+        if remove_unused_accessors:
+            self.remove_unused_accessors()
+
+        old_views = [dict(view) for view in self.json.get("bufferViews", [])]
+        used = self.remove_unused_buffer_views()
+        old_views = [old_views[i] for i in used]
+
+        buffers = self.json.get("buffers", [])
+        temporary_paths = []
+        embedded = []
+        for buffer_index, buffer in enumerate(buffers):
+            buffer_path = self.get_buffer_path(buffer)
+            if buffer_path is None:
+                out = bytearray()
+                write = out.extend
+                embedded.append((buffer, out))
+            else:
+                temporary_path = buffer_path + ".tmp"
+                temporary_paths.append((temporary_path, buffer_path))
+                out = open(temporary_path, "wb")
+                write = out.write
+
+            offset = 0
+            for view_index, view in enumerate(self.json.get("bufferViews", [])):
+                if view["buffer"] != buffer_index:
+                    continue
+                padding = -offset % BUFFER_VIEW_ALIGNMENT
+                if padding:
+                    write(b"\0" * padding)
+                    offset += padding
+
+                pending = self.pending_views.get(view_index)
+                if pending is not None:
+                    write(memoryview(pending.reshape(-1).view(np.uint8)))
+                else:
+                    old = old_views[view_index]
+                    old_offset = old.get("byteOffset", 0)
+                    write(memoryview(self.get_buffer(old["buffer"])[old_offset:old_offset + old["byteLength"]]))
+                view["byteOffset"] = offset
+                offset += view["byteLength"]
+
+            buffer["byteLength"] = offset
+            if buffer_path is not None:
+                out.close()
+
+        # The pending arrays can be views of the maps too
+        self.pending_views = {}
+        pending = None
+        try:
+            self.close_buffers(strict=True)
+        except RuntimeError:
+            for temporary_path, _ in temporary_paths:
+                os.remove(temporary_path)
+            raise
+        for buffer, data in embedded:
+            buffer["uri"] = "data:application/octet-stream;base64," + base64.b64encode(bytes(data)).decode("ascii")
+        for temporary_path, buffer_path in temporary_paths:
+            os.replace(temporary_path, buffer_path)
+
+        with open(self.path, "w", encoding="utf-8") as f:
+            json.dump(self.json, f, indent=4)
+
+        self.open_buffers()
@@ -14,10 +14,15 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import json
 import math
 
+import bpy
 from io_scene_gltf2.io.com.gltf2_io_extensions import Extension
-from mathutils import Matrix, Quaternion, Euler
+from mathutils import Quaternion
+
+# Rotation applied to every exported light node, see MSFSLight.export
+LIGHT_ROTATION_FIX = Quaternion((1.0, 0.0, 0.0), math.radians(90.0))
 
 class MSFSLight:
     bl_options = {"UNDO"}
@@ -27,6 +32,23 @@ class MSFSLight:
     def __new__(cls, *args, **kwargs):
         raise RuntimeError("%s should not be instantiated" % cls)
 
+    @staticmethod
+    def set_properties(blender_node, blender_light, extension, set_spot_size=True):
+        # Set Blender light properties. cone_angle is exported in degrees, lights imported with their KHR light
+        # already have the spot size from it, converted by the glTF importer
+        blender_light.color = extension.get("color")
+        blender_light.energy = extension.get("intensity")
+        if blender_light.type == "SPOT" and set_spot_size:
+            blender_light.spot_size = math.radians(extension.get("cone_angle"))
+
+        # Set MSFS light properties
+        blender_node.msfs_light_has_symmetry = extension.get("has_symmetry")
+        blender_node.msfs_light_flash_frequency = extension.get("flash_frequency")
+        blender_node.msfs_light_flash_duration = extension.get("flash_duration")
+        blender_node.msfs_light_flash_phase = extension.get("flash_phase")
+        blender_node.msfs_light_rotation_speed = extension.get("rotation_speed")
+        blender_node.msfs_light_day_night_cycle = extension.get("day_night_cycle")
+
     @staticmethod
     def create(gltf2_node, blender_node, blender_light, import_settings):
         parent_light = import_settings.data.nodes[
@@ -34,52 +56,176 @@ class MSFSLight:
         if parent_light.extensions:
             extension = parent_light.extensions.get(MSFSLight.extension_name)
             if extension:
-                # Set Blender light properties
-                blender_light.color = extension.get("color")
-                blender_light.energy = extension.get("intensity")
-                if blender_light.type == "SPOT":
-                    blender_light.spot_size = extension.get("cone_angle")
-
-                # Set MSFS light properties
-                blender_node.msfs_light_has_symmetry = extension.get("has_symmetry")
-                blender_node.msfs_light_flash_frequency = extension.get("flash_frequency")
-                blender_node.msfs_light_flash_duration = extension.get("flash_duration")
-                blender_node.msfs_light_flash_phase = extension.get("flash_phase")
-                blender_node.msfs_light_rotation_speed = extension.get("rotation_speed")
-                blender_node.msfs_light_day_night_cycle = extension.get("day_night_cycle")
+                MSFSLight.set_properties(blender_node, blender_light, extension, set_spot_size=False)
 
     @staticmethod
-    def export(gltf2_object, blender_object):
-        # First, clear all KHR_lights_punctual extensions from children. TODO: remove children?
-        for child in gltf2_object.children:
-            if child.extensions and child.extensions.get("KHR_lights_punctual"):
-                child.extensions.pop("KHR_lights_punctual")
+    def is_compact_node(gltf2_node, nodes):
+        # Compact exports drop the KHR_lights_punctual child, the light only exists through the Asobo extension
+        if not gltf2_node.extensions or MSFSLight.extension_name not in gltf2_node.extensions:
+            return False
+        if "KHR_lights_punctual" in gltf2_node.extensions:
+            return False
+        for child in gltf2_node.children or []:
+            if nodes[child].extensions and "KHR_lights_punctual" in nodes[child].extensions:
+                return False
+        return True
+
+    @staticmethod
+    def create_compact(import_settings):
+        """
+        Turn the empties the glTF importer made for compact light nodes back into lights. Lights with the same parameters
+        share their light datablock, like they did before being exported
+        """
+        nodes = import_settings.data.nodes or []
+        light_data = {}
+        for node_index, gltf2_node in enumerate(nodes):
+            if not MSFSLight.is_compact_node(gltf2_node, nodes):
+                continue
+            vnode = import_settings.vnodes.get(node_index)
+            empty = vnode.blender_object if vnode is not None else None
+            if empty is None or empty.type != 'EMPTY':
+                continue
 
+            extension = gltf2_node.extensions[MSFSLight.extension_name]
+            light_type = 'POINT' if extension.get("cone_angle", 360.0) >= 360.0 else 'SPOT'
+            key = (light_type, json.dumps({key: extension.get(key) for key in ("color", "intensity", "cone_angle")}))
+            blender_light = light_data.get(key)
+            if blender_light is None:
+                blender_light = bpy.data.lights.new(name=empty.name, type=light_type)
+                light_data[key] = blender_light
+
+            blender_object = bpy.data.objects.new(empty.name, blender_light)
+            for collection in empty.users_collection:
+                collection.objects.link(blender_object)
+
+            # Undo the rotation fix the exporter applied to the node, children keep their world transform
+            rotation_fix = LIGHT_ROTATION_FIX.to_matrix().to_4x4()
+            blender_object.parent = empty.parent
+            blender_object.parent_type = empty.parent_type
+            blender_object.parent_bone = empty.parent_bone
+            blender_object.matrix_parent_inverse = empty.matrix_parent_inverse.copy()
+            blender_object.matrix_basis = empty.matrix_basis @ rotation_fix.inverted()
+            for child in empty.children:
+                matrix_parent_inverse = child.matrix_parent_inverse.copy()
+                child.parent = blender_object
+                child.matrix_parent_inverse = rotation_fix @ matrix_parent_inverse
+
+            MSFSLight.set_properties(blender_object, blender_light, extension)
+
+            name = empty.name
+            bpy.data.objects.remove(empty)
+            blender_object.name = name
+            vnode.blender_object = blender_object
+
+    @staticmethod
+    def gather_light_data(blender_light):
         angle = 360.0
-        if blender_object.data.type == 'SPOT':
-            angle = (180.0 / math.pi) * blender_object.data.spot_size
+        if blender_light.type == 'SPOT':
+            angle = (180.0 / math.pi) * blender_light.spot_size
 
-        extension = {}
+        return {
+            "color": list(blender_light.color),
+            "intensity": blender_light.energy,
+            "cone_angle": angle,
+        }
+
+    @staticmethod
+    def gather_extension(blender_object, light_data=None):
+        if light_data is None:
+            light_data = MSFSLight.gather_light_data(blender_object.data)
 
-        extension["color"] = list(blender_object.data.color)
-        extension["intensity"] = blender_object.data.energy
-        extension["cone_angle"] = angle
+        extension = dict(light_data)
         extension["has_symmetry"] = blender_object.msfs_light_has_symmetry
         extension["flash_frequency"] = blender_object.msfs_light_flash_frequency
         extension["flash_duration"] = blender_object.msfs_light_flash_duration
         extension["flash_phase"] = blender_object.msfs_light_flash_phase
         extension["rotation_speed"] = blender_object.msfs_light_rotation_speed
         extension["day_night_cycle"] = blender_object.msfs_light_day_night_cycle
+        return extension
+
+    @staticmethod
+    def gather_extensions(blender_objects):
+        """
+        Gather the extension of every light up front, reading each light datablock only once even when many objects share it
+        """
+        light_data = {}
+        extensions = {}
+        for blender_object in blender_objects:
+            if blender_object.type != 'LIGHT':
+                continue
+            data = light_data.get(blender_object.data.name_full)
+            if data is None:
+                data = MSFSLight.gather_light_data(blender_object.data)
+                light_data[blender_object.data.name_full] = data
+            extensions[blender_object.name_full] = MSFSLight.gather_extension(blender_object, data)
+        return extensions
+
+    @staticmethod
+    def compact_value(value):
+        # Blender stores light properties as 32 bit floats, 6 significant digits keep all of it without the noise
+        # of the 64 bit representation (0.30000001192092896 becomes 0.3)
+        if isinstance(value, float):
+            return float("%.6g" % value)
+        if isinstance(value, list):
+            return [MSFSLight.compact_value(v) for v in value]
+        return value
+
+    @staticmethod
+    def compact_extensions(extensions):
+        # Round the light parameters of every light
+        return {
+            name: {key: MSFSLight.compact_value(value) for key, value in extension.items()}
+            for name, extension in extensions.items()
+        }
+
+    @staticmethod
+    def get_json_size(data):
+        return len(json.dumps(data, separators=(",", ":")))
+
+    @staticmethod
+    def is_empty_node(gltf2_node):
+        return not (
+            gltf2_node.children
+            or gltf2_node.mesh is not None
+            or gltf2_node.camera is not None
+            or gltf2_node.skin is not None
+            or gltf2_node.extensions
+            or gltf2_node.extras
+        )
+
+    @staticmethod
+    def export(gltf2_object, blender_object, extension=None, compact=False):
+        """
+        Returns the children that were removed, compact exports drop the nodes that only held the KHR light
+        """
+        # First, clear all KHR_lights_punctual extensions from children
+        light_children = []
+        for child in gltf2_object.children:
+            if child.extensions and child.extensions.get("KHR_lights_punctual"):
+                child.extensions.pop("KHR_lights_punctual")
+                light_children.append(child)
+
+        removed_children = []
+        if compact:
+            # Only the nodes that held the KHR light, other empty children can be attach points or animation helpers
+            removed_children = [child for child in light_children if MSFSLight.is_empty_node(child)]
+            gltf2_object.children = [child for child in gltf2_object.children if not any(child is removed for removed in removed_children)]
+
+        if extension is None:
+            extension = MSFSLight.gather_extension(blender_object)
 
         # start quick dirty fix to solve rotationn problem 
         # this can be removed after blender 3.2 goes out
-        currentRotationQuat = Quaternion((gltf2_object.rotation[3],gltf2_object.rotation[0],gltf2_object.rotation[1],gltf2_object.rotation[2])) if gltf2_object.rotation  else Quaternion()
-        quat_a = Quaternion((1.0, 0.0, 0.0), math.radians(90.0))
-        r =  currentRotationQuat @ quat_a
+        if gltf2_object.rotation:
+            currentRotationQuat = Quaternion((gltf2_object.rotation[3],gltf2_object.rotation[0],gltf2_object.rotation[1],gltf2_object.rotation[2]))
+            r = currentRotationQuat @ LIGHT_ROTATION_FIX
+        else:
+            r = LIGHT_ROTATION_FIX
         gltf2_object.rotation = [r.x,r.y,r.z,r.w]
         #end quick fix
         gltf2_object.extensions[MSFSLight.extension_name] = Extension(
             name=MSFSLight.extension_name,
             extension=extension,
             required=False
-        )
\ No newline at end of file
+        )
+        return removed_children
@@ -0,0 +1,120 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+
+
+def get_bounding_spheres(corners, matrices):
+    """
+    Bounding spheres of a set of objects from their local bounding box corners (N, 8, 3) and world matrices (N, 4, 4),
+    along with the sphere around all of them
+    """
+    corners = np.einsum("nij,nkj->nki", matrices[:, :3, :3], corners) + matrices[:, None, :3, 3]
+    centers = corners.mean(axis=1)
+    radii = np.sqrt(np.max(np.einsum("nki,nki->nk", corners - centers[:, None], corners - centers[:, None]), axis=1))
+
+    points = corners.reshape(-1, 3)
+    center = (points.min(axis=0) + points.max(axis=0)) / 2
+    radius = float(np.sqrt(np.max(np.einsum("ij,ij->i", points - center, points - center))))
+    return centers, radii, center, radius
+
+
+def get_projected_sizes(radii, radius, min_size, screen_height):
+    # At the LOD's minSize the whole model covers min_size percent of the screen height, the objects their share of it.
+    # Returns the diameter of each object in pixels
+    if radius <= 0:
+        return np.full(len(radii), np.inf)
+    return radii / radius * min_size / 100 * screen_height
+
+
+class MSFS_LODCulling:
+    # Objects to leave out of each LOD, keyed by the LOD's object or collection and its culling settings. Cleared on
+    # every depsgraph update that touches objects, meshes or collections
+    cache = {}
+
+    def __new__(cls, *args, **kwargs):
+        raise RuntimeError("%s should not be instantiated" % cls)
+
+    @staticmethod
+    def can_cull(obj):
+        # Only leaf meshes, removing anything else could take gizmos, lights or the children of an object with it
+        return obj.type == "MESH" and not obj.children
+
+    @staticmethod
+    def get_culled_objects(context, lod, objects):
+        """
+        The objects of the LOD that cover fewer pixels than the LOD's cull size when the LOD is shown at its smallest
+        """
+        if not lod.cull_small_objects or lod.lod_value <= 0:
+            return []
+
+        screen_height = context.scene.msfs_lod_size_screen_height
+        key = (
+            lod.collection.name_full if lod.collection is not None else lod.object.name_full,
+            lod.lod_value,
+            lod.cull_size,
+            screen_height,
+        )
+        culled = MSFS_LODCulling.cache.get(key)
+        if culled is not None:
+            return [obj for obj in objects if obj.name_full in culled]
+
+        objects = [obj for obj in objects if obj.type in ("MESH", "CURVE", "SURFACE", "META", "FONT")]
+        if not objects:
+            return []
+
+        depsgraph = context.evaluated_depsgraph_get()
+        evaluated = [obj.evaluated_get(depsgraph) for obj in objects]
+        _, radii, _, radius = get_bounding_spheres(
+            np.array([[corner[:] for corner in obj.bound_box] for obj in evaluated], dtype=np.float64),
+            np.array([np.array(obj.matrix_world) for obj in evaluated], dtype=np.float64),
+        )
+        sizes = get_projected_sizes(radii, radius, lod.lod_value, screen_height)
+
+        culled = {
+            obj.name_full
+            for obj, size in zip(objects, sizes)
+            if size < lod.cull_size and MSFS_LODCulling.can_cull(obj)
+        }
+        MSFS_LODCulling.cache[key] = culled
+        return [obj for obj in objects if obj.name_full in culled]
+
+
+@persistent
+def lod_cull_depsgraph_update(scene, depsgraph):
+    if not MSFS_LODCulling.cache:
+        return
+    for update in depsgraph.updates:
+        if isinstance(update.id, (bpy.types.Object, bpy.types.Mesh, bpy.types.Collection)):
+            MSFS_LODCulling.cache.clear()
+            return
+
+
+@persistent
+def lod_cull_load(dummy):
+    MSFS_LODCulling.cache.clear()
+
+
+def register():
+    bpy.app.handlers.depsgraph_update_post.append(lod_cull_depsgraph_update)
+    bpy.app.handlers.load_post.append(lod_cull_load)
+
+
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(lod_cull_depsgraph_update)
+    bpy.app.handlers.load_post.remove(lod_cull_load)
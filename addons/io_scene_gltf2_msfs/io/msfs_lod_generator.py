@@ -0,0 +1,277 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import re
+import math
+
+import bpy
+
+from .msfs_mesh_dedup import MSFS_MeshDeduplication
+
+
+class MSFS_LODGenerator:
+    """
+    Builds the lower LODs of a LOD group from its LOD0 by decimating every mesh. Decimated meshes are kept (with a
+    fake user) and tagged with the hash of the mesh they were made from, so regenerating only decimates what changed
+    """
+
+    # Objects and collections made by the generator hold the name of their LOD group, and the LOD value and enabled
+    # state their entry starts with
+    generated_property = "msfs_generated_lod"
+    lod_value_property = "msfs_generated_lod_value"
+    enabled_property = "msfs_generated_lod_enabled"
+    # Decimated meshes hold the hash of their source and the ratio, and the group that uses them
+    cache_key_property = "msfs_lod_cache_key"
+    cache_group_property = "msfs_lod_cache_group"
+
+    def __new__(cls, *args, **kwargs):
+        raise RuntimeError("%s should not be instantiated" % cls)
+
+    @staticmethod
+    def get_base_lod(lod_group):
+        # The LOD named xN_ / _LODN with the lowest N, or the first one if none follows the naming
+        def get_level(lod):
+            name = lod.collection.name if lod.collection is not None else lod.object.name
+            match = re.search("(?i)^x([0-9])_|_lod([0-9]+)$", name)
+            return int(match.group(1) or match.group(2)) if match else math.inf
+
+        lods = [
+            lod
+            for lod in lod_group.lods
+            if (lod.collection or lod.object) is not None
+            and (lod.collection or lod.object).get(MSFS_LODGenerator.generated_property) is None
+        ]
+        if not lods:
+            return None
+        return min(lods, key=get_level)
+
+    @staticmethod
+    def get_ratio(lod_group, level):
+        # The screen size a LOD holds up to goes with the square root of its triangle count, so a LOD value step
+        # maps to a triangle ratio of its square. Each level gets its LOD value scaled by the square root in turn
+        if lod_group.generated_lod_mode == "SCREEN_SIZE":
+            return (lod_group.generated_lod_screen_size ** 2) ** level
+        return lod_group.generated_lod_ratio ** level
+
+    @staticmethod
+    def get_cache():
+        return {
+            mesh[MSFS_LODGenerator.cache_key_property]: mesh
+            for mesh in bpy.data.meshes
+            if MSFS_LODGenerator.cache_key_property in mesh
+        }
+
+    @staticmethod
+    def get_decimated_mesh(context, obj, ratio, group_name, cache):
+        depsgraph = context.evaluated_depsgraph_get()
+        key = "%s:%.4f" % (MSFS_MeshDeduplication.get_mesh_hash(obj.evaluated_get(depsgraph)), ratio)
+        mesh = cache.get(key)
+        if mesh is not None:
+            return mesh
+
+        modifier = obj.modifiers.new("MSFS LOD Decimate", "DECIMATE")
+        modifier.ratio = ratio
+        try:
+            depsgraph = context.evaluated_depsgraph_get()
+            depsgraph.update()
+            mesh = bpy.data.meshes.new_from_object(obj.evaluated_get(depsgraph), preserve_all_data_layers=True, depsgraph=depsgraph)
+        finally:
+            obj.modifiers.remove(modifier)
+
+        mesh.name = "%s_decimated" % obj.data.name
+        mesh[MSFS_LODGenerator.cache_key_property] = key
+        mesh[MSFS_LODGenerator.cache_group_property] = group_name
+        mesh.use_fake_user = True
+        cache[key] = mesh
+        return mesh
+
+    @staticmethod
+    def copy_objects(context, objects, ratio, group_name, cache):
+        # Copy a set of objects, keeping their parenting, with decimated meshes
+        copies = {}
+        for obj in objects:
+            copy = obj.copy()
+            copies[obj] = copy
+            copy[MSFS_LODGenerator.generated_property] = group_name
+            if obj.type == "MESH" and not any(modifier.type == "ARMATURE" for modifier in obj.modifiers):
+                # The decimated mesh has the modifiers applied already
+                copy.data = MSFS_LODGenerator.get_decimated_mesh(context, obj, ratio, group_name, cache)
+                copy.modifiers.clear()
+
+        for obj, copy in copies.items():
+            if obj.parent in copies:
+                copy.parent = copies[obj.parent]
+        return copies
+
+    @staticmethod
+    def remove_generated(lod_group):
+        group_name = lod_group.group_name
+        for collection in [c for c in bpy.data.collections if c.get(MSFS_LODGenerator.generated_property) == group_name]:
+            bpy.data.collections.remove(collection)
+        for obj in [o for o in bpy.data.objects if o.get(MSFS_LODGenerator.generated_property) == group_name]:
+            bpy.data.objects.remove(obj)
+
+    @staticmethod
+    def remove_unused_cache(group_name, cache):
+        for key, mesh in list(cache.items()):
+            if mesh.get(MSFS_LODGenerator.cache_group_property) == group_name and mesh.users <= 1:
+                bpy.data.meshes.remove(mesh)
+                del cache[key]
+
+    @staticmethod
+    def get_parent_collection(context, collection):
+        for parent in [context.scene.collection] + list(bpy.data.collections):
+            if collection.name in parent.children:
+                return parent
+        return context.scene.collection
+
+    @staticmethod
+    def generate(context, lod_group):
+        """
+        Replace the generated LODs of the group. Returns how many were made, and the names of the levels skipped
+        because a hand made LOD already has their name
+        """
+        base_lod = MSFS_LODGenerator.get_base_lod(lod_group)
+        if base_lod is None:
+            return 0, []
+
+        group_name = lod_group.group_name
+        # Generated LODs are rebuilt from scratch, the values set on their entries carry over to the new ones
+        previous_values = {}
+        for lod in lod_group.lods:
+            source = lod.collection if lod.collection is not None else lod.object
+            if source is not None and source.get(MSFS_LODGenerator.generated_property) == group_name:
+                previous_values[source.name] = (lod.lod_value, lod.enabled)
+        MSFS_LODGenerator.remove_generated(lod_group)
+        cache = MSFS_LODGenerator.get_cache()
+        used_keys = set()
+        base_value = base_lod.lod_value if base_lod.lod_value > 0 else 100
+
+        generated_count = 0
+        skipped = []
+        for level in range(1, lod_group.generated_lod_count + 1):
+            ratio = MSFS_LODGenerator.get_ratio(lod_group, level)
+            name = "%s_LOD%d" % (group_name, level)
+            # The generated ones were removed, anything left with the name is hand made. Blender would rename ours
+            # to name.001, which ends up in a LOD group of its own
+            if (bpy.data.collections if base_lod.collection is not None else bpy.data.objects).get(name) is not None:
+                skipped.append(name)
+                continue
+            lod_value, enabled = previous_values.get(name, (int(round(base_value * math.sqrt(ratio))), True))
+
+            if base_lod.collection is not None:
+                copies = MSFS_LODGenerator.copy_objects(context, list(base_lod.collection.all_objects), ratio, group_name, cache)
+                collection = bpy.data.collections.new(name)
+                collection[MSFS_LODGenerator.generated_property] = group_name
+                collection[MSFS_LODGenerator.lod_value_property] = lod_value
+                collection[MSFS_LODGenerator.enabled_property] = enabled
+                MSFS_LODGenerator.get_parent_collection(context, base_lod.collection).children.link(collection)
+                for copy in copies.values():
+                    collection.objects.link(copy)
+            else:
+                objects = [base_lod.object] + list(base_lod.object.children_recursive)
+                copies = MSFS_LODGenerator.copy_objects(context, objects, ratio, group_name, cache)
+                for obj, copy in copies.items():
+                    for collection in obj.users_collection:
+                        collection.objects.link(copy)
+                root = copies[base_lod.object]
+                root.name = name
+                root[MSFS_LODGenerator.lod_value_property] = lod_value
+                root[MSFS_LODGenerator.enabled_property] = enabled
+
+            used_keys.update(
+                copy.data.get(MSFS_LODGenerator.cache_key_property) for copy in copies.values() if copy.type == "MESH"
+            )
+            generated_count += 1
+
+        MSFS_LODGenerator.remove_unused_cache(group_name, {key: mesh for key, mesh in cache.items() if key not in used_keys})
+        return generated_count, skipped
+
+    @staticmethod
+    def update_lod_values(lod_group):
+        # Called once the LOD groups were reloaded, the generated LODs then have their (new) entries
+        for lod in lod_group.lods:
+            source = lod.collection if lod.collection is not None else lod.object
+            if source is not None and MSFS_LODGenerator.lod_value_property in source:
+                lod.lod_value = source[MSFS_LODGenerator.lod_value_property]
+                lod.enabled = bool(source.get(MSFS_LODGenerator.enabled_property, True))
+
+    @staticmethod
+    def generate_all(context, lod_groups):
+        """
+        Generate the LODs of every group that has generation enabled. Returns how many were made, and the names of
+        the levels skipped
+        """
+        # Reloading changes the LOD groups, so it is only done once everything was generated
+        generated = [lod_group.group_name for lod_group in lod_groups if lod_group.generate_lods]
+        count = 0
+        skipped = []
+        for lod_group in lod_groups:
+            if lod_group.group_name in generated:
+                group_count, group_skipped = MSFS_LODGenerator.generate(context, lod_group)
+                count += group_count
+                skipped.extend(group_skipped)
+        if generated:
+            bpy.ops.msfs.reload_lod_groups()
+            for lod_group in lod_groups:
+                if lod_group.group_name in generated:
+                    MSFS_LODGenerator.update_lod_values(lod_group)
+        return count, skipped
+
+
+class MSFS_OT_GenerateLODs(bpy.types.Operator):
+    """Decimate LOD0 of the group into lower LODs. Unchanged meshes reuse their previous decimation"""
+
+    bl_idname = "msfs.generate_lods"
+    bl_label = "Generate LODs"
+    bl_options = {"REGISTER", "UNDO"}
+
+    group_name: bpy.props.StringProperty()
+
+    def execute(self, context):
+        lod_groups = context.scene.msfs_multi_exporter_lod_groups
+        lod_group = next((lod_group for lod_group in lod_groups if lod_group.group_name == self.group_name), None)
+        if lod_group is None:
+            self.report({"WARNING"}, "LOD group %s not found" % self.group_name)
+            return {"CANCELLED"}
+
+        count, skipped = MSFS_LODGenerator.generate(context, lod_group)
+        bpy.ops.msfs.reload_lod_groups()
+        for lod_group in lod_groups:
+            if lod_group.group_name == self.group_name:
+                MSFS_LODGenerator.update_lod_values(lod_group)
+
+        if skipped:
+            self.report({"WARNING"}, "Generated %d LODs, skipped %s as hand made LODs have these names" % (count, ", ".join(skipped)))
+        else:
+            self.report({"INFO"}, "Generated %d LODs" % count)
+        return {"FINISHED"}
+
+
+class MSFS_OT_GenerateAllLODs(bpy.types.Operator):
+    """Decimate LOD0 into lower LODs for every group with LOD generation enabled"""
+
+    bl_idname = "msfs.generate_all_lods"
+    bl_label = "Generate All LODs"
+    bl_options = {"REGISTER", "UNDO"}
+
+    def execute(self, context):
+        count, skipped = MSFS_LODGenerator.generate_all(context, context.scene.msfs_multi_exporter_lod_groups)
+        if skipped:
+            self.report({"WARNING"}, "Generated %d LODs, skipped %s as hand made LODs have these names" % (count, ", ".join(skipped)))
+        else:
+            self.report({"INFO"}, "Generated %d LODs" % count)
+        return {"FINISHED"}
@@ -0,0 +1,138 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import hashlib
+
+import numpy as np
+from io_scene_gltf2.io.com.gltf2_io_debug import print_console
+
+
+class MSFS_MeshDeduplication:
+    """
+    The glTF exporter shares a glTF mesh between objects using the same mesh datablock. Before a multi export, objects
+    whose meshes are identical copies (Shift+D instead of Alt+D) are pointed at one of them, and given their own mesh
+    back once the export is done
+    """
+
+    # foreach_get property, dtype and size of the values of each generic attribute type
+    attribute_layouts = {
+        "FLOAT": ("value", np.float32, 1),
+        "INT": ("value", np.int32, 1),
+        "BOOLEAN": ("value", bool, 1),
+        "FLOAT_VECTOR": ("vector", np.float32, 3),
+        "FLOAT2": ("vector", np.float32, 2),
+        "FLOAT_COLOR": ("color", np.float32, 4),
+        "BYTE_COLOR": ("color", np.float32, 4),
+    }
+
+    def __new__(cls, *args, **kwargs):
+        raise RuntimeError("%s should not be instantiated" % cls)
+
+    @staticmethod
+    def can_share_mesh(obj, export_apply):
+        if obj.type != "MESH" or obj.library is not None or obj.data.library is not None:
+            return False
+        if obj.data.shape_keys is not None:
+            return False
+        # Skin weights are per object vertex group names, sharing a mesh between skinned objects would mix them up
+        if obj.vertex_groups or obj.parent_type == "ARMATURE" or any(modifier.type == "ARMATURE" for modifier in obj.modifiers):
+            return False
+        # Modifiers are evaluated per object when they are applied on export
+        return not (export_apply and len(obj.modifiers))
+
+    @staticmethod
+    def hash_collection(digest, collection, attribute, dtype, size):
+        array = np.empty(len(collection) * size, dtype=dtype)
+        collection.foreach_get(attribute, array)
+        digest.update(array.tobytes())
+
+    @staticmethod
+    def get_mesh_hash(obj):
+        mesh = obj.data
+        digest = hashlib.sha1()
+        digest.update(("%d %d %d %d" % (len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons))).encode())
+
+        MSFS_MeshDeduplication.hash_collection(digest, mesh.vertices, "co", np.float32, 3)
+        MSFS_MeshDeduplication.hash_collection(digest, mesh.edges, "vertices", np.int32, 2)
+        MSFS_MeshDeduplication.hash_collection(digest, mesh.loops, "vertex_index", np.int32, 1)
+        MSFS_MeshDeduplication.hash_collection(digest, mesh.polygons, "loop_start", np.int32, 1)
+        MSFS_MeshDeduplication.hash_collection(digest, mesh.polygons, "material_index", np.int32, 1)
+
+        # Split normals cover smooth shading, sharp edges and custom normals at once
+        if hasattr(mesh, "calc_normals_split"):
+            mesh.calc_normals_split()
+        MSFS_MeshDeduplication.hash_collection(digest, mesh.loops, "normal", np.float32, 3)
+
+        # Layers are exported by their order and name, TEXCOORD_n follow the UV maps and custom attributes keep theirs
+        for uv_layer in mesh.uv_layers:
+            digest.update(b"\0" + uv_layer.name.encode())
+            MSFS_MeshDeduplication.hash_collection(digest, uv_layer.data, "uv", np.float32, 2)
+        for attribute in getattr(mesh, "attributes", []):
+            if attribute.name.startswith(".") or attribute.name == "position":
+                continue
+            digest.update(("\0%s %s %s" % (attribute.name, attribute.domain, attribute.data_type)).encode())
+            layout = MSFS_MeshDeduplication.attribute_layouts.get(attribute.data_type)
+            if layout is None:
+                # Can't compare the values, keep the mesh to this object
+                digest.update(obj.name_full.encode())
+                continue
+            MSFS_MeshDeduplication.hash_collection(digest, attribute.data, *layout)
+        color_attributes = mesh.color_attributes if hasattr(mesh, "color_attributes") else mesh.vertex_colors
+        for color_attribute in color_attributes:
+            digest.update(getattr(color_attribute, "domain", "CORNER").encode())
+            MSFS_MeshDeduplication.hash_collection(digest, color_attribute.data, "color", np.float32, 4)
+
+        # The materials the object ends up with, wherever the slots are linked
+        for slot in obj.material_slots:
+            digest.update(b"\0" + (slot.material.name_full if slot.material is not None else "").encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def deduplicate(objects, export_apply):
+        """
+        Returns the (object, original mesh) pairs that were changed, to give to restore()
+        """
+        shared_meshes = {}
+        replaced = []
+        hashed_meshes = {}
+        for obj in objects:
+            if not MSFS_MeshDeduplication.can_share_mesh(obj, export_apply):
+                continue
+
+            # Objects already sharing a datablock share their hash too, as long as their materials are the same
+            key = (obj.data.name_full, tuple(slot.material for slot in obj.material_slots))
+            mesh_hash = hashed_meshes.get(key)
+            if mesh_hash is None:
+                mesh_hash = MSFS_MeshDeduplication.get_mesh_hash(obj)
+                hashed_meshes[key] = mesh_hash
+
+            shared_mesh = shared_meshes.setdefault(mesh_hash, obj.data)
+            if obj.data != shared_mesh:
+                replaced.append((obj, obj.data))
+                obj.data = shared_mesh
+
+        if replaced:
+            print_console(
+                "INFO",
+                "Deduplicated meshes: %d objects now share %d meshes"
+                % (len(replaced), len({obj.data.name_full for obj, _ in replaced})),
+            )
+        return replaced
+
+    @staticmethod
+    def restore(replaced):
+        for obj, mesh in replaced:
+            obj.data = mesh
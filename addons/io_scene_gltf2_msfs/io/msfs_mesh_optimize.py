@@ -0,0 +1,201 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Mesh optimization helpers for the post-export stages. These only depend on numpy so they can be used (and tested)
+# outside of Blender. Triangles are (N, 3) integer arrays of vertex indices
+
+import numpy as np
+
+
+def weld_vertices(attributes):
+    """
+    Merge vertices whose attributes are all bitwise identical. Returns, for every vertex, the index of its welded
+    vertex, and for every welded vertex the first original vertex it was made from
+    """
+    count = len(attributes[0])
+    rows = np.hstack([np.ascontiguousarray(attribute).reshape(count, -1).view(np.uint8) for attribute in attributes])
+    rows = np.ascontiguousarray(rows).view(np.dtype((np.void, rows.shape[1]))).reshape(-1)
+    _, representatives, remap = np.unique(rows, return_index=True, return_inverse=True)
+
+    # np.unique sorts the vertices by their bytes, keep them in their original order instead
+    order = np.argsort(representatives, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    return rank[remap.reshape(-1)], representatives[order]
+
+
+def get_cache_misses(triangles, cache_size):
+    # Exact FIFO cache simulation: a vertex is cached as long as fewer than cache_size vertices were loaded after it.
+    # This is inherently sequential, it runs on plain lists which is the fastest Python gets
+    indices = np.asarray(triangles).reshape(-1).tolist()
+    if not indices:
+        return 0
+    loaded = [-cache_size] * (max(indices) + 1)
+    misses = 0
+    for vertex in indices:
+        if misses - loaded[vertex] >= cache_size:
+            loaded[vertex] = misses
+            misses += 1
+    return misses
+
+
+def get_morton_codes(positions, bits=21):
+    # Interleave the bits of the quantized coordinates, 21 bits per axis fill a 64 bit code
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    if len(positions) == 0:
+        return np.empty(0, dtype=np.uint64)
+    minimum = positions.min(axis=0)
+    size = np.max(positions.max(axis=0) - minimum)
+    quantized = ((positions - minimum) / (size if size > 0 else 1.0) * ((1 << bits) - 1)).astype(np.uint64)
+
+    codes = np.zeros(len(positions), dtype=np.uint64)
+    for bit in range(bits):
+        for axis in range(3):
+            codes |= ((quantized[:, axis] >> np.uint64(bit)) & np.uint64(1)) << np.uint64(3 * bit + axis)
+    return codes
+
+
+def get_fan_order(triangles, vertex_ranks):
+    """
+    Tipsify style triangle order: vertices are visited in rank order and each one emits the triangles around it that
+    weren't emitted yet, as a fan. Visiting the vertices along a space filling curve keeps consecutive fans next to
+    each other, so their shared vertices are still in the cache
+    """
+    ranks = vertex_ranks[triangles]
+    return np.lexsort((ranks.max(axis=1), ranks.min(axis=1)))
+
+
+def get_first_use_order(triangles):
+    # Vertices in the order the triangles first use them, for linear vertex fetches. Unused vertices are dropped
+    vertices, first_use = np.unique(np.asarray(triangles).reshape(-1), return_index=True)
+    return vertices[np.argsort(first_use, kind="stable")]
+
+
+def get_index_dtype(vertex_count):
+    return np.uint16 if vertex_count <= 0xFFFF else np.uint32
+
+
+def get_vertex_counts(triangles):
+    # Number of distinct vertices used by the first 1, 2, ... n triangles
+    _, first_use = np.unique(np.asarray(triangles).reshape(-1), return_index=True)
+    return np.cumsum(np.bincount(first_use // 3, minlength=len(triangles)))
+
+
+def split_triangles(triangles, positions, max_vertices=0xFFFF):
+    """
+    Cut triangles into chunks using at most max_vertices distinct vertices each. Triangles are taken along a space
+    filling curve through their centers so every chunk is a compact piece of the mesh. Returns the triangle indices
+    of each chunk
+    """
+    triangles = np.asarray(triangles)
+    order = np.argsort(get_morton_codes(np.asarray(positions, dtype=np.float64)[triangles].mean(axis=1)), kind="stable")
+
+    chunks = []
+    start = 0
+    # A chunk rarely holds more than two triangles per vertex, look at a window of that size and widen it if needed
+    window = 2 * max_vertices
+    while start < len(order):
+        end = min(start + window, len(order))
+        counts = get_vertex_counts(triangles[order[start:end]])
+        if counts[-1] <= max_vertices and end < len(order):
+            window *= 2
+            continue
+        size = max(int(np.searchsorted(counts, max_vertices, side="right")), 1)
+        chunks.append(order[start:start + size])
+        start += size
+    return chunks
+
+
+# Quantization to normalized integers, as KHR_mesh_quantization reads them back: max(value / max_int, -1)
+
+def get_normalized_max(dtype):
+    return np.iinfo(dtype).max
+
+
+def quantize_normalized(values, dtype):
+    limit = get_normalized_max(dtype)
+    lower = -limit if np.iinfo(dtype).min < 0 else 0
+    return np.clip(np.round(values * limit), lower, limit).astype(dtype)
+
+
+def dequantize_normalized(quantized):
+    return np.maximum(quantized.astype(np.float64) / get_normalized_max(quantized.dtype), -1.0)
+
+
+def quantize_within(values, dtypes, max_error, scale=1.0, offset=0.0):
+    """
+    Quantize to the first of dtypes (smallest first) that reconstructs every value within max_error, after the
+    values are mapped to the normalized range by (values - offset) / scale. Returns None if none of them does
+    """
+    values = np.asarray(values, dtype=np.float64)
+    normalized = (values - offset) / scale
+    for dtype in dtypes:
+        quantized = quantize_normalized(normalized, dtype)
+        error = np.max(np.abs(dequantize_normalized(quantized) * scale + offset - values)) if len(values) else 0.0
+        if error <= max_error:
+            return quantized, error
+    return None
+
+
+def get_position_range(positions):
+    # Center and uniform scale mapping all positions into [-1, 1], a uniform scale keeps the normals valid
+    minimum = positions.min(axis=0)
+    maximum = positions.max(axis=0)
+    scale = float(np.max(maximum - minimum)) / 2
+    return (minimum + maximum) / 2, scale if scale > 0 else 1.0
+
+
+def quaternion_to_matrix(quaternion):
+    # glTF quaternions are (x, y, z, w)
+    x, y, z, w = quaternion
+    return np.array([
+        [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+        [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+        [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)],
+    ])
+
+
+def get_node_matrix(node):
+    # Local transform of a glTF node as a 4x4 matrix
+    if "matrix" in node:
+        return np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T  # Column major
+    matrix = np.eye(4)
+    matrix[:3, :3] = quaternion_to_matrix(node.get("rotation", [0.0, 0.0, 0.0, 1.0])) * np.array(node.get("scale", [1.0, 1.0, 1.0]))
+    matrix[:3, 3] = node.get("translation", [0.0, 0.0, 0.0])
+    return matrix
+
+
+def normalize_rows(vectors):
+    lengths = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(lengths > 0, lengths, 1.0)
+
+
+def transform_attribute(name, values, matrix):
+    # Bake a transform into a vertex attribute. Normals use the inverse transpose, tangents keep their handedness
+    # unless the transform mirrors, in which case the triangles get flipped too
+    if name not in ("POSITION", "NORMAL", "TANGENT"):
+        return values
+    values = np.asarray(values, dtype=np.float64)
+    linear = matrix[:3, :3]
+    if name == "POSITION":
+        return (values @ linear.T + matrix[:3, 3]).astype(np.float32)
+    if name == "NORMAL":
+        return normalize_rows(values @ np.linalg.inv(linear)).astype(np.float32)
+    if name == "TANGENT":
+        tangents = np.empty_like(values)
+        tangents[:, :3] = normalize_rows(values[:, :3] @ linear.T)
+        tangents[:, 3] = values[:, 3] * np.sign(np.linalg.det(linear) or 1.0)
+        return tangents.astype(np.float32)
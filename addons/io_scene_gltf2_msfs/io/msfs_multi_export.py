@@ -21,6 +21,12 @@ import uuid
 import xml.dom.minidom
 import xml.etree.ElementTree as etree
 
+from ..blender.msfs_material_viewport_preview import MSFS_Viewport_Preview
+from .msfs_post_export import MSFS_PostExport
+from .msfs_mesh_dedup import MSFS_MeshDeduplication
+from .msfs_lod_cull import MSFS_LODCulling
+from io_scene_gltf2.io.com.gltf2_io_debug import print_console
+
 
 # Scene Properties
 class MSFSMultiExporterProperties:
@@ -39,7 +45,7 @@ class MSFS_OT_MultiExportGLTF2(bpy.types.Operator):
     bl_label = "Multi-Export glTF 2.0"
 
     @staticmethod
-    def export(file_path):
+    def export(file_path, flatten=False):
         settings = bpy.context.scene.msfs_multi_exporter_settings
 
         bpy.ops.export_scene.gltf(
@@ -77,12 +83,14 @@ class MSFS_OT_MultiExportGLTF2(bpy.types.Operator):
             export_displacement=settings.export_displacement,
         )
 
-    def execute(self, context):
+        MSFS_PostExport.run(bpy.path.ensure_ext(file_path, ".gltf"), settings, flatten)
+
+    def export_all(self, context):
         if context.scene.msfs_multi_exporter_current_tab == "OBJECTS":
             from .msfs_multi_export_objects import MSFS_LODGroupUtility
 
             lod_groups = context.scene.msfs_multi_exporter_lod_groups
-            sort_by_collection = context.scene.multi_exporter_grouped_by_collections
+            culled_count = 0
 
             for lod_group in lod_groups:
                 # Generate XML if needed
@@ -122,12 +130,13 @@ class MSFS_OT_MultiExportGLTF2(bpy.types.Operator):
                             lod_files[lod.file_name] = lod.lod_value
 
                     lod_files = sorted(lod_files.items())
-                    last_lod = list(lod_files)[-1:]
+                    last_file_name = lod_files[-1][0] if lod_files else None
 
                     for file_name, lod_value in lod_files:
                         lod_element = etree.SubElement(lods, "LOD")
 
-                        if file_name != last_lod[0]:
+                        # The last LOD has no minSize, it stays on screen until the model is culled
+                        if file_name != last_file_name:
                             lod_element.set("minSize", str(lod_value))
 
                         lod_element.set(
@@ -156,25 +165,31 @@ class MSFS_OT_MultiExportGLTF2(bpy.types.Operator):
                         for obj in bpy.context.selected_objects:
                             obj.select_set(False)
 
-                        def select_recursive(obj):
-                            if obj in list(bpy.context.window.view_layer.objects):
-                                obj.select_set(True)
-                                for child in obj.children:
-                                    select_recursive(child)
+                        lod_objects = MSFS_LODGroupUtility.get_lod_objects(lod)
+                        culled_objects = MSFS_LODCulling.get_culled_objects(context, lod, lod_objects)
+                        if culled_objects:
+                            print_console(
+                                "INFO",
+                                "Culled %d small objects from %s: %s"
+                                % (len(culled_objects), lod.file_name, ", ".join(obj.name for obj in culled_objects)),
+                            )
+                            culled_count += len(culled_objects)
 
-                        if sort_by_collection:
-                            for obj in lod.collection.all_objects:
+                        for obj in lod_objects:
+                            if obj not in culled_objects:
                                 obj.select_set(True)
-                        else:
-                            select_recursive(lod.object)
 
                         MSFS_OT_MultiExportGLTF2.export(
                             os.path.join(
                                 bpy.path.abspath(lod_group.folder_name),
                                 os.path.splitext(lod.file_name)[0],
-                            )
+                            ),
+                            flatten=lod.flatten_on_export,
                         )
 
+            if culled_count:
+                self.report({"INFO"}, "Culled %d small objects, see the console for the list" % culled_count)
+
         elif context.scene.msfs_multi_exporter_current_tab == "PRESETS":
             presets = bpy.context.scene.msfs_multi_exporter_presets
             for preset in presets:
@@ -192,6 +207,22 @@ class MSFS_OT_MultiExportGLTF2(bpy.types.Operator):
 
                     MSFS_OT_MultiExportGLTF2.export(bpy.path.abspath(preset.file_path))
 
+    def execute(self, context):
+        settings = context.scene.msfs_multi_exporter_settings
+
+        # Restore the full material trees once for the whole batch instead of once per exported file
+        MSFS_Viewport_Preview.suspend()
+        replaced_meshes = []
+        try:
+            if settings.deduplicate_meshes:
+                replaced_meshes = MSFS_MeshDeduplication.deduplicate(
+                    context.view_layer.objects, settings.export_apply
+                )
+            self.export_all(context)
+        finally:
+            MSFS_MeshDeduplication.restore(replaced_meshes)
+            MSFS_Viewport_Preview.resume()
+
         return {"FINISHED"}
 
 
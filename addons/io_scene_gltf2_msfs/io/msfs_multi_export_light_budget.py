@@ -0,0 +1,273 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+
+from .msfs_multi_export_objects import MSFS_LODGroupUtility
+
+# Upper bounds (degrees) of the cone angle buckets shown in the panel
+CONE_BUCKETS = (45.0, 90.0, 180.0, 360.0)
+
+
+def get_cone_fractions(cone_angles):
+    # Part of the sphere around the light that a cone lights up, 1 for point lights
+    half_angles = np.radians(np.minimum(cone_angles, 360.0)) / 2
+    return (1 - np.cos(half_angles)) / 2
+
+
+def get_overlap_weights(positions, weights, radius, max_pairs_per_chunk=1 << 22):
+    # For every light, the sum of the weights of the other lights whose influence sphere overlaps its own.
+    # The distance matrix is built a block of rows at a time to keep the memory use bounded
+    count = len(positions)
+    overlaps = np.zeros(count)
+    chunk_size = max(max_pairs_per_chunk // max(count, 1), 1)
+    for start in range(0, count, chunk_size):
+        end = min(start + chunk_size, count)
+        offsets = positions[start:end, None, :] - positions[None, :, :]
+        overlapping = np.einsum("ijk,ijk->ij", offsets, offsets) < (2 * radius) ** 2
+        overlapping[np.arange(end - start), np.arange(start, end)] = False
+        overlaps[start:end] = overlapping @ weights
+    return overlaps
+
+
+def analyze_lights(positions, cone_angles, flashing, radius):
+    """
+    Light statistics of one LOD. Every light lights a sphere of the given radius, reduced to its cone. Overdraw is the
+    average number of (cone weighted) lights reaching a light's position, coverage the volume lit at least once
+    """
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    cone_angles = np.asarray(cone_angles, dtype=np.float64)
+    flashing = np.asarray(flashing, dtype=bool)
+    count = len(positions)
+
+    stats = {
+        "lights": count,
+        "spot": int(np.count_nonzero(cone_angles < 360.0)),
+        "point": int(np.count_nonzero(cone_angles >= 360.0)),
+        "cones": np.histogram(cone_angles, bins=(0.0,) + CONE_BUCKETS[:-1] + (math.inf,))[0].tolist(),
+        "flashing": int(np.count_nonzero(flashing)),
+        "overdraw": 0.0,
+        "coverage": 0.0,
+        "flashing_overlaps": 0,
+    }
+    if count == 0:
+        return stats
+
+    weights = get_cone_fractions(cone_angles)
+    overlaps = get_overlap_weights(positions, weights, radius)
+    volume = 4 / 3 * math.pi * radius ** 3
+
+    stats["overdraw"] = float(np.mean(1 + overlaps))
+    stats["coverage"] = float(np.sum(weights * volume / (1 + overlaps)))
+    if np.any(flashing):
+        # Flashing lights lighting the same area, each pair counted once
+        flashing_overlaps = get_overlap_weights(positions[flashing], np.ones(np.count_nonzero(flashing)), radius)
+        stats["flashing_overlaps"] = int(np.sum(flashing_overlaps)) // 2
+    return stats
+
+
+class MSFS_LightBudget:
+    # Statistics per LOD, keyed by the name of the LOD's object or collection. Only computed by the refresh operator,
+    # the panel draws what is cached. Entries are dropped when one of their objects or lights is updated
+    cache = {}
+
+    def __new__(cls, *args, **kwargs):
+        raise RuntimeError("%s should not be instantiated" % cls)
+
+    @staticmethod
+    def get_lod_key(lod):
+        return lod.collection.name_full if lod.collection is not None else lod.object.name_full
+
+    @staticmethod
+    def get_cached_stats(lod, radius):
+        stats = MSFS_LightBudget.cache.get(MSFS_LightBudget.get_lod_key(lod))
+        if stats is None or stats["radius"] != radius:
+            return None
+        return stats
+
+    @staticmethod
+    def get_stats(lod, radius):
+        stats = MSFS_LightBudget.get_cached_stats(lod, radius)
+        if stats is not None:
+            return stats
+
+        objects = MSFS_LODGroupUtility.get_lod_objects(lod)
+        lights = [obj for obj in objects if obj.type == "LIGHT"]
+        stats = analyze_lights(
+            [obj.matrix_world.translation for obj in lights],
+            [math.degrees(obj.data.spot_size) if obj.data.type == "SPOT" else 360.0 for obj in lights],
+            [obj.msfs_light_flash_frequency > 0 for obj in lights],
+            radius,
+        )
+        stats["radius"] = radius
+        stats["objects"] = {obj.name_full for obj in objects}
+        stats["light_data"] = {obj.data.name_full for obj in lights}
+        MSFS_LightBudget.cache[MSFS_LightBudget.get_lod_key(lod)] = stats
+        return stats
+
+    @staticmethod
+    def get_exceeded_budgets(stats, scene):
+        exceeded = []
+        if stats["lights"] > scene.msfs_light_budget_max_lights:
+            exceeded.append("lights")
+        if stats["flashing"] > scene.msfs_light_budget_max_flashing:
+            exceeded.append("flashing lights")
+        if stats["overdraw"] > scene.msfs_light_budget_max_overdraw:
+            exceeded.append("overdraw")
+        return exceeded
+
+    @staticmethod
+    def invalidate(object_names, light_data_names):
+        for key, stats in list(MSFS_LightBudget.cache.items()):
+            if not (stats["objects"].isdisjoint(object_names) and stats["light_data"].isdisjoint(light_data_names)):
+                del MSFS_LightBudget.cache[key]
+
+
+class MSFS_OT_RefreshLightBudget(bpy.types.Operator):
+    """Compute the light statistics of every LOD"""
+
+    bl_idname = "msfs.refresh_light_budget"
+    bl_label = "Refresh Light Budget"
+
+    def execute(self, context):
+        MSFS_LightBudget.cache.clear()
+        for lod_group in context.scene.msfs_multi_exporter_lod_groups:
+            for lod in lod_group.lods:
+                if MSFS_LODGroupUtility.lod_is_visible(context, lod):
+                    MSFS_LightBudget.get_stats(lod, context.scene.msfs_light_budget_radius)
+        return {"FINISHED"}
+
+
+class MSFS_PT_MultiExporterLightBudget(bpy.types.Panel):
+    bl_label = "Light Budget"
+    bl_parent_id = "MSFS_PT_MultiExporter"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "Multi-Export glTF 2.0"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.msfs_multi_exporter_current_tab == "OBJECTS"
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        col = layout.column(align=True)
+        col.prop(scene, "msfs_light_budget_radius")
+        col.prop(scene, "msfs_light_budget_max_lights")
+        col.prop(scene, "msfs_light_budget_max_flashing")
+        col.prop(scene, "msfs_light_budget_max_overdraw")
+        layout.operator(MSFS_OT_RefreshLightBudget.bl_idname, text="Refresh", icon="FILE_REFRESH")
+
+        cone_labels = []
+        lower = 0
+        for upper in CONE_BUCKETS:
+            cone_labels.append("%d-%d°" % (lower, upper))
+            lower = upper
+
+        for lod_group in scene.msfs_multi_exporter_lod_groups:
+            for lod in lod_group.lods:
+                if not MSFS_LODGroupUtility.lod_is_visible(context, lod):
+                    continue
+
+                # The overlap tests are too slow to run on every redraw, only show what was computed
+                stats = MSFS_LightBudget.get_cached_stats(lod, scene.msfs_light_budget_radius)
+                if stats is None:
+                    layout.label(text="%s: press Refresh to compute" % lod.file_name, icon="INFO")
+                    continue
+                if stats["lights"] == 0:
+                    continue
+                exceeded = MSFS_LightBudget.get_exceeded_budgets(stats, scene)
+
+                box = layout.box()
+                box.label(text=lod.file_name, icon="ERROR" if exceeded else "LIGHT")
+                col = box.column(align=True)
+                col.label(text="%d lights: %d point, %d spot, %d flashing" % (
+                    stats["lights"], stats["point"], stats["spot"], stats["flashing"]
+                ))
+                col.label(text="Cones: " + ", ".join(
+                    "%s: %d" % (label, count) for label, count in zip(cone_labels, stats["cones"]) if count
+                ))
+                col.label(text="Overdraw %.2f, coverage %.0f m³" % (stats["overdraw"], stats["coverage"]))
+                if stats["flashing_overlaps"]:
+                    col.label(text="%d overlapping flashing light pairs" % stats["flashing_overlaps"])
+                if exceeded:
+                    col.label(text="Over budget: " + ", ".join(exceeded), icon="ERROR")
+
+
+@persistent
+def light_budget_depsgraph_update(scene, depsgraph):
+    if not MSFS_LightBudget.cache:
+        return
+    object_names = set()
+    light_data_names = set()
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Collection):
+            # Objects may have moved in or out of a LOD
+            MSFS_LightBudget.cache.clear()
+            return
+        if isinstance(update.id, bpy.types.Object):
+            object_names.add(update.id.original.name_full)
+        elif isinstance(update.id, bpy.types.Light):
+            light_data_names.add(update.id.original.name_full)
+    if object_names or light_data_names:
+        MSFS_LightBudget.invalidate(object_names, light_data_names)
+
+
+@persistent
+def light_budget_load(dummy):
+    MSFS_LightBudget.cache.clear()
+
+
+def register():
+    bpy.types.Scene.msfs_light_budget_radius = bpy.props.FloatProperty(
+        name="Light Radius",
+        description="Distance each light is assumed to reach for the overdraw and coverage estimates",
+        min=0.01,
+        default=5.0,
+        subtype="DISTANCE",
+    )
+    bpy.types.Scene.msfs_light_budget_max_lights = bpy.props.IntProperty(
+        name="Max Lights",
+        description="Flag LODs with more lights than this",
+        min=0,
+        default=64,
+    )
+    bpy.types.Scene.msfs_light_budget_max_flashing = bpy.props.IntProperty(
+        name="Max Flashing Lights",
+        description="Flag LODs with more flashing lights than this",
+        min=0,
+        default=16,
+    )
+    bpy.types.Scene.msfs_light_budget_max_overdraw = bpy.props.FloatProperty(
+        name="Max Overdraw",
+        description="Flag LODs where lights overlap more than this on average",
+        min=1.0,
+        default=3.0,
+    )
+    bpy.app.handlers.depsgraph_update_post.append(light_budget_depsgraph_update)
+    bpy.app.handlers.load_post.append(light_budget_load)
+
+
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(light_budget_depsgraph_update)
+    bpy.app.handlers.load_post.remove(light_budget_load)
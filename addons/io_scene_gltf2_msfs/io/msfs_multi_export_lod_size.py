@@ -0,0 +1,309 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import math
+
+import bpy
+import numpy as np
+from bpy.app.handlers import persistent
+
+from .msfs_multi_export_objects import MSFS_LODGroupUtility
+
+
+def get_bounding_sphere(positions):
+    # Sphere around the center of the bounding box, close enough to the smallest one for screen size estimates
+    positions = np.asarray(positions, dtype=np.float64).reshape(-1, 3)
+    if len(positions) == 0:
+        return np.zeros(3), 0.0
+    center = (positions.min(axis=0) + positions.max(axis=0)) / 2
+    return center, float(np.sqrt(np.max(np.einsum("ij,ij->i", positions - center, positions - center))))
+
+
+def get_screen_area(min_size, screen_height):
+    # minSize is the height of the screen, in percent, covered by the bounding sphere. Returns its area in pixels
+    diameter = min_size / 100 * screen_height
+    return math.pi * diameter ** 2 / 4
+
+
+def get_triangle_density(triangles, min_size, screen_height):
+    area = get_screen_area(min_size, screen_height)
+    return triangles / area if area > 0 else math.inf
+
+
+def get_min_size(triangles, density, screen_height):
+    # Smallest minSize at which the triangles stay under the density, rounded up to the integers the XML holds
+    diameter = 2 * math.sqrt(triangles / (math.pi * density))
+    return math.ceil(100 * diameter / screen_height)
+
+
+def suggest_min_sizes(triangle_counts, density, screen_height):
+    """
+    minSize of each LOD, highest detail first. A LOD is shown down to its minSize, where its triangles are densest, so
+    that is where the density is matched. Values are kept strictly decreasing so each LOD is shown somewhere
+    """
+    min_sizes = []
+    for triangles in triangle_counts:
+        min_size = min(get_min_size(triangles, density, screen_height), 999)
+        if min_sizes:
+            min_size = min(min_size, min_sizes[-1] - 1)
+        min_sizes.append(max(min_size, 0))
+    return min_sizes
+
+
+def get_switch_distance(radius, min_size, fov):
+    # Distance at which the bounding sphere covers min_size percent of the screen height, for a vertical fov in radians
+    if min_size <= 0:
+        return math.inf
+    return radius / (min_size / 100 * math.tan(fov / 2))
+
+
+class MSFS_LODSize:
+    # Statistics per LOD, keyed by the name of the LOD's object or collection. Only computed by the operators, the
+    # panel draws what is cached. Entries are dropped when one of their objects is updated
+    cache = {}
+
+    def __new__(cls, *args, **kwargs):
+        raise RuntimeError("%s should not be instantiated" % cls)
+
+    @staticmethod
+    def get_lod_key(lod):
+        return lod.collection.name_full if lod.collection is not None else lod.object.name_full
+
+    @staticmethod
+    def get_cached_stats(lod):
+        return MSFS_LODSize.cache.get(MSFS_LODSize.get_lod_key(lod))
+
+    @staticmethod
+    def get_stats(context, lod):
+        key = MSFS_LODSize.get_lod_key(lod)
+        stats = MSFS_LODSize.cache.get(key)
+        if stats is not None:
+            return stats
+
+        depsgraph = context.evaluated_depsgraph_get()
+        triangles = 0
+        vertices = 0
+        positions = []
+        objects = MSFS_LODGroupUtility.get_lod_objects(lod)
+        for obj in objects:
+            if obj.type != "MESH":
+                continue
+            evaluated = obj.evaluated_get(depsgraph)
+            mesh = evaluated.to_mesh()
+            try:
+                mesh.calc_loop_triangles()
+                triangles += len(mesh.loop_triangles)
+                vertices += len(mesh.vertices)
+
+                coordinates = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+                mesh.vertices.foreach_get("co", coordinates)
+                matrix = np.array(evaluated.matrix_world)
+                positions.append(coordinates.reshape(-1, 3) @ matrix[:3, :3].T + matrix[:3, 3])
+            finally:
+                evaluated.to_mesh_clear()
+
+        center, radius = get_bounding_sphere(np.concatenate(positions) if positions else np.empty((0, 3)))
+        stats = {
+            "triangles": triangles,
+            "vertices": vertices,
+            "center": center,
+            "radius": radius,
+            "objects": {obj.name_full for obj in objects},
+        }
+        MSFS_LODSize.cache[key] = stats
+        return stats
+
+    @staticmethod
+    def get_exported_lods(context, lod_group):
+        # The LODs written to the XML, in the same order (by file name, highest detail first)
+        lods = [
+            lod
+            for lod in lod_group.lods
+            if lod.enabled and MSFS_LODGroupUtility.lod_is_visible(context, lod)
+        ]
+        return sorted(lods, key=lambda lod: lod.file_name)
+
+    @staticmethod
+    def get_suggested_min_sizes(scene, stats):
+        return suggest_min_sizes(
+            [lod_stats["triangles"] for lod_stats in stats],
+            scene.msfs_lod_size_density,
+            scene.msfs_lod_size_screen_height,
+        )
+
+    @staticmethod
+    def invalidate(object_names):
+        for key, stats in list(MSFS_LODSize.cache.items()):
+            if not stats["objects"].isdisjoint(object_names):
+                del MSFS_LODSize.cache[key]
+
+
+class MSFS_OT_RefreshLODSizes(bpy.types.Operator):
+    """Compute the triangle counts and bounds of every LOD"""
+
+    bl_idname = "msfs.refresh_lod_sizes"
+    bl_label = "Refresh LOD Sizes"
+
+    def execute(self, context):
+        MSFS_LODSize.cache.clear()
+        for lod_group in context.scene.msfs_multi_exporter_lod_groups:
+            for lod in MSFS_LODSize.get_exported_lods(context, lod_group):
+                MSFS_LODSize.get_stats(context, lod)
+        return {"FINISHED"}
+
+
+class MSFS_OT_ApplyLODSizes(bpy.types.Operator):
+    """Set the LOD values of the LOD group (or all of them) to the suggested minSize"""
+
+    bl_idname = "msfs.apply_lod_sizes"
+    bl_label = "Apply Suggested LOD Values"
+    bl_options = {"REGISTER", "UNDO"}
+
+    group_name: bpy.props.StringProperty()
+
+    def execute(self, context):
+        changed = 0
+        for lod_group in context.scene.msfs_multi_exporter_lod_groups:
+            if self.group_name and lod_group.group_name != self.group_name:
+                continue
+            lods = MSFS_LODSize.get_exported_lods(context, lod_group)
+            stats = [MSFS_LODSize.get_stats(context, lod) for lod in lods]
+            for lod, min_size in zip(lods, MSFS_LODSize.get_suggested_min_sizes(context.scene, stats)):
+                if lod.lod_value != min_size:
+                    lod.lod_value = min_size
+                    changed += 1
+
+        self.report({"INFO"}, "Updated %d LOD values" % changed)
+        return {"FINISHED"}
+
+
+class MSFS_PT_MultiExporterLODSizes(bpy.types.Panel):
+    bl_label = "LOD Sizes"
+    bl_parent_id = "MSFS_PT_MultiExporter"
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_category = "Multi-Export glTF 2.0"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.msfs_multi_exporter_current_tab == "OBJECTS"
+
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+
+        col = layout.column(align=True)
+        col.prop(scene, "msfs_lod_size_density")
+        col.prop(scene, "msfs_lod_size_screen_height")
+        col.prop(scene, "msfs_lod_size_fov")
+        row = layout.row()
+        row.operator(MSFS_OT_RefreshLODSizes.bl_idname, text="Refresh", icon="FILE_REFRESH")
+        row.operator(MSFS_OT_ApplyLODSizes.bl_idname, text="Apply to All Groups").group_name = ""
+
+        for lod_group in scene.msfs_multi_exporter_lod_groups:
+            lods = MSFS_LODSize.get_exported_lods(context, lod_group)
+            if not lods:
+                continue
+            # Evaluating meshes is too slow to do on every redraw, only show what was computed
+            stats = [MSFS_LODSize.get_cached_stats(lod) for lod in lods]
+            if any(lod_stats is None for lod_stats in stats):
+                layout.label(text="%s: press Refresh to compute" % lod_group.group_name, icon="INFO")
+                continue
+            suggested = list(zip(lods, MSFS_LODSize.get_suggested_min_sizes(scene, stats)))
+
+            box = layout.box()
+            row = box.row()
+            row.label(text=lod_group.group_name)
+            row.operator(MSFS_OT_ApplyLODSizes.bl_idname, text="Apply").group_name = lod_group.group_name
+
+            col = box.column(align=True)
+            upper_size = None
+            for i, ((lod, min_size), lod_stats) in enumerate(zip(suggested, stats)):
+                is_last = i == len(suggested) - 1
+                # The last LOD has no minSize in the XML, it stays on screen until the model is culled
+                current_size = 0 if is_last else lod.lod_value
+
+                col.label(text="%s: minSize %s, suggested %d" % (
+                    lod.file_name, "-" if is_last else lod.lod_value, min_size
+                ), icon="CHECKMARK" if is_last or lod.lod_value == min_size else "INFO")
+                col.label(text="    %d triangles, %d vertices, %.2f m radius" % (
+                    lod_stats["triangles"], lod_stats["vertices"], lod_stats["radius"]
+                ))
+
+                # Triangles per pixel at the largest and smallest screen size the LOD is shown at
+                densities = []
+                if upper_size is not None:
+                    densities.append("%.2f" % get_triangle_density(lod_stats["triangles"], upper_size, scene.msfs_lod_size_screen_height))
+                if current_size > 0:
+                    densities.append("%.2f" % get_triangle_density(lod_stats["triangles"], current_size, scene.msfs_lod_size_screen_height))
+                    distance = get_switch_distance(lod_stats["radius"], current_size, scene.msfs_lod_size_fov)
+                    col.label(text="    %s triangles/pixel, switches at %.0f m" % (" to ".join(densities), distance))
+                elif densities:
+                    col.label(text="    %s triangles/pixel and below" % densities[0])
+                upper_size = current_size
+
+
+@persistent
+def lod_size_depsgraph_update(scene, depsgraph):
+    if not MSFS_LODSize.cache:
+        return
+    object_names = set()
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Collection):
+            # Objects may have moved in or out of a LOD
+            MSFS_LODSize.cache.clear()
+            return
+        if isinstance(update.id, bpy.types.Object) and (update.is_updated_geometry or update.is_updated_transform):
+            object_names.add(update.id.original.name_full)
+    if object_names:
+        MSFS_LODSize.invalidate(object_names)
+
+
+@persistent
+def lod_size_load(dummy):
+    MSFS_LODSize.cache.clear()
+
+
+def register():
+    bpy.types.Scene.msfs_lod_size_density = bpy.props.FloatProperty(
+        name="Triangles per Pixel",
+        description="Highest triangle density a LOD should reach before the next one takes over. GPUs shade small triangles inefficiently, below a pixel each they mostly waste work",
+        min=0.01,
+        max=10.0,
+        default=0.5,
+    )
+    bpy.types.Scene.msfs_lod_size_screen_height = bpy.props.IntProperty(
+        name="Screen Height",
+        description="Vertical resolution, in pixels, the densities are computed for",
+        min=240,
+        default=1440,
+    )
+    bpy.types.Scene.msfs_lod_size_fov = bpy.props.FloatProperty(
+        name="Vertical FOV",
+        description="Field of view used to estimate the distance at which each LOD switches",
+        min=math.radians(5.0),
+        max=math.radians(170.0),
+        default=math.radians(60.0),
+        subtype="ANGLE",
+    )
+    bpy.app.handlers.depsgraph_update_post.append(lod_size_depsgraph_update)
+    bpy.app.handlers.load_post.append(lod_size_load)
+
+
+def unregister():
+    bpy.app.handlers.depsgraph_update_post.remove(lod_size_depsgraph_update)
+    bpy.app.handlers.load_post.remove(lod_size_load)
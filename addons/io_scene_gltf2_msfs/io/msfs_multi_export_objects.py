@@ -27,7 +27,22 @@ class MultiExporterLOD(bpy.types.PropertyGroup):
 
     enabled: bpy.props.BoolProperty(name="", default=False)
     lod_value: bpy.props.IntProperty(name="", default=0, min=0, max=999)
-    flatten_on_export: bpy.props.BoolProperty(name="", default=False)
+    flatten_on_export: bpy.props.BoolProperty(
+        name="",
+        description="Merge the static meshes of this LOD that share a material into one primitive after export, to cut draw calls. Animated, skinned and gizmo meshes are kept as they are",
+        default=False,
+    )
+    cull_small_objects: bpy.props.BoolProperty(
+        name="",
+        description="Leave out the meshes of this LOD that are smaller than the cull size when the LOD is shown at its LOD value. Only meshes without children are culled",
+        default=False,
+    )
+    cull_size: bpy.props.FloatProperty(
+        name="",
+        description="Size, in pixels at the screen height set in the LOD Sizes panel, below which meshes are culled",
+        default=2.0,
+        min=0.0,
+    )
     keep_instances: bpy.props.BoolProperty(name="", default=False)
     file_name: bpy.props.StringProperty(name="", default="")
 
@@ -39,6 +54,22 @@ class MultiExporterLODGroup(bpy.types.PropertyGroup):
     folder_name: bpy.props.StringProperty(name="", default="", subtype="DIR_PATH")
     generate_xml: bpy.props.BoolProperty(name="", default=False)
     overwrite_guid: bpy.props.BoolProperty(name="", description="If an XML file already exists in the location to export to, the GUID will be overwritten", default=False)
+    generate_lods: bpy.props.BoolProperty(
+        name="",
+        description="Decimate LOD0 into the lower LODs of this group with Generate LODs. Meshes that didn't change since the last time keep their decimation",
+        default=False,
+    )
+    generated_lod_count: bpy.props.IntProperty(name="", description="Number of LODs generated after LOD0", default=2, min=1, max=5)
+    generated_lod_mode: bpy.props.EnumProperty(
+        name="",
+        items=(
+            ("RATIO", "Triangle Ratio", "Each LOD keeps a fraction of the triangles of the previous one"),
+            ("SCREEN_SIZE", "Screen Size", "Each LOD is shown down to a fraction of the screen size of the previous one, its triangle ratio follows from it"),
+        ),
+        default="RATIO",
+    )
+    generated_lod_ratio: bpy.props.FloatProperty(name="", default=0.5, min=0.01, max=1.0)
+    generated_lod_screen_size: bpy.props.FloatProperty(name="", default=0.7, min=0.1, max=1.0)
 
 
 class MSFS_LODGroupUtility:
@@ -74,6 +105,22 @@ class MSFS_LODGroupUtility:
                 return False
         return True
 
+    @staticmethod
+    def get_lod_objects(lod):
+        # The objects exported for the LOD: everything in its collection, or its object and all of its children
+        if bpy.context.scene.multi_exporter_grouped_by_collections:
+            return list(lod.collection.all_objects)
+
+        view_layer_objects = set(bpy.context.window.view_layer.objects)
+        objects = []
+        stack = [lod.object]
+        while stack:
+            obj = stack.pop()
+            if obj in view_layer_objects:
+                objects.append(obj)
+                stack.extend(obj.children)
+        return objects
+
 
 class MSFS_OT_ReloadLODGroups(bpy.types.Operator):
     bl_idname = "msfs.reload_lod_groups"
@@ -200,6 +247,8 @@ class MSFS_PT_MultiExporterObjectsView(bpy.types.Panel):
         layout = self.layout
 
         layout.operator(MSFS_OT_ReloadLODGroups.bl_idname, text="Reload LODs")
+        if any(lod_group.generate_lods for lod_group in context.scene.msfs_multi_exporter_lod_groups):
+            layout.operator("msfs.generate_all_lods", text="Generate All LODs")
         layout.prop(context.scene, "multi_exporter_show_hidden_objects")
         layout.prop(context.scene, "multi_exporter_grouped_by_collections")
 
@@ -246,6 +295,16 @@ class MSFS_PT_MultiExporterObjectsView(bpy.types.Panel):
 
                         box.prop(lod_group, "folder_name", text="Folder")
 
+                        box.prop(lod_group, "generate_lods", text="Generate LODs")
+                        if lod_group.generate_lods:
+                            box.prop(lod_group, "generated_lod_count", text="LOD Count")
+                            box.prop(lod_group, "generated_lod_mode", text="Mode")
+                            if lod_group.generated_lod_mode == "SCREEN_SIZE":
+                                box.prop(lod_group, "generated_lod_screen_size", text="Screen Size Step")
+                            else:
+                                box.prop(lod_group, "generated_lod_ratio", text="Triangle Ratio")
+                            box.operator("msfs.generate_lods", text="Generate Now").group_name = lod_group.group_name
+
                         col = box.column()
                         for lod in lod_group.lods:
                             if not MSFS_LODGroupUtility.lod_is_visible(context, lod):
@@ -258,8 +317,11 @@ class MSFS_PT_MultiExporterObjectsView(bpy.types.Panel):
                                 row.prop(lod, "enabled", text=lod.object.name)
                             subrow = row.column()
                             subrow.prop(lod, "lod_value", text="LOD Value")
-                            # subrow.prop(lod, "flatten_on_export", text="Flatten on Export") # Disable these two options for now as there's not a great way to implement them
-                            # subrow.prop(lod, "keep_instances", text="Keep Instances")
+                            subrow.prop(lod, "flatten_on_export", text="Merge by Material")
+                            subrow.prop(lod, "cull_small_objects", text="Cull Small Objects")
+                            if lod.cull_small_objects:
+                                subrow.prop(lod, "cull_size", text="Cull Size (px)")
+                            # subrow.prop(lod, "keep_instances", text="Keep Instances") # Disabled for now as there's not a great way to implement it
                             subrow.prop(lod, "file_name", text="File Name")
 
         row = layout.row(align=True)
@@ -237,6 +237,78 @@ class MSFS_MultiExporterSettings(bpy.types.PropertyGroup):
         default=False,
     )
 
+    deduplicate_meshes: bpy.props.BoolProperty(
+        name="Deduplicate Meshes",
+        description="Before export, let objects with identical meshes and materials share one mesh, so it is written "
+        "once and referenced by all of them. The objects get their own meshes back after export",
+        default=False,
+    )
+
+    prune_attributes: bpy.props.BoolProperty(
+        name="Prune Attributes",
+        description="After export, remove the vertex attributes the material of a primitive doesn't use: "
+        "UVs no texture reads, tangents without normal map, and everything but positions for invisible and "
+        "environment occluder materials",
+        default=False,
+    )
+
+    split_large_primitives: bpy.props.BoolProperty(
+        name="Split Large Primitives",
+        description="After export, split primitives with more than 65535 vertices into spatially compact pieces "
+        "that can use 16 bit indices",
+        default=False,
+    )
+
+    optimize_vertex_cache: bpy.props.BoolProperty(
+        name="Optimize Vertex Cache",
+        description="After export, weld duplicate vertices and reorder triangles and vertices for the GPU vertex cache. "
+        "The average cache miss ratio (ACMR) before and after is printed to the console",
+        default=False,
+    )
+
+    vertex_cache_size: bpy.props.IntProperty(
+        name="Cache Size",
+        description="Number of vertices the optimized vertex cache is assumed to hold",
+        min=4,
+        max=64,
+        default=16,
+    )
+
+    quantize_attributes: bpy.props.BoolProperty(
+        name="Quantize Attributes",
+        description="After export, store positions, normals, tangents and UVs as normalized 8 or 16 bit integers where "
+        "the error bounds allow it. Positions, normals, tangents and signed UVs require the \"KHR_mesh_quantization\" glTF "
+        "extension",
+        default=False,
+    )
+
+    quantize_position_error: bpy.props.FloatProperty(
+        name="Position Error",
+        description="Largest distance a quantized position may move, in the space of its mesh",
+        min=0.0,
+        default=0.001,
+        precision=4,
+        subtype="DISTANCE",
+    )
+
+    quantize_normal_error: bpy.props.FloatProperty(
+        name="Normal Error",
+        description="Largest change of a quantized normal or tangent component",
+        min=0.0,
+        max=1.0,
+        default=0.005,
+        precision=4,
+    )
+
+    quantize_texcoord_error: bpy.props.FloatProperty(
+        name="UV Error",
+        description="Largest change of a quantized UV coordinate",
+        min=0.0,
+        max=1.0,
+        default=0.0001,
+        precision=5,
+    )
+
 
 class MSFS_PT_export_main(bpy.types.Panel):
     bl_space_type = "VIEW_3D"
@@ -437,6 +509,40 @@ class MSFS_PT_export_animation_skinning(bpy.types.Panel):
         layout.prop(settings, "export_all_influences")
 
 
+class MSFS_PT_export_optimize(bpy.types.Panel):
+    bl_space_type = "VIEW_3D"
+    bl_region_type = "UI"
+    bl_label = "Optimize"
+    bl_parent_id = "MSFS_PT_MultiExporter"
+    bl_options = {"DEFAULT_CLOSED"}
+
+    @classmethod
+    def poll(cls, context):
+        return context.scene.msfs_multi_exporter_current_tab == "SETTINGS"
+
+    def draw(self, context):
+        layout = self.layout
+        layout.use_property_split = True
+        layout.use_property_decorate = False  # No animation.
+
+        settings = context.scene.msfs_multi_exporter_settings
+
+        layout.prop(settings, "deduplicate_meshes")
+        layout.prop(settings, "prune_attributes")
+        layout.prop(settings, "split_large_primitives")
+        layout.prop(settings, "optimize_vertex_cache")
+        col = layout.column()
+        col.active = settings.optimize_vertex_cache
+        col.prop(settings, "vertex_cache_size")
+
+        layout.prop(settings, "quantize_attributes")
+        col = layout.column()
+        col.active = settings.quantize_attributes
+        col.prop(settings, "quantize_position_error")
+        col.prop(settings, "quantize_normal_error")
+        col.prop(settings, "quantize_texcoord_error")
+
+
 def register():
     bpy.types.Scene.msfs_multi_exporter_settings = bpy.props.PointerProperty(
         type=MSFS_MultiExporterSettings
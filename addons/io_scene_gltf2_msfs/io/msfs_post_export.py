@@ -0,0 +1,657 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import os
+import copy
+import json
+
+import numpy as np
+from io_scene_gltf2.io.com.gltf2_io_debug import print_console
+
+from .msfs_gltf_buffers import GLTFBuffers, ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER, COMPONENT_COUNTS, COMPONENT_TYPES
+from .msfs_mesh_optimize import (
+    weld_vertices,
+    get_cache_misses,
+    get_morton_codes,
+    get_fan_order,
+    get_first_use_order,
+    get_index_dtype,
+    split_triangles,
+    quantize_within,
+    get_position_range,
+    quaternion_to_matrix,
+    get_node_matrix,
+    transform_attribute,
+)
+
+FLOAT = 5126
+
+
+class MSFS_PostExport:
+    """
+    Stages the multi exporter runs on every file it wrote. Each stage edits the file through GLTFBuffers and returns
+    a message for the console, the file is saved once all stages ran
+    """
+
+    def __new__(cls, *args, **kwargs):
+        raise RuntimeError("%s should not be instantiated" % cls)
+
+    @staticmethod
+    def get_stages(settings, flatten=False):
+        stages = []
+        if settings.prune_attributes:
+            stages.append(MSFS_PostExport.prune_attributes)
+        if flatten:
+            stages.append(MSFS_PostExport.merge_by_material)
+        if settings.split_large_primitives:
+            stages.append(MSFS_PostExport.split_primitives)
+        if settings.optimize_vertex_cache:
+            stages.append(MSFS_PostExport.optimize_vertex_cache)
+        if settings.quantize_attributes:
+            stages.append(MSFS_PostExport.quantize_attributes)
+        return stages
+
+    @staticmethod
+    def run(gltf_path, settings, flatten=False):
+        stages = MSFS_PostExport.get_stages(settings, flatten)
+        if not stages or not os.path.isfile(gltf_path):
+            return
+
+        with GLTFBuffers(gltf_path) as gltf:
+            for stage in stages:
+                message = stage(gltf, settings)
+                if message:
+                    print_console("INFO", "%s: %s" % (os.path.basename(gltf_path), message))
+            gltf.save()
+
+    @staticmethod
+    def get_primitive_groups(gltf):
+        # Primitives sharing their vertex attributes have to be processed together, keyed by their attribute accessors
+        groups = {}
+        for mesh in gltf.json.get("meshes", []):
+            for primitive in mesh.get("primitives", []):
+                key = (
+                    tuple(sorted(primitive.get("attributes", {}).items())),
+                    tuple(tuple(sorted(target.items())) for target in primitive.get("targets", [])),
+                )
+                groups.setdefault(key, []).append(primitive)
+        return groups
+
+    @staticmethod
+    def get_triangle_group(gltf, key, primitives):
+        # The vertex and index accessors of a group of indexed triangle primitives, None if it is anything else
+        attributes, targets = key
+        if not attributes:
+            return None
+        for primitive in primitives:
+            if primitive.get("mode", 4) != 4 or "indices" not in primitive:
+                return None
+            if gltf.json["accessors"][primitive["indices"]]["count"] % 3:
+                return None
+
+        vertex_accessors = [index for _, index in attributes] + [index for target in targets for _, index in target]
+        index_accessors = list(dict.fromkeys(primitive["indices"] for primitive in primitives))
+        return vertex_accessors, index_accessors
+
+    @staticmethod
+    def set_vertices(gltf, vertex_accessors, arrays, index_accessors, triangles, vertices):
+        # Keep the given vertices (in that order) and point the triangles at their new indices
+        vertex_map = np.empty(int(vertices.max()) + 1 if len(vertices) else 0, dtype=np.int64)
+        vertex_map[vertices] = np.arange(len(vertices))
+        for accessor_index, array in zip(vertex_accessors, arrays):
+            normalized = gltf.json["accessors"][accessor_index].get("normalized", False)
+            gltf.set_accessor(accessor_index, array[vertices], normalized=normalized)
+
+        index_dtype = get_index_dtype(len(vertices))
+        for accessor_index, primitive_triangles in zip(index_accessors, triangles):
+            gltf.set_accessor(accessor_index, vertex_map[primitive_triangles].reshape(-1).astype(index_dtype))
+
+    @staticmethod
+    def optimize_vertex_cache(gltf, settings):
+        cache_size = settings.vertex_cache_size
+        triangle_count = 0
+        misses_before = misses_after = 0
+        vertices_before = vertices_after = 0
+
+        for key, primitives in MSFS_PostExport.get_primitive_groups(gltf).items():
+            group = MSFS_PostExport.get_triangle_group(gltf, key, primitives)
+            if group is None:
+                continue
+            vertex_accessors, index_accessors = group
+
+            arrays = [gltf.get_accessor(index) for index in vertex_accessors]
+            triangles = [gltf.get_accessor(index).astype(np.int64).reshape(-1, 3) for index in index_accessors]
+            before = sum(get_cache_misses(primitive_triangles, cache_size) for primitive_triangles in triangles)
+
+            remap, representatives = weld_vertices(arrays)
+            names = [name for name, _ in key[0]]
+            if "POSITION" in names:
+                codes = get_morton_codes(arrays[names.index("POSITION")][representatives])
+                ranks = np.empty(len(codes), dtype=np.int64)
+                ranks[np.argsort(codes, kind="stable")] = np.arange(len(codes))
+            else:
+                ranks = np.arange(len(representatives))
+
+            optimized = []
+            for primitive_triangles in triangles:
+                primitive_triangles = remap[primitive_triangles]
+                optimized.append(primitive_triangles[get_fan_order(primitive_triangles, ranks)])
+            after = sum(get_cache_misses(primitive_triangles, cache_size) for primitive_triangles in optimized)
+
+            triangle_count += sum(len(primitive_triangles) for primitive_triangles in triangles)
+            vertices_before += len(arrays[0])
+            misses_before += before
+            if after >= before:
+                # Already well ordered, leave it as it was exported
+                misses_after += before
+                vertices_after += len(arrays[0])
+                continue
+
+            order = get_first_use_order(np.concatenate(optimized))
+            MSFS_PostExport.set_vertices(
+                gltf, vertex_accessors, [array[representatives] for array in arrays], index_accessors, optimized, order
+            )
+            misses_after += after
+            vertices_after += len(order)
+
+        if triangle_count == 0:
+            return None
+        return "Vertex cache ACMR %.3f -> %.3f, %d -> %d vertices" % (
+            misses_before / triangle_count,
+            misses_after / triangle_count,
+            vertices_before,
+            vertices_after,
+        )
+
+    @staticmethod
+    def get_quantization(name, values, settings):
+        # Normalized integer types KHR_mesh_quantization allows for the attribute, smallest first, and the error bound
+        if name in ("NORMAL", "TANGENT"):
+            return (np.int8, np.int16), settings.quantize_normal_error
+        if name.startswith("TEXCOORD_") and len(values):
+            if values.min() >= 0 and values.max() <= 1:
+                return (np.uint8, np.uint16), settings.quantize_texcoord_error
+            if values.min() >= -1 and values.max() <= 1:
+                return (np.int8, np.int16), settings.quantize_texcoord_error
+        # Texture coordinates outside of [-1, 1] would need a KHR_texture_transform on every material using them
+        return None, None
+
+    @staticmethod
+    def is_core_attribute_type(name, dtype):
+        # Core glTF already allows normalized unsigned bytes and shorts for texture coordinates, the other quantized
+        # types need KHR_mesh_quantization
+        return name.startswith("TEXCOORD_") and np.dtype(dtype) in (np.dtype(np.uint8), np.dtype(np.uint16))
+
+    @staticmethod
+    def set_dequantization(gltf, node_index, offset, scale, animated_nodes):
+        # Make the node map the quantized positions back: node transform @ translate(offset) @ scale(scale)
+        nodes = gltf.json["nodes"]
+        node = nodes[node_index]
+        if node.get("children") or node_index in animated_nodes:
+            # Children and animations must not see the dequantization, move the mesh to a child node of its own
+            mesh_node = {"mesh": node.pop("mesh"), "translation": offset.tolist(), "scale": [scale] * 3}
+            if "name" in node:
+                mesh_node["name"] = node["name"] + "_mesh"
+            nodes.append(mesh_node)
+            node.setdefault("children", []).append(len(nodes) - 1)
+        elif "matrix" in node:
+            matrix = np.array(node["matrix"], dtype=np.float64).reshape(4, 4).T  # Column major
+            dequantization = np.diag([scale, scale, scale, 1.0])
+            dequantization[:3, 3] = offset
+            node["matrix"] = (matrix @ dequantization).T.reshape(-1).tolist()
+        else:
+            node_scale = np.array(node.get("scale", [1.0, 1.0, 1.0]))
+            rotation = quaternion_to_matrix(node.get("rotation", [0.0, 0.0, 0.0, 1.0]))
+            node["translation"] = (np.array(node.get("translation", [0.0, 0.0, 0.0])) + rotation @ (node_scale * offset)).tolist()
+            node["scale"] = (node_scale * scale).tolist()
+
+    @staticmethod
+    def quantize_positions(gltf, mesh, settings):
+        """
+        Quantize the positions of all primitives of a mesh with one shared range, returns the range or None if the
+        mesh can't be quantized within the error bound. The nodes using the mesh are left to the caller
+        """
+        accessor_indices = list(dict.fromkeys(
+            primitive["attributes"]["POSITION"] for primitive in mesh.get("primitives", []) if "POSITION" in primitive.get("attributes", {})
+        ))
+        accessors = gltf.json["accessors"]
+        if not accessor_indices or any(accessors[index]["componentType"] != FLOAT for index in accessor_indices):
+            return None
+
+        positions = [gltf.get_accessor(index) for index in accessor_indices]
+        offset, scale = get_position_range(np.concatenate(positions))
+        results = [
+            quantize_within(values, (np.int8, np.int16), settings.quantize_position_error, scale, offset)
+            for values in positions
+        ]
+        if any(result is None for result in results):
+            return None
+        return accessor_indices, positions, results, offset, scale
+
+    @staticmethod
+    def quantize_attributes(gltf, settings):
+        accessors = gltf.json.get("accessors", [])
+        nodes = gltf.json.get("nodes", [])
+        animated_nodes = {
+            channel["target"].get("node")
+            for animation in gltf.json.get("animations", [])
+            for channel in animation.get("channels", [])
+        }
+        mesh_nodes = {}
+        for node_index, node in enumerate(nodes):
+            if "mesh" in node:
+                mesh_nodes.setdefault(node["mesh"], []).append(node_index)
+
+        # Position accessors are quantized per mesh, so they must not be shared with another one
+        position_meshes = {}
+        for mesh_index, mesh in enumerate(gltf.json.get("meshes", [])):
+            for primitive in mesh.get("primitives", []):
+                if "POSITION" in primitive.get("attributes", {}):
+                    position_meshes.setdefault(primitive["attributes"]["POSITION"], set()).add(mesh_index)
+
+        quantized = set()
+        requires_extension = False
+        bytes_before = bytes_after = 0
+        max_position_error = 0.0
+
+        def replace(accessor_index, name, values, result):
+            nonlocal bytes_before, bytes_after, requires_extension
+            requires_extension |= not MSFS_PostExport.is_core_attribute_type(name, result.dtype)
+            gltf.set_accessor(accessor_index, result, normalized=True, target=ARRAY_BUFFER)
+            quantized.add(accessor_index)
+            bytes_before += values.nbytes
+            bytes_after += gltf.json["bufferViews"][accessors[accessor_index]["bufferView"]]["byteLength"]
+
+        for mesh_index, mesh in enumerate(gltf.json.get("meshes", [])):
+            primitives = mesh.get("primitives", [])
+
+            # Normals, tangents and texture coordinates don't depend on the node transform
+            for primitive in primitives:
+                for name, accessor_index in primitive.get("attributes", {}).items():
+                    if accessor_index in quantized or accessors[accessor_index]["componentType"] != FLOAT:
+                        continue
+                    values = gltf.get_accessor(accessor_index)
+                    dtypes, max_error = MSFS_PostExport.get_quantization(name, values, settings)
+                    if dtypes is None:
+                        continue
+                    result = quantize_within(values, dtypes, max_error)
+                    if result is not None:
+                        replace(accessor_index, name, values, result[0])
+
+            # Skinned meshes ignore their node transform, morph targets and mesh extensions (collision gizmos)
+            # are in the unquantized space
+            nodes_of_mesh = mesh_nodes.get(mesh_index, [])
+            if (
+                not nodes_of_mesh
+                or any("skin" in nodes[node_index] for node_index in nodes_of_mesh)
+                or any(primitive.get("targets") for primitive in primitives)
+                or mesh.get("extensions")
+                or any(
+                    len(position_meshes.get(primitive.get("attributes", {}).get("POSITION"), ())) > 1
+                    for primitive in primitives
+                )
+            ):
+                continue
+
+            result = MSFS_PostExport.quantize_positions(gltf, mesh, settings)
+            if result is None:
+                continue
+            accessor_indices, positions, results, offset, scale = result
+            for accessor_index, values, (quantized_values, error) in zip(accessor_indices, positions, results):
+                replace(accessor_index, "POSITION", values, quantized_values)
+                max_position_error = max(max_position_error, float(error))
+            for node_index in nodes_of_mesh:
+                MSFS_PostExport.set_dequantization(gltf, node_index, offset, scale, animated_nodes)
+
+        if not quantized:
+            return None
+
+        if requires_extension:
+            for key in ("extensionsUsed", "extensionsRequired"):
+                extensions = gltf.json.setdefault(key, [])
+                if "KHR_mesh_quantization" not in extensions:
+                    extensions.append("KHR_mesh_quantization")
+        return "Quantized %d accessors, %d -> %d bytes, position error up to %.6f" % (
+            len(quantized), bytes_before, bytes_after, max_position_error
+        )
+
+    @staticmethod
+    def get_used_texcoords(material):
+        # Texture coordinate sets read by any texture of the material, core or MSFS extension
+        texcoords = set()
+        stack = [material]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                if "index" in value and isinstance(value["index"], int):
+                    texture_transform = value.get("extensions", {}).get("KHR_texture_transform", {})
+                    texcoords.add(texture_transform.get("texCoord", value.get("texCoord", 0)))
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+        return texcoords
+
+    @staticmethod
+    def has_normal_texture(material):
+        # Normal maps, including detail and clear coat ones, and anisotropy directions need tangents
+        extensions = material.get("extensions", {})
+        if "normalTexture" in material or "ASOBO_material_anisotropic" in extensions:
+            return True
+        return any(
+            "normal" in key.lower() and key.endswith("Texture")
+            for extension in extensions.values() if isinstance(extension, dict)
+            for key in extension
+        )
+
+    @staticmethod
+    def get_attribute_filter(material):
+        """
+        Which vertex attributes a primitive using the material needs. Positions, skinning and custom attributes are
+        always kept
+        """
+        extensions = material.get("extensions", {})
+        if "ASOBO_material_invisible" in extensions or "ASOBO_material_environment_occluder" in extensions:
+            # Never drawn: only used for collisions, or only written to the depth buffer
+            return lambda name: name == "POSITION" or name.startswith(("JOINTS_", "WEIGHTS_", "_"))
+
+        texcoords = MSFS_PostExport.get_used_texcoords(material)
+        if "ASOBO_material_detail_map" in extensions:
+            # Detail maps are tiled over their own UVs, keep both sets
+            texcoords |= {0, 1}
+        if extensions.get("ASOBO_material_UV_options", {}).get("AOUseUV2"):
+            # The occlusion channel is read with the second UV set, whatever the texture's texCoord says
+            texcoords.add(1)
+        tangents = MSFS_PostExport.has_normal_texture(material)
+
+        # Texture coordinate sets have to be numbered from 0 without gaps, keep every set below the highest one used
+        last_texcoord = max(texcoords, default=-1)
+
+        def is_used(name):
+            if name.startswith("TEXCOORD_"):
+                return int(name[len("TEXCOORD_"):]) <= last_texcoord
+            if name == "TANGENT":
+                return tangents
+            return True
+
+        return is_used
+
+    @staticmethod
+    def get_vertex_accessors(gltf):
+        accessors = set()
+        for mesh in gltf.json.get("meshes", []):
+            for primitive in mesh.get("primitives", []):
+                accessors.update(primitive.get("attributes", {}).values())
+                for target in primitive.get("targets", []):
+                    accessors.update(target.values())
+        return accessors
+
+    @staticmethod
+    def get_accessor_size(gltf, accessor_index):
+        accessor = gltf.json["accessors"][accessor_index]
+        return accessor["count"] * COMPONENT_COUNTS[accessor["type"]] * np.dtype(COMPONENT_TYPES[accessor["componentType"]]).itemsize
+
+    @staticmethod
+    def prune_attributes(gltf, settings):
+        materials = gltf.json.get("materials", [])
+        accessors_before = MSFS_PostExport.get_vertex_accessors(gltf)
+        pruned = 0
+
+        for mesh in gltf.json.get("meshes", []):
+            for primitive in mesh.get("primitives", []):
+                if "material" not in primitive:
+                    continue
+                is_used = MSFS_PostExport.get_attribute_filter(materials[primitive["material"]])
+                attributes = primitive.get("attributes", {})
+                for name in [name for name in attributes if not is_used(name)]:
+                    del attributes[name]
+                    pruned += 1
+                    # Morph targets can't have attributes their primitive doesn't have
+                    for target in primitive.get("targets", []):
+                        target.pop(name, None)
+
+        if not pruned:
+            return None
+        accessors_after = MSFS_PostExport.get_vertex_accessors(gltf)
+        saved = sum(MSFS_PostExport.get_accessor_size(gltf, index) for index in accessors_before - accessors_after)
+        return "Pruned %d unused attributes, %d bytes saved" % (pruned, saved)
+
+    @staticmethod
+    def get_static_nodes(gltf):
+        """
+        World matrices of the nodes whose transform never changes: not animated, and without an animated ancestor
+        """
+        nodes = gltf.json.get("nodes", [])
+        animated = {
+            channel["target"].get("node")
+            for animation in gltf.json.get("animations", [])
+            for channel in animation.get("channels", [])
+        }
+        matrices = {}
+        stack = []
+        for scene in gltf.json.get("scenes", []):
+            stack.extend((node_index, np.eye(4)) for node_index in scene.get("nodes", []))
+        while stack:
+            node_index, parent_matrix = stack.pop()
+            if node_index in animated or node_index in matrices:
+                continue
+            matrices[node_index] = parent_matrix @ get_node_matrix(nodes[node_index])
+            stack.extend((child, matrices[node_index]) for child in nodes[node_index].get("children", []))
+        return matrices
+
+    @staticmethod
+    def get_merge_key(gltf, primitive):
+        # Primitives can be merged when they share the material, extensions and extras and have the same attributes,
+        # stored the same way
+        if primitive.get("mode", 4) != 4 or primitive.get("targets"):
+            return None
+        attributes = []
+        for name, accessor_index in sorted(primitive.get("attributes", {}).items()):
+            accessor = gltf.json["accessors"][accessor_index]
+            if name in ("POSITION", "NORMAL", "TANGENT") and accessor["componentType"] != FLOAT:
+                return None
+            attributes.append((name, accessor["componentType"], accessor["type"], accessor.get("normalized", False)))
+        if not attributes:
+            return None
+        properties = json.dumps({key: primitive[key] for key in ("extensions", "extras") if key in primitive}, sort_keys=True)
+        return primitive.get("material"), tuple(attributes), properties
+
+    @staticmethod
+    def merge_by_material(gltf, settings):
+        """
+        Bake the transforms of static mesh nodes into their vertices and merge all primitives sharing a material into
+        one, on a new node. Animated, skinned and gizmo meshes and nodes with MSFS extensions are left alone
+        """
+        nodes = gltf.json.get("nodes", [])
+        meshes = gltf.json.get("meshes", [])
+        static_nodes = MSFS_PostExport.get_static_nodes(gltf)
+
+        mesh_nodes = {}
+        for node_index, node in enumerate(nodes):
+            if "mesh" in node:
+                mesh_nodes.setdefault(node["mesh"], []).append(node_index)
+
+        # A mesh can only be merged if every node using it can be
+        groups = {}
+        merged_meshes = []
+        for mesh_index, mesh in enumerate(meshes):
+            instances = mesh_nodes.get(mesh_index, [])
+            if not instances or mesh.get("extensions") or any(
+                node_index not in static_nodes
+                or "skin" in nodes[node_index]
+                or nodes[node_index].get("extensions")
+                or abs(np.linalg.det(static_nodes[node_index][:3, :3])) < 1e-12
+                for node_index in instances
+            ):
+                continue
+            merged = False
+            for primitive in mesh.get("primitives", []):
+                key = MSFS_PostExport.get_merge_key(gltf, primitive)
+                if key is not None:
+                    groups.setdefault(key, []).extend((primitive, static_nodes[node_index]) for node_index in instances)
+                    merged = True
+            if merged:
+                merged_meshes.append(mesh_index)
+
+        # Nothing to gain from merging a primitive with itself
+        groups = {key: members for key, members in groups.items() if len(members) > 1}
+        if not groups:
+            return None
+
+        merged_primitives = []
+        primitive_count = 0
+        for (material, attributes, properties), members in groups.items():
+            names = [name for name, *_ in attributes]
+            arrays = {name: [] for name in names}
+            triangles = []
+            vertex_count = 0
+            for primitive, matrix in members:
+                count = gltf.json["accessors"][primitive["attributes"][names[0]]]["count"]
+                for name in names:
+                    arrays[name].append(transform_attribute(name, gltf.get_accessor(primitive["attributes"][name]), matrix))
+                if "indices" in primitive:
+                    primitive_triangles = gltf.get_accessor(primitive["indices"]).astype(np.int64).reshape(-1, 3)
+                else:
+                    primitive_triangles = np.arange(count, dtype=np.int64).reshape(-1, 3)
+                if np.linalg.det(matrix[:3, :3]) < 0:
+                    # Mirrored: flip the winding so the faces keep pointing outwards
+                    primitive_triangles = primitive_triangles[:, ::-1]
+                triangles.append(primitive_triangles + vertex_count)
+                vertex_count += count
+            primitive_count += len(members)
+
+            merged_primitive = {"attributes": {}}
+            for name, component_type, accessor_type, normalized in attributes:
+                merged_primitive["attributes"][name] = gltf.add_accessor(
+                    np.concatenate(arrays[name]), normalized=normalized, target=ARRAY_BUFFER, bounds=name == "POSITION"
+                )
+            merged_primitive["indices"] = gltf.add_accessor(
+                np.concatenate(triangles).reshape(-1).astype(get_index_dtype(vertex_count)), target=ELEMENT_ARRAY_BUFFER
+            )
+            if material is not None:
+                merged_primitive["material"] = material
+            merged_primitive.update(json.loads(properties))
+            merged_primitives.append(merged_primitive)
+
+        # Take the merged primitives out of their meshes, meshes left without primitives are dropped from their nodes
+        merged = {id(primitive) for members in groups.values() for primitive, _ in members}
+        for mesh_index in merged_meshes:
+            mesh = meshes[mesh_index]
+            mesh["primitives"] = [primitive for primitive in mesh["primitives"] if id(primitive) not in merged]
+            if not mesh["primitives"]:
+                for node_index in mesh_nodes[mesh_index]:
+                    del nodes[node_index]["mesh"]
+        MSFS_PostExport.remove_unused_meshes(gltf)
+
+        meshes = gltf.json.setdefault("meshes", [])
+        meshes.append({"name": "Merged", "primitives": merged_primitives})
+        nodes.append({"name": "Merged", "mesh": len(meshes) - 1})
+        for scene in gltf.json.get("scenes", []):
+            scene.setdefault("nodes", []).append(len(nodes) - 1)
+
+        return "Merged %d primitives into %d by material" % (primitive_count, len(merged_primitives))
+
+    @staticmethod
+    def remove_unused_meshes(gltf):
+        meshes = gltf.json.get("meshes", [])
+        nodes = gltf.json.get("nodes", [])
+        used = sorted({node["mesh"] for node in nodes if "mesh" in node})
+        remap = {old: new for new, old in enumerate(used)}
+        gltf.json["meshes"] = [meshes[i] for i in used]
+        for node in nodes:
+            if "mesh" in node:
+                node["mesh"] = remap[node["mesh"]]
+
+    @staticmethod
+    def split_primitives(gltf, settings):
+        """
+        Split indexed triangle primitives using more than 65535 vertices into pieces that fit 16 bit indices. Every
+        vertex attribute and morph target is split along, the pieces keep the material and extensions
+        """
+        accessors = gltf.json.get("accessors", [])
+        split_count = chunk_count = 0
+        bytes_before = bytes_after = 0
+
+        for mesh in gltf.json.get("meshes", []):
+            primitives = []
+            for primitive in mesh.get("primitives", []):
+                attributes = primitive.get("attributes", {})
+                if (
+                    primitive.get("mode", 4) != 4
+                    or "indices" not in primitive
+                    or "POSITION" not in attributes
+                    or accessors[attributes["POSITION"]]["count"] <= 0xFFFF
+                    or accessors[primitive["indices"]]["count"] % 3
+                ):
+                    primitives.append(primitive)
+                    continue
+
+                triangles = gltf.get_accessor(primitive["indices"]).astype(np.int64).reshape(-1, 3)
+                if int(triangles.max(initial=0)) <= 0xFFFF:
+                    # Only the first vertices are used, the indices already fit
+                    primitives.append(primitive)
+                    continue
+
+                vertex_arrays = {name: gltf.get_accessor(index) for name, index in attributes.items()}
+                target_arrays = [
+                    {name: gltf.get_accessor(index) for name, index in target.items()} for target in primitive.get("targets", [])
+                ]
+                bytes_before += MSFS_PostExport.get_accessor_size(gltf, primitive["indices"])
+
+                for chunk in split_triangles(triangles, vertex_arrays["POSITION"]):
+                    chunk_triangles = triangles[chunk]
+                    vertices = get_first_use_order(chunk_triangles)
+                    vertex_map = np.empty(int(vertices.max()) + 1, dtype=np.int64)
+                    vertex_map[vertices] = np.arange(len(vertices))
+
+                    chunk_primitive = copy.deepcopy({key: value for key, value in primitive.items() if key not in ("attributes", "targets", "indices")})
+                    chunk_primitive["attributes"] = {
+                        name: gltf.add_accessor(
+                            array[vertices],
+                            normalized=accessors[attributes[name]].get("normalized", False),
+                            target=ARRAY_BUFFER,
+                            bounds=name == "POSITION",
+                        )
+                        for name, array in vertex_arrays.items()
+                    }
+                    if target_arrays:
+                        chunk_primitive["targets"] = [
+                            {
+                                name: gltf.add_accessor(
+                                    array[vertices],
+                                    normalized=accessors[target[name]].get("normalized", False),
+                                    target=ARRAY_BUFFER,
+                                    bounds=name == "POSITION",
+                                )
+                                for name, array in arrays.items()
+                            }
+                            for target, arrays in zip(primitive["targets"], target_arrays)
+                        ]
+                    chunk_primitive["indices"] = gltf.add_accessor(
+                        vertex_map[chunk_triangles].reshape(-1).astype(get_index_dtype(len(vertices))),
+                        target=ELEMENT_ARRAY_BUFFER,
+                    )
+                    bytes_after += MSFS_PostExport.get_accessor_size(gltf, chunk_primitive["indices"])
+                    primitives.append(chunk_primitive)
+                    chunk_count += 1
+                split_count += 1
+            if "primitives" in mesh:
+                mesh["primitives"] = primitives
+
+        if not split_count:
+            return None
+        return "Split %d primitives into %d with 16 bit indices, index buffers %d -> %d bytes" % (
+            split_count, chunk_count, bytes_before, bytes_after
+        )
@@ -0,0 +1,62 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# The tests cover the modules that don't need Blender. They are imported from the add-on's subpackages without
+# running the add-on's __init__ (which needs bpy)
+
+import sys
+import types
+import importlib
+from pathlib import Path
+
+import pytest
+
+ADDON_PATH = Path(__file__).resolve().parents[1] / "addons" / "io_scene_gltf2_msfs"
+PACKAGE = "io_scene_gltf2_msfs"
+
+
+def get_package(name, path):
+    if name not in sys.modules:
+        package = types.ModuleType(name)
+        package.__path__ = [str(path)]
+        sys.modules[name] = package
+    return sys.modules[name]
+
+
+def import_addon_module(name):
+    """
+    Import a module of the add-on by its dotted path inside it, e.g. "io.msfs_post_export"
+    """
+    get_package(PACKAGE, ADDON_PATH)
+    subpackage, _ = name.rsplit(".", 1)
+    get_package("%s.%s" % (PACKAGE, subpackage), ADDON_PATH / subpackage)
+
+    # Outside of Blender the glTF importer/exporter add-on isn't there, only its console logging is used
+    try:
+        importlib.import_module("io_scene_gltf2.io.com.gltf2_io_debug")
+    except ImportError:
+        debug = types.ModuleType("io_scene_gltf2.io.com.gltf2_io_debug")
+        debug.print_console = lambda level, message: None
+        for parent in ("io_scene_gltf2", "io_scene_gltf2.io", "io_scene_gltf2.io.com"):
+            sys.modules.setdefault(parent, types.ModuleType(parent))
+        sys.modules[debug.__name__] = debug
+
+    return importlib.import_module("%s.%s" % (PACKAGE, name))
+
+
+@pytest.fixture
+def addon_module():
+    return import_addon_module
@@ -0,0 +1,137 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import numpy as np
+import pytest
+
+from conftest import import_addon_module
+
+
+@pytest.fixture
+def geometry():
+    return import_addon_module("blender.gizmo_geometry")
+
+
+def test_edges_to_line_vertices(geometry):
+    coords = [(0, 0, 0), (1, 0, 0), (1, 1, 0)]
+    lines = geometry.edges_to_line_vertices(coords, [(0, 1), (1, 2)])
+    assert lines.dtype == np.float32
+    np.testing.assert_array_equal(lines, [(0, 0, 0), (1, 0, 0), (1, 0, 0), (1, 1, 0)])
+
+
+@pytest.mark.parametrize("gizmo_type, expected", [
+    ("box", (2, 3, 4)),
+    ("sphere", (24, 24, 24)),
+    ("cylinder", (6, 6, 4)),
+])
+def test_gizmo_matrix_scale(geometry, gizmo_type, expected):
+    matrix = geometry.get_gizmo_matrix(gizmo_type, (1, 2, 3), (2, 3, 4))
+    np.testing.assert_allclose(np.diag(matrix)[:3], expected)
+    np.testing.assert_allclose(matrix[:3, 3], (1, 2, 3))
+
+
+BOX_CORNERS = np.array([(x, y, z) for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+
+
+def make_segments(*clouds):
+    counts = [len(cloud) for cloud in clouds]
+    return np.concatenate(clouds), counts
+
+
+def test_fit_aabbs(geometry):
+    points, counts = make_segments(BOX_CORNERS, BOX_CORNERS * (1, 2, 3) + (5, 0, 0))
+    centers, half_extents = geometry.fit_aabbs(points, geometry.get_segment_starts(counts))
+    np.testing.assert_allclose(centers, [(0, 0, 0), (5, 0, 0)])
+    np.testing.assert_allclose(half_extents, [(1, 1, 1), (1, 2, 3)])
+
+
+def test_fit_obbs_follows_rotation(geometry):
+    angle = np.radians(30)
+    rotation = np.array([
+        (np.cos(angle), -np.sin(angle), 0),
+        (np.sin(angle), np.cos(angle), 0),
+        (0, 0, 1),
+    ])
+    box = (BOX_CORNERS * (4, 1, 0.5)) @ rotation.T + (1, 2, 3)
+    points, counts = make_segments(box, BOX_CORNERS)
+    centers, half_extents, axes = geometry.fit_obbs(points, geometry.get_segment_starts(counts), counts)
+
+    np.testing.assert_allclose(centers[0], (1, 2, 3), atol=1e-9)
+    np.testing.assert_allclose(sorted(half_extents[0]), (0.5, 1, 4), atol=1e-9)
+    np.testing.assert_allclose(np.linalg.det(axes), 1)
+    # The longest axis of the fit is the rotated X axis, up to its sign
+    longest = axes[0][:, np.argmax(half_extents[0])]
+    assert abs(longest @ rotation[:, 0]) == pytest.approx(1)
+
+
+def test_fit_spheres_and_cylinders(geometry):
+    axes = np.concatenate((np.eye(3), -np.eye(3)))
+    angles = np.linspace(0, 2 * np.pi, 16, endpoint=False)
+    ring = np.column_stack((2 * np.cos(angles), 2 * np.sin(angles), np.zeros(16)))
+    cylinder = np.concatenate((ring + (0, 0, 1.5), ring - (0, 0, 1.5)))
+    points, counts = make_segments(axes + (2, 0, 0), cylinder)
+    starts = geometry.get_segment_starts(counts)
+    centers, half_extents = geometry.fit_aabbs(points, starts)
+
+    radii = geometry.fit_spheres(points, starts, counts, centers)
+    assert radii[0] == pytest.approx(1)
+    cylinder_radii, heights = geometry.fit_cylinders(points, starts, counts, centers, half_extents)
+    assert cylinder_radii[1] == pytest.approx(2)
+    assert heights[1] == pytest.approx(3)
+
+
+def make_matrix(translation=(0, 0, 0), scale=(1, 1, 1), angle=0.0):
+    matrix = np.eye(4)
+    c, s = np.cos(angle), np.sin(angle)
+    matrix[:3, :3] = np.array(((c, -s, 0), (s, c, 0), (0, 0, 1))) @ np.diag(scale)
+    matrix[:3, 3] = translation
+    return matrix
+
+
+def test_find_overlapping_pairs_matches_brute_force(geometry):
+    rng = np.random.default_rng(0)
+    mins = rng.uniform(0, 10, (200, 3))
+    maxs = mins + rng.uniform(0, 2, (200, 3))
+    expected = {
+        (min(i, j), max(i, j))
+        for i in range(200)
+        for j in range(i + 1, 200)
+        if np.all((mins[i] <= maxs[j]) & (mins[j] <= maxs[i]))
+    }
+    for max_pairs_per_chunk in (1, 7, 1 << 22):
+        a, b = geometry.find_overlapping_pairs(mins, maxs, max_pairs_per_chunk)
+        assert {(min(i, j), max(i, j)) for i, j in zip(a.tolist(), b.tolist())} == expected
+
+
+def test_find_redundant_gizmos(geometry):
+    types = ["box", "box", "box", "sphere", "cylinder", "box"]
+    matrices = [
+        make_matrix(scale=(2, 2, 2)),
+        make_matrix(scale=(0.5, 0.5, 0.5), angle=np.radians(45)),  # Inside the first box
+        make_matrix((1.8, 0, 0), (0.5, 0.5, 0.5)),  # Sticks out of it
+        make_matrix((10, 0, 0), (1, 1, 1)),
+        make_matrix((10, 0, 0), (0.5, 0.5, 1)),  # Radius 0.25, half height 0.5, inside the sphere
+        make_matrix(scale=(2, 2, 2)),  # Same as the first one
+    ]
+    redundant = geometry.find_redundant_gizmos(types, matrices)
+    assert redundant.tolist() == [False, True, False, False, True, True]
+
+
+def test_find_redundant_gizmos_within_groups(geometry):
+    types = ["box", "box"]
+    matrices = [make_matrix(scale=(2, 2, 2)), make_matrix(scale=(0.5, 0.5, 0.5))]
+    assert geometry.find_redundant_gizmos(types, matrices, groups=["a", "a"]).tolist() == [False, True]
+    assert geometry.find_redundant_gizmos(types, matrices, groups=["a", "b"]).tolist() == [False, False]
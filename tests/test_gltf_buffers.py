@@ -0,0 +1,95 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+import mmap
+
+import numpy as np
+import pytest
+
+from conftest import import_addon_module
+
+
+@pytest.fixture
+def gltf_buffers():
+    return import_addon_module("io.msfs_gltf_buffers")
+
+
+def write_gltf(directory, node_extensions=None):
+    # Three VEC3 accessors, the first used by the mesh, the last two only by the node's extensions
+    data = np.arange(27, dtype=np.float32)
+    (directory / "model.bin").write_bytes(data.tobytes())
+    accessors = [
+        {"bufferView": i, "count": 3, "type": "VEC3", "componentType": 5126}
+        for i in range(3)
+    ]
+    gltf = {
+        "asset": {"version": "2.0"},
+        "buffers": [{"uri": "model.bin", "byteLength": data.nbytes}],
+        "bufferViews": [{"buffer": 0, "byteOffset": 36 * i, "byteLength": 36} for i in range(3)],
+        "accessors": accessors,
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}}]}],
+        "nodes": [{"mesh": 0, "extensions": node_extensions or {}}],
+    }
+    path = directory / "model.gltf"
+    path.write_text(json.dumps(gltf))
+    return path
+
+
+def test_save_keeps_instancing_accessors(gltf_buffers, tmp_path):
+    path = write_gltf(tmp_path, {"EXT_mesh_gpu_instancing": {"attributes": {"TRANSLATION": 2}}})
+    with gltf_buffers.GLTFBuffers(str(path)) as gltf:
+        gltf.save()
+        assert len(gltf.json["accessors"]) == 2
+        translation = gltf.json["nodes"][0]["extensions"]["EXT_mesh_gpu_instancing"]["attributes"]["TRANSLATION"]
+        assert translation == 1
+        assert gltf.get_accessor(translation)[0].tolist() == [18, 19, 20]
+
+
+def test_save_keeps_accessors_of_unknown_extensions(gltf_buffers, tmp_path):
+    path = write_gltf(tmp_path, {"VENDOR_unknown": {"accessor": 1}})
+    with gltf_buffers.GLTFBuffers(str(path)) as gltf:
+        gltf.save()
+        assert len(gltf.json["accessors"]) == 3
+        assert gltf.get_accessor(1)[0].tolist() == [9, 10, 11]
+
+
+def test_save_unmaps_buffers_before_replacing(gltf_buffers, tmp_path, monkeypatch):
+    path = write_gltf(tmp_path)
+    with gltf_buffers.GLTFBuffers(str(path)) as gltf:
+        gltf.set_accessor(0, gltf.get_accessor(0) * 2)
+        maps = [buffer for buffer in gltf.buffers if isinstance(buffer, mmap.mmap)]
+        replace = gltf_buffers.os.replace
+
+        def checked_replace(*args):
+            assert all(buffer.closed for buffer in maps)
+            replace(*args)
+
+        monkeypatch.setattr(gltf_buffers.os, "replace", checked_replace)
+        gltf.save()
+        assert gltf.get_accessor(0)[1].tolist() == [6, 8, 10]
+
+
+def test_save_refuses_to_replace_viewed_buffers(gltf_buffers, tmp_path):
+    path = write_gltf(tmp_path)
+    before = (tmp_path / "model.bin").read_bytes()
+    gltf = gltf_buffers.GLTFBuffers(str(path))
+    view = gltf.get_accessor(0)
+    with pytest.raises(RuntimeError):
+        gltf.save()
+    assert (tmp_path / "model.bin").read_bytes() == before
+    assert not (tmp_path / "model.bin.tmp").exists()
+    del view
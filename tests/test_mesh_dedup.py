@@ -0,0 +1,61 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import import_addon_module
+
+
+@pytest.fixture
+def mesh_dedup():
+    return import_addon_module("io.msfs_mesh_dedup").MSFS_MeshDeduplication
+
+
+def make_object(vertex_groups=(), parent_type="OBJECT", modifiers=(), shape_keys=None):
+    return SimpleNamespace(
+        name_full="Cube",
+        type="MESH",
+        library=None,
+        data=SimpleNamespace(name_full="Cube", library=None, shape_keys=shape_keys),
+        vertex_groups=list(vertex_groups),
+        parent_type=parent_type,
+        modifiers=[SimpleNamespace(type=modifier) for modifier in modifiers],
+        material_slots=[],
+    )
+
+
+def test_plain_mesh_can_be_shared(mesh_dedup):
+    assert mesh_dedup.can_share_mesh(make_object(), export_apply=False)
+
+
+@pytest.mark.parametrize("obj", [
+    make_object(vertex_groups=["Bone"]),
+    make_object(parent_type="ARMATURE"),
+    make_object(modifiers=["ARMATURE"]),
+    make_object(shape_keys=SimpleNamespace(key_blocks=["Basis"])),
+], ids=["vertex_groups", "armature_parent", "armature_modifier", "shape_keys"])
+def test_deformed_meshes_are_skipped(mesh_dedup, obj):
+    assert not mesh_dedup.can_share_mesh(obj, export_apply=False)
+    # Skipped before their mesh is even read
+    assert mesh_dedup.deduplicate([obj, obj], export_apply=False) == []
+
+
+def test_modifiers_only_skip_when_applied(mesh_dedup):
+    obj = make_object(modifiers=["SUBSURF"])
+    assert mesh_dedup.can_share_mesh(obj, export_apply=False)
+    assert not mesh_dedup.can_share_mesh(obj, export_apply=True)
@@ -0,0 +1,116 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import json
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from conftest import import_addon_module
+
+
+@pytest.fixture
+def post_export():
+    return import_addon_module("io.msfs_post_export").MSFS_PostExport
+
+
+@pytest.fixture
+def gltf_buffers():
+    return import_addon_module("io.msfs_gltf_buffers").GLTFBuffers
+
+
+def make_gltf(material, texcoords=3):
+    attributes = {"POSITION": 0, "NORMAL": 1}
+    attributes.update({"TEXCOORD_%d" % i: 2 + i for i in range(texcoords)})
+    return SimpleNamespace(json={
+        "accessors": [{"count": 3, "type": "VEC3", "componentType": 5126}] * 2
+        + [{"count": 3, "type": "VEC2", "componentType": 5126}] * texcoords,
+        "materials": [material],
+        "meshes": [{"primitives": [{"attributes": attributes, "material": 0}]}],
+    })
+
+
+def get_attributes(gltf):
+    return sorted(gltf.json["meshes"][0]["primitives"][0]["attributes"])
+
+
+def test_prune_keeps_texcoords_consecutive(post_export):
+    gltf = make_gltf({"emissiveTexture": {"index": 0, "texCoord": 1}})
+    post_export.prune_attributes(gltf, None)
+    assert get_attributes(gltf) == ["NORMAL", "POSITION", "TEXCOORD_0", "TEXCOORD_1"]
+
+
+def test_prune_keeps_uv2_for_ambient_occlusion(post_export):
+    material = {
+        "occlusionTexture": {"index": 0},
+        "extensions": {"ASOBO_material_UV_options": {"AOUseUV2": True}},
+    }
+    gltf = make_gltf(material)
+    post_export.prune_attributes(gltf, None)
+    assert get_attributes(gltf) == ["NORMAL", "POSITION", "TEXCOORD_0", "TEXCOORD_1"]
+
+
+def test_prune_drops_unused_texcoords(post_export):
+    gltf = make_gltf({"pbrMetallicRoughness": {"baseColorTexture": {"index": 0}}})
+    post_export.prune_attributes(gltf, None)
+    assert get_attributes(gltf) == ["NORMAL", "POSITION", "TEXCOORD_0"]
+
+
+def write_mesh(directory, attributes):
+    # A mesh without node, only its normals and texture coordinates can be quantized
+    data = b""
+    accessors = []
+    views = []
+    for values in attributes.values():
+        values = np.asarray(values, dtype=np.float32)
+        views.append({"buffer": 0, "byteOffset": len(data), "byteLength": values.nbytes})
+        accessors.append({"bufferView": len(views) - 1, "count": len(values), "type": "VEC%d" % values.shape[1], "componentType": 5126})
+        data += values.tobytes()
+    (directory / "mesh.bin").write_bytes(data)
+    path = directory / "mesh.gltf"
+    path.write_text(json.dumps({
+        "asset": {"version": "2.0"},
+        "buffers": [{"uri": "mesh.bin", "byteLength": len(data)}],
+        "bufferViews": views,
+        "accessors": accessors,
+        "meshes": [{"primitives": [{"attributes": {name: i for i, name in enumerate(attributes)}}]}],
+    }))
+    return str(path)
+
+
+QUANTIZE_SETTINGS = SimpleNamespace(quantize_position_error=0.001, quantize_normal_error=0.01, quantize_texcoord_error=0.01)
+
+
+def test_quantize_unsigned_texcoords_without_extension(post_export, gltf_buffers, tmp_path):
+    path = write_mesh(tmp_path, {"TEXCOORD_0": [[0.0, 0.5], [1.0, 0.25], [0.5, 1.0]]})
+    with gltf_buffers(path) as gltf:
+        assert post_export.quantize_attributes(gltf, QUANTIZE_SETTINGS) is not None
+        assert gltf.json["accessors"][0]["componentType"] in (5121, 5123)
+        assert "KHR_mesh_quantization" not in gltf.json.get("extensionsRequired", [])
+        assert "KHR_mesh_quantization" not in gltf.json.get("extensionsUsed", [])
+
+
+def test_quantize_normals_require_extension(post_export, gltf_buffers, tmp_path):
+    path = write_mesh(tmp_path, {
+        "NORMAL": [[0.0, 0.0, 1.0], [0.0, 1.0, 0.0], [1.0, 0.0, 0.0]],
+        "TEXCOORD_0": [[0.0, 0.5], [1.0, 0.25], [0.5, 1.0]],
+    })
+    with gltf_buffers(path) as gltf:
+        post_export.quantize_attributes(gltf, QUANTIZE_SETTINGS)
+        assert gltf.json["accessors"][0]["componentType"] in (5120, 5122)
+        assert "KHR_mesh_quantization" in gltf.json["extensionsRequired"]
+        assert "KHR_mesh_quantization" in gltf.json["extensionsUsed"]
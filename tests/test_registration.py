@@ -0,0 +1,57 @@
+# glTF-Blender-IO-MSFS
+# Copyright (C) 2022 The glTF-Blender-IO-MSFS authors
+
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+import ast
+import pkgutil
+
+from conftest import ADDON_PATH
+
+
+def get_module_paths(path, root=""):
+    # Same order as recursive_module_search in the add-on's __init__, which is the order classes get registered in
+    for _, name, ispkg in pkgutil.iter_modules([str(path)]):
+        if ispkg:
+            yield from get_module_paths(path / name, root + "/" + name)
+        else:
+            yield path / (name + ".py")
+
+
+def get_classes(module_path):
+    # (id, bl_parent_id) of the classes defined in a module, in definition order. Blender ids a panel by its
+    # bl_idname when it has one, by its class name otherwise
+    tree = ast.parse(module_path.read_text(encoding="utf-8"))
+    for node in tree.body:
+        if not isinstance(node, ast.ClassDef):
+            continue
+        values = {}
+        for statement in node.body:
+            if isinstance(statement, ast.Assign) and isinstance(statement.value, ast.Constant):
+                for target in statement.targets:
+                    if isinstance(target, ast.Name):
+                        values[target.id] = statement.value.value
+        yield values.get("bl_idname", node.name), values.get("bl_parent_id")
+
+
+def test_panels_registered_after_their_parent():
+    classes = [cls for module_path in get_module_paths(ADDON_PATH) for cls in get_classes(module_path)]
+    defined = {class_id for class_id, _ in classes}
+
+    registered = set()
+    for class_id, parent_id in classes:
+        # Parents from outside the add-on (the glTF exporter's panels) are handled by register_panel
+        if parent_id is not None and parent_id in defined:
+            assert parent_id in registered, "%s is registered before its parent %s" % (class_id, parent_id)
+        registered.add(class_id)